@@ -1,19 +1,33 @@
-import joblib
+import time
+_IMPORT_STARTED = time.perf_counter()
 import os
-import csv
+import glob
+import threading
 import json # Додано для роботи з JSON файлом мапінгів
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import BackgroundTasks
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.pipeline import Pipeline
-from sklearn.ensemble import RandomForestClassifier
-import joblib as _joblib
 import config # Ваш файл config.py
-import time
+from model_cache import ModelCache
+from overlay import CorrectionOverlay, OverlayModel
+from retrain_scheduler import RetrainScheduler
+from corrections_store import CorrectionsStore
+from global_corpus import GlobalCorpusProvider
+from merchant_index import OverrideIndex
+from category_registry import CategoryRegistry, file_lock
+from snapshot_state import SnapshotDict
+from prediction_cache import GLOBAL_MODEL_KEY, PredictionCache
+from micro_batcher import MicroBatcher
+from cascade import CascadePrediction, load_cascade
+from featurizer import ClassifierArtifact, FeatureMemo, FeaturizerRegistry, feature_predictor
+from backends import BACKENDS, atomic_joblib_dump, get_backend, load_model_artifact
+from compiled_forest import compiled_artifact_path
+from startup import READY, StartupTracker
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as METRICS_REGISTRY
+from metrics import SLOW_BUCKETS, CallbackGauge, Counter, Histogram
+from logging_setup import configure_logging
 from datetime import datetime # Глобальний імпорт для використання в save_model_status
 
 # --- 1. Ініціалізація FastAPI ---
@@ -23,100 +37,159 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Фази запуску та готовність (/health/ready); scikit-learn і модель вантажаться у фоні
+startup = StartupTracker()
+
+# Per-request записи — DEBUG; вивід у stderr виконує окремий потік (logging_setup.py)
+logger = configure_logging(config.LOG_LEVEL).getChild('api')
+
+# --- Метрики (/metrics) ---
+# path: override_exact | override_canonical | override_fuzzy | mcc_rule |
+#       personalized_cache | personalized_disk | global | error
+CATEGORIZE_LATENCY = Histogram('ml_categorize_duration_seconds',
+                               'Латентність /api/v1/categorize за шляхом розв\'язання категорії', ['path'])
+BATCH_LATENCY = Histogram('ml_categorize_batch_duration_seconds', 'Латентність /api/v1/categorize-batch')
+BATCH_ITEMS = Counter('ml_categorize_batch_items_total', 'Елементи батчів за шляхом розв\'язання категорії', ['path'])
+MODEL_LOAD_DURATION = Histogram('ml_model_load_duration_seconds', 'Тривалість завантаження моделей з диска',
+                                ['kind'], buckets=SLOW_BUCKETS)
+RETRAIN_DURATION = Histogram('ml_retrain_duration_seconds', 'Тривалість донавчання персональних моделей',
+                             ['mode'], buckets=SLOW_BUCKETS)
+ERRORS = Counter('ml_errors_total', 'Помилки за етапом обробки', ['stage'])
+MICROBATCH_SIZE = Histogram('ml_microbatch_size', 'Кількість одиночних запитів в одному мікробатчі',
+                            buckets=(1, 2, 4, 8, 16, 32, 64))
+MICROBATCH_WAIT = Histogram('ml_microbatch_wait_seconds', 'Час збирання мікробатчу до виклику predict')
+CASCADE_STAGE = Counter('ml_cascade_stage_total', 'Прогнози каскаду за моделлю, що відповіла', ['stage'])
+
 # --- Глобальні змінні для моделей ---
 global_model = None
 global_predict_function = None
+# (шлях, mtime, розмір) файлу завантаженої глобальної моделі: воркери serve.py
+# отримують її від батьківського процесу і не перечитують повторно
+global_model_signature = None
+
+# LRU-кеш результатів: (модель, версія, нормалізований опис) -> category_id
+prediction_cache = PredictionCache(max_entries=config.PREDICTION_CACHE_MAX_ENTRIES)
+
+
+def _observe_micro_batch(size, waited):
+    MICROBATCH_SIZE.observe(size)
+    MICROBATCH_WAIT.observe(waited)
 
-# Кеш для завантажених персоналізованих моделей
-personalized_models_cache = {}
 
-# Файл для збору виправлень від користувачів
+# Об'єднує одночасні одиночні прогнози до однієї моделі в один predict (micro_batcher.py)
+micro_batcher = MicroBatcher(max_batch_size=config.MICRO_BATCH_MAX_SIZE,
+                             max_wait_seconds=config.MICRO_BATCH_MAX_WAIT_MS / 1000,
+                             on_flush=_observe_micro_batch)
+
+# Глобальний корпус читається і векторизується один раз (для донавчань у режимі "full")
+global_corpus = GlobalCorpusProvider(config.DATA_FILE, cache_dir=config.GLOBAL_CORPUS_CACHE_DIR)
+
+# Заморожені TF-IDF за версією: глобальна модель і персональні класифікатори ділять один екземпляр
+featurizers = FeaturizerRegistry(config.FEATURIZER_DIR)
+
+# Кеш для завантажених персоналізованих моделей (LRU з обмеженням за кількістю/байтами та TTL)
+personalized_models_cache = ModelCache(
+    max_entries=config.PERSONALIZED_CACHE_MAX_ENTRIES,
+    max_bytes=config.PERSONALIZED_CACHE_MAX_BYTES,
+    ttl_seconds=config.PERSONALIZED_CACHE_TTL_SECONDS
+)
+
+# Старий CSV з виправленнями (лише джерело одноразової міграції у CORRECTIONS_DB_PATH)
 CORRECTIONS_FILE = "user_corrections.csv"
 MODEL_STATUS_FILE = "user_model_status.json"
 DYNAMIC_MAPPINGS_FILE = "dynamic_category_mappings.json" # <--- НОВИЙ ФАЙЛ
+
+# Стан, який запити читають, а виправлення та донавчання змінюють, — copy-on-write
+# SnapshotDict (snapshot_state.py): читання без блокувань, запис публікує нову версію.
+# Вкладені dict-и не змінюються на місці — записується їх нова копія.
+
 # in-memory status cache (user_id -> ISO timestamp)
-user_model_status = {}
+user_model_status = SnapshotDict()
 
 # per-user exact corrections map: { user_id: { normalized_description: category_id } }
-user_corrections_map = {}
+# (lazily filled per user from corrections_store)
+user_corrections_map = SnapshotDict()
+
+# Смуги блокувань (за хешем користувача) між читанням мапи з бази та її оновленням у
+# save_correction: інакше мапа, прочитана до upsert, встановлюється вже після того, як
+# save_correction її не знайшов, і нове виправлення губиться. Гарячі читання без блокувань.
+_CORRECTIONS_LOCK_STRIPES = 64
+_corrections_locks = tuple(threading.RLock() for _ in range(_CORRECTIONS_LOCK_STRIPES))
+
+
+def _corrections_lock(uid: str):
+    return _corrections_locks[hash(uid) % _CORRECTIONS_LOCK_STRIPES]
+
+# deterministic MCC rules derived by train.py: { mcc: category_id }
+mcc_rules = {}
+
+# per-user fuzzy override index built on top of user_corrections_map:
+# { user_id: (overrides_dict, len(overrides_dict), OverrideIndex) }
+user_override_indexes = SnapshotDict()
 
 # helper mapping of known id -> name (keeps parity with server mapping)
-# Цей словник буде оновлюватися при завантаженні динамічних мапінгів
-ID_TO_NAME = {
+BASE_CATEGORIES = {
     0: 'Інше', 1: 'Продукти', 2: 'Кафе', 3: 'Онлайн покупки', 4: 'Електроніка',
     5: 'Канцтовари', 6: 'Супермаркет', 7: 'Одяг', 8: 'Платежі/Термінали',
     9: 'Переказ', 10: 'Транспорт', 11: 'Мобільний', 12: 'Зоотовари', 13: "Косметика",
     14: 'Податки/Платежі державі', 15: 'Кондитерські', 16: 'Різне'
 }
 
-# inverse mapping
-NAME_TO_ID = {v: k for k, v in ID_TO_NAME.items()}
+# Евристика для назв, що не збіглися з жодною категорією: 'ліки', 'аптека' -> Косметика (13)
+CATEGORY_NAME_FALLBACKS = (('лік', 13), ('апте', 13))
+
+# Вбудовані + динамічні категорії (DYNAMIC_MAPPINGS_FILE), скомпільовані для розпізнавання назв
+category_registry = CategoryRegistry(BASE_CATEGORIES, DYNAMIC_MAPPINGS_FILE,
+                                     fallbacks=CATEGORY_NAME_FALLBACKS, default_name='Інше')
+
+# Поточні мапінги (лише для читання): підміняються цілком при зміні реєстру
+ID_TO_NAME = category_registry.id_to_name
+NAME_TO_ID = category_registry.name_to_id
+
+
+def _sync_category_globals():
+    global ID_TO_NAME, NAME_TO_ID
+    ID_TO_NAME = category_registry.id_to_name
+    NAME_TO_ID = category_registry.name_to_id
+
 
-# --- NEW FUNCTION FOR DYNAMIC ID CREATION ---
 def get_or_create_category_id(category_name: str) -> int:
     """
     Повертає існуючий ID або створює новий, якщо назви категорії не знайдено.
-    ОНОВЛЮЄ ГЛОБАЛЬНІ СЛОВНИКИ IN-MEMORY ТА ЗБЕРІГАЄ ЇХ НА ДИСК.
+    Новий ID призначається під блокуванням і атомарно зберігається у DYNAMIC_MAPPINGS_FILE.
     """
-    global ID_TO_NAME, NAME_TO_ID
-    
-    name = str(category_name).strip()
-    if not name:
-        return NAME_TO_ID.get('Інше', 0)
-        
-    if name in NAME_TO_ID:
-        return ID_TO_NAME[name]
-
-    # 2. Якщо не знайдено, створити новий ID
     try:
-        max_id = max(ID_TO_NAME.keys()) if ID_TO_NAME else 0
-        new_id = max_id + 1
-        
-        # Оновити глобальні мапінги
-        ID_TO_NAME[new_id] = name
-        NAME_TO_ID[name] = new_id
-        
-        # --- ЛОГІКА ЗБЕРЕЖЕННЯ НА ДИСК ---
-        try:
-            # Збираємо всі динамічні мапінги (ID > 16)
-            dynamic_mappings = {str(k): v for k, v in ID_TO_NAME.items() if k > 16}
-            
-            with open(DYNAMIC_MAPPINGS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(dynamic_mappings, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"❌ Помилка збереження динамічних мапінгів: {e}")
-        # --- КІНЕЦЬ ЛОГІКИ ЗБЕРЕЖЕННЯ ---
-        
-        print(f"✅ Створено новий ID категорії: {name} -> {new_id}")
-        return new_id
+        category_id, created = category_registry.get_or_create(category_name)
     except Exception as e:
-        print(f"❌ Помилка при створенні нового ID категорії {name}: {e}")
-        return NAME_TO_ID.get('Інше', 0)
-# --- END NEW FUNCTION ---
+        print(f"❌ Помилка при створенні нового ID категорії {category_name}: {e}")
+        return category_registry.name_to_id.get('Інше', 0)
+    if created:
+        _sync_category_globals()
+        print(f"✅ Створено новий ID категорії: {str(category_name).strip()} -> {category_id}")
+    return category_id
+
 
 def map_category_name_to_id(name_val: str):
-    if not name_val:
-        return None
-    nv = str(name_val).strip()
-    if nv in NAME_TO_ID:
-        return int(NAME_TO_ID[nv])
-    low = nv.lower()
-    for k, nm in ID_TO_NAME.items():
-        if low in nm.lower() or nm.lower() in low:
-            return int(k)
-    if 'лік' in low or 'апте' in low:
-        return 13
-    return None
+    """ID за назвою категорії: точний збіг, назва містить вхід або міститься в ньому, евристики."""
+    return category_registry.resolve(name_val)
+
+
+def map_category_names_to_ids(names):
+    """Пакетний map_category_name_to_id (міграція та читання виправлень)."""
+    return category_registry.resolve_many(names)
 
 def map_category_id_to_name(id_val: int):
-    """Повертає ім'я категорії за числовим ID. Використовує глобальний ID_TO_NAME."""
-    return ID_TO_NAME.get(id_val, 'Невідома категорія')
+    """Повертає ім'я категорії за числовим ID (категорію, створену іншим воркером, дочитує з файлу)."""
+    return category_registry.name_for(id_val, 'Невідома категорія')
 
 def normalize_description(desc: str):
     if desc is None:
         return ''
     return str(desc).strip().lower()
 
+# SQLite (WAL) сховище виправлень з індексом (user_id, нормалізований опис)
+corrections_store = CorrectionsStore(config.CORRECTIONS_DB_PATH, normalize=normalize_description)
+
 # helper to load existing status file at startup
 def load_model_status():
     global user_model_status
@@ -124,156 +197,285 @@ def load_model_status():
         if os.path.exists(MODEL_STATUS_FILE):
             with open(MODEL_STATUS_FILE, 'r', encoding='utf-8') as f:
                 import json
-                user_model_status = json.load(f)
+                user_model_status = SnapshotDict(json.load(f))
                 print('Loaded model status file for users:', list(user_model_status.keys()))
     except Exception as e:
         print('Could not load model status file:', e)
 
 
 def load_user_corrections():
-    """Load corrections CSV into user_corrections_map (in-memory), to allow exact-match overrides."""
-    global user_corrections_map
-    user_corrections_map = {}
-    if not os.path.exists(CORRECTIONS_FILE):
+    """
+    Одноразово переносить старі CSV-файли з виправленнями в SQLite-сховище та
+    скидає in-memory мапу: виправлення користувача завантажуються ліниво при
+    першому зверненні (get_user_corrections_map), тож старт не залежить від
+    загальної кількості виправлень.
+    """
+    user_corrections_map.clear()
+    try:
+        csv_files = [CORRECTIONS_FILE] + sorted(glob.glob('model_user_*.csv'))
+        for path in csv_files:
+            migrated = corrections_store.migrate_csv(path, resolve_category_names=map_category_names_to_ids)
+            if migrated:
+                print(f"✅ Перенесено {migrated} виправлень з {path} у {config.CORRECTIONS_DB_PATH}")
+    except Exception as e:
+        print('⚠️ Failed to migrate corrections CSV into the store:', e)
+
+
+# --- Синхронізація між воркер-процесами (serve.py) ---
+# Виправлення і персональні моделі пише той воркер, що прийняв запит; інші
+# помічають зміни через PRAGMA data_version бази та mtime файлів моделей.
+# revision — найбільший revision бази, який цей процес уже врахував.
+_cross_worker_sync = {'checked_at': 0.0, 'data_version': None, 'revision': None}
+# user_id -> mtime_ns файлу персональної моделі, яка зараз у кеші
+personalized_model_mtimes = SnapshotDict()
+
+
+def sync_corrections_with_other_workers():
+    """
+    Скидає кеші виправлень користувачів, яких змінили інші воркери
+    (не частіше ніж раз на CROSS_WORKER_SYNC_INTERVAL_SECONDS). Власні записи
+    процесу вже враховані save_correction і кешів не скидають.
+    """
+    if not config.CROSS_WORKER_SYNC:
         return
+    now = time.monotonic()
+    if now - _cross_worker_sync['checked_at'] < config.CROSS_WORKER_SYNC_INTERVAL_SECONDS:
+        return
+    _cross_worker_sync['checked_at'] = now
     try:
-        # Try a strict pandas load first but be resilient to malformed rows
-        try:
-            corr_df = pd.read_csv(CORRECTIONS_FILE, encoding='utf-8-sig', engine='python', on_bad_lines='skip')
-        except TypeError:
-            # older pandas might not support on_bad_lines arg in this env
-            corr_df = pd.read_csv(CORRECTIONS_FILE, encoding='utf-8-sig', engine='python')
-
-        # Some CSVs in the wild are malformed (mismatched columns) — normalize rows by reading raw
-        if corr_df is None or corr_df.empty:
-            # fallback to a robust csv.reader parsing
-            import csv as _csv
-            with open(CORRECTIONS_FILE, 'r', encoding='utf-8-sig', newline='') as f:
-                reader = _csv.reader(f)
-                # determine header (if any) — we'll accept either 4 or 6 columns header
-                rows = list(reader)
-                if not rows:
-                    return
-                header = rows[0]
-                # decide start index of data
-                data_rows = rows[1:]
-                # build corr_df from normalized rows
-                normalized = []
-                for i, cells in enumerate(data_rows, start=2):
-                    # map positions safely and join extras into corrected_category_name if present
-                    if len(cells) < 2:
-                        # skip extremely short rows
-                        print(f"⚠️ Skipping tiny/invalid row {i} in corrections file: {cells}")
-                        continue
-                    user_id = cells[0].strip() if len(cells) > 0 else ''
-                    description = cells[1].strip() if len(cells) > 1 else ''
-                    original_category_id = cells[2].strip() if len(cells) > 2 else ''
-                    corrected_category_id = cells[3].strip() if len(cells) > 3 else ''
-                    original_category_name = cells[4].strip() if len(cells) > 4 else ''
-                    corrected_category_name = ''
-                    if len(cells) > 5:
-                        corrected_category_name = ','.join([c.strip() for c in cells[5:]])
-                    normalized.append({
-                        'user_id': user_id,
-                        'description': description,
-                        'original_category_id': original_category_id,
-                        'corrected_category_id': corrected_category_id,
-                        'original_category_name': original_category_name,
-                        'corrected_category_name': corrected_category_name
-                    })
-                corr_df = pd.DataFrame(normalized)
-
-        for _, row in corr_df.iterrows():
-            uid = str(row.get('user_id', '')).strip()
-            desc = normalize_description(row.get('description', ''))
-            # try numeric first, then names
-            cat_id = None
-            raw_id = row.get('corrected_category_id', None)
-            if raw_id is not None and not pd.isna(raw_id) and str(raw_id).strip() != '':
-                try:
-                    cat_id = int(float(raw_id))
-                except Exception:
-                    cat_id = None
-
-            if cat_id is None:
-                name_val = row.get('corrected_category_name', '')
-                # Ця функція тепер використовує оновлені глобальні мапінги
-                cat_id = map_category_name_to_id(name_val) 
-
-            if uid and desc and cat_id is not None:
-                user_corrections_map.setdefault(uid, {})[desc] = int(cat_id)
+        version = corrections_store.data_version()
+        previous = _cross_worker_sync['data_version']
+        _cross_worker_sync['data_version'] = version
+        if previous is None or _cross_worker_sync['revision'] is None:
+            _cross_worker_sync['revision'] = corrections_store.last_revision()
+            return
+        if version == previous:
+            return
+        users, _cross_worker_sync['revision'] = corrections_store.changed_users_since(_cross_worker_sync['revision'])
+    except Exception as e:
+        print(f"⚠️ Не вдалося перевірити версію бази виправлень: {e}")
+        return
+    for uid in users:
+        # під замком користувача: холодне завантаження, що прочитало базу до чужого запису, не лишить стару мапу
+        with _corrections_lock(uid):
+            user_corrections_map.pop(uid, None)
+            user_override_indexes.pop(uid, None)
+
+
+def _personalized_model_path(user_id: str) -> str:
+    return f"model_user_{user_id}.joblib"
+
+
+def _file_mtime_ns(path: str):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def get_user_corrections_map(user_id: str) -> dict:
+    """Повертає {нормалізований опис: category_id} користувача, за потреби підвантажуючи зі сховища."""
+    sync_corrections_with_other_workers()
+    uid = str(user_id).strip()
+    overrides = user_corrections_map.get(uid)
+    if overrides is None:
+        with _corrections_lock(uid):
+            # save_correction цього користувача чекає, доки прочитана мапа не встановлена
+            overrides = user_corrections_map.get(uid)
+            if overrides is None:
+                overrides = user_corrections_map.setdefault(uid, corrections_store.get_user_overrides(uid))
+    return overrides
+
+def load_mcc_rules():
+    """Завантажує таблицю детермінованих MCC-правил, згенеровану train.py."""
+    global mcc_rules
+    mcc_rules = {}
+    if not config.MCC_RULES_ENABLED or not os.path.exists(config.MCC_RULES_PATH):
+        return
+    try:
+        with open(config.MCC_RULES_PATH, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        mcc_rules = {int(k): int(v['category_id']) for k, v in payload.get('rules', {}).items()}
+        print(f"✅ Завантажено {len(mcc_rules)} MCC-правил з {config.MCC_RULES_PATH}")
     except Exception as e:
-        print('⚠️ Failed to load corrections into memory:', e)
+        print(f"⚠️ Помилка завантаження MCC-правил: {e}")
+
+
+def find_mcc_rule(mcc):
+    """Повертає category_id з таблиці MCC-правил або None."""
+    if mcc is None or not mcc_rules:
+        return None
+    return mcc_rules.get(int(mcc))
+
 
 def save_model_status():
+    """
+    Записує статуси моделей, злиті з файлом: під flock файл перечитується, і для
+    кожного користувача лишається новіший час (інші воркери пишуть той самий файл).
+    Файл підміняється атомарно; статуси інших воркерів потрапляють і в пам'ять.
+    """
+    tmp_path = f"{MODEL_STATUS_FILE}.tmp.{os.getpid()}.{threading.get_ident()}"
     try:
-        import json
-        with open(MODEL_STATUS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(user_model_status, f, ensure_ascii=False, indent=2)
+        with file_lock(MODEL_STATUS_FILE):
+            merged = {}
+            if os.path.exists(MODEL_STATUS_FILE):
+                with open(MODEL_STATUS_FILE, 'r', encoding='utf-8') as f:
+                    merged = json.load(f)
+            theirs = {uid: ts for uid, ts in merged.items() if ts > user_model_status.get(uid, '')}
+            for uid, ts in user_model_status.items():
+                if ts > merged.get(uid, ''):
+                    merged[uid] = ts
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(merged, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, MODEL_STATUS_FILE)
+        if theirs:
+            user_model_status.update(theirs)
     except Exception as e:
         print('Could not save model status file:', e)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 
 # --- 2. Завантаження Глобальної Моделі (при старті сервера) ---
-@app.on_event("startup")
+def _model_file_signature(path: str):
+    if os.path.isdir(path):
+        # каталог save_pretrained (BERT): змінюється, коли переписано будь-який файл у ньому
+        stats = [os.stat(os.path.join(path, name)) for name in sorted(os.listdir(path))]
+        return (os.path.abspath(path), max((st.st_mtime_ns for st in stats), default=0),
+                sum(st.st_size for st in stats))
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+def global_model_types():
+    """Бекенди глобальної моделі: ланцюжок каскаду або один config.MODEL_TYPE."""
+    return list(config.CASCADE_MODEL_TYPES) if config.CASCADE_ENABLED else [config.MODEL_TYPE]
+
+
+def _intern_global_featurizers(model):
+    """TF-IDF глобальної моделі (кожної сходинки каскаду) стає спільним екземпляром своєї версії."""
+    for stage in [m for _, m in getattr(model, 'stages', [])] or [model]:
+        source = feature_predictor(stage)
+        if source is not None:
+            featurizers.intern(source[0])
+
+
 def load_global_model():
     """
-    Завантажує одну "чемпіонську" модель (RF або BERT) та динамічні мапінги категорій.
+    Завантажує "чемпіонську" модель (RF, LINEAR, BERT або їх каскад) та динамічні мапінги категорій.
+    Кожна фаза записується у startup (тривалість, статус) для /health/ready.
     """
-    global global_model, global_predict_function
-    global ID_TO_NAME, NAME_TO_ID # Оновлюємо глобальні словники
+    global global_model, global_predict_function, global_model_signature
     
     try:
-        if config.MODEL_TYPE == "BERT":
-            # ... (код завантаження BERT)
-            pass
-        elif config.MODEL_TYPE == "RF":
-            # ... (код завантаження RF)
-            model_path = config.SKLEARN_MODEL_PATH
-            print(f"🔄 Завантаження ГЛОБАЛЬНОЇ моделі SKlearn з {model_path}...")
-
-            if not os.path.exists(model_path):
-                print(f"⚠️ SKlearn model file not found at {model_path}. Please train the model (run train.py) or place the model file there.")
+        with startup.phase('global_model'):
+            model_types = global_model_types()
+            unknown = [name for name in model_types if name not in BACKENDS]
+            if unknown:
+                raise ValueError(f"Непідтримуваний тип моделі: {', '.join(unknown)}")
+            label = ' → '.join(model_types)
+            model_paths = [get_backend(name).model_path for name in model_types]
+            print(f"🔄 Завантаження ГЛОБАЛЬНОЇ моделі ({label}) з {', '.join(model_paths)}...")
+
+            missing_paths = [path for path in model_paths if not os.path.exists(path)]
+            if missing_paths:
+                raise FileNotFoundError(f"Model file not found at {missing_paths[0]}. Please train the model (run train.py) or place the model file there.")
+            signature = tuple(_model_file_signature(path) for path in model_paths)
+            if global_model is not None and global_model_signature == signature:
+                # воркер успадкував уже завантажену модель від serve.py (спільні сторінки пам'яті)
+                print(f"✅ Глобальна модель ({label}) вже завантажена, файл не змінився.")
             else:
-                global_model = joblib.load(model_path)
-                
-                def rf_predict(text: str) -> int:
-                    result = global_model.predict([text])[0]
-                    return int(result)
-
-                global_predict_function = rf_predict
-                print(f"✅ Глобальну модель ({config.MODEL_TYPE}) успішно завантажено.")
-        else:
-            print(f"❌❌❌ КРИТИЧНА ПОМИЛКА: Непідтримуваний тип моделі: {config.MODEL_TYPE}")
-            
+                load_started = time.perf_counter()
+                if config.CASCADE_ENABLED:
+                    global_model = load_cascade(model_types, threshold=config.CASCADE_CONFIDENCE_THRESHOLD)
+                else:
+                    global_model = get_backend(model_types[0]).load(model_paths[0])
+                MODEL_LOAD_DURATION.labels('global').observe(time.perf_counter() - load_started)
+                global_model_signature = signature
+                _intern_global_featurizers(global_model)
+
+                def global_predict(text: str) -> int:
+                    return int(global_model.predict([text])[0])
+
+                global_predict_function = global_predict
+                # нова глобальна модель: старі результати та оверлеї поверх старої моделі недійсні
+                prediction_cache.invalidate_all()
+                personalized_models_cache.clear()
+                print(f"✅ Глобальну модель ({label}) успішно завантажено.")
+
     except Exception as e:
         print(f"❌❌❌ КРИТИЧНА ПОМИЛКА: Не вдалося завантажити глобальну модель. {e}")
 
-    # --- НОВА ЛОГІКА: ЗАВАНТАЖЕННЯ ДИНАМІЧНИХ МЕППІНГІВ ---
+    # --- Динамічні мапінги категорій (category_registry) ---
     try:
-        if os.path.exists(DYNAMIC_MAPPINGS_FILE):
-            import json
-            with open(DYNAMIC_MAPPINGS_FILE, 'r', encoding='utf-8') as f:
-                dynamic_mappings = json.load(f)
-                
-            # Оновлюємо глобальні словники
-            updated_count = 0
-            for k_str, v in dynamic_mappings.items():
-                k = int(k_str)
-                if k not in ID_TO_NAME:
-                    ID_TO_NAME[k] = v
-                    NAME_TO_ID[v] = k
-                    updated_count += 1
+        with startup.phase('category_mappings'):
+            updated_count = category_registry.load()
+            _sync_category_globals()
             if updated_count > 0:
-                 print(f"✅ Завантажено {updated_count} динамічних мапінгів категорій з {DYNAMIC_MAPPINGS_FILE}. Максимальний ID: {max(ID_TO_NAME.keys())}")
+                print(f"✅ Завантажено {updated_count} динамічних мапінгів категорій з {DYNAMIC_MAPPINGS_FILE}. Максимальний ID: {max(ID_TO_NAME.keys())}")
     except Exception as e:
         print(f"⚠️ Помилка завантаження динамічних мапінгів: {e}")
-    # --- КІНЕЦЬ НОВОЇ ЛОГІКИ ---
 
     # load persisted per-user status map
-    load_model_status()
+    with startup.phase('model_status'):
+        load_model_status()
     # load corrections map into memory to support exact-match overrides
-    load_user_corrections()
+    with startup.phase('corrections'):
+        load_user_corrections()
+    # deterministic MCC -> category table (answered before any model call)
+    with startup.phase('mcc_rules'):
+        load_mcc_rules()
+
+
+def warmup_models():
+    """
+    Прогрів: перший прогноз платить за ліниву ініціалізацію (імпорти sklearn,
+    пул потоків joblib у RF, кеші аналізатора TF-IDF) — робимо це до першого запиту.
+    Результати не потрапляють у кеш прогнозів.
+    """
+    if global_model is None:
+        return
+    texts = list(config.WARMUP_TEXTS) or ['warmup']
+    with startup.phase('warmup'):
+        global_model.predict(texts[:1])
+        # батч, більший за швидкий шлях LinearTextModel, прогріває і звичайний sklearn-шлях
+        global_model.predict((texts * 32)[:32])
+        # канонізація мерчантів для нечіткого пошуку виправлень
+        OverrideIndex({normalize_description(t): 0 for t in texts}).lookup(texts[0] + ' 1')
+
+
+def run_startup():
+    """Повне завантаження стану (модель, мапінги, виправлення, MCC-правила) і прогрів."""
+    startup.begin()
+    ok = False
+    try:
+        load_global_model()
+        warmup_models()
+        ok = global_model is not None
+    except Exception as e:
+        print(f"❌ Помилка під час запуску: {e}")
+    finally:
+        startup.finish(ok)
+        print(f"🚦 Запуск завершено за {startup.snapshot()['startup_ms']} мс, готовність: {ok}")
+
+
+@app.on_event("startup")
+def start_loading():
+    if startup.state == READY:
+        # стан уже завантажено до fork (serve.py)
+        return
+    if config.STARTUP_MODE == "background":
+        # сервер одразу приймає з'єднання; /health/ready стане 200 після завантаження
+        threading.Thread(target=run_startup, name="startup-loader", daemon=True).start()
+    else:
+        run_startup()
+
+
+def wait_for_startup():
+    """Запити на категоризацію під час фонового завантаження чекають на нього (або отримують 503)."""
+    if startup.loading and not startup.wait(config.STARTUP_WAIT_SECONDS):
+        raise HTTPException(status_code=503, detail="Сервіс ще завантажує модель, спробуйте пізніше")
 
 
 # --- 3. Опис Моделей Даних (Pydantic) ---
@@ -281,6 +483,8 @@ def load_global_model():
 class TransactionInput(BaseModel):
     description: str
     user_id: str  # Важливо для персоналізації
+    mcc: Optional[int] = None  # MCC-код мерчанта (для детермінованих MCC-правил)
+    amount: Optional[float] = None
 
 class CorrectionInput(BaseModel):
     user_id: str
@@ -295,17 +499,53 @@ class CategorizationOutput(BaseModel):
     description: str
     category_id: int
     category_name: str
+    source: Optional[str] = None  # 'override' | 'mcc_rule' | 'personalized' | 'global'
+    override_rule: Optional[str] = None  # 'exact' | 'canonical' | 'fuzzy', якщо спрацювало виправлення
+    confidence: Optional[float] = None  # каскад: ймовірність класу від моделі, що відповіла
+    cascade_stage: Optional[str] = None  # каскад: бекенд, що відповів ('LINEAR', 'RF', ...)
+
+# --- Пакетна категоризація ---
+class BatchItemInput(BaseModel):
+    user_id: str
+    description: str
+    mcc: Optional[int] = None
+    amount: Optional[float] = None
+
+class BatchCategorizationInput(BaseModel):
+    items: List[BatchItemInput]
+
+class BatchItemOutput(BaseModel):
+    description: str
+    category_id: Optional[int] = None
+    category_name: Optional[str] = None
+    source: Optional[str] = None  # 'override' | 'mcc_rule' | 'personalized' | 'global'
+    override_rule: Optional[str] = None
+    confidence: Optional[float] = None
+    cascade_stage: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchTimings(BaseModel):
+    overrides_ms: float = 0.0
+    model_resolve_ms: float = 0.0
+    predict_ms: float = 0.0
+    total_ms: float = 0.0
+    items: int = 0
+    overrides: int = 0
+    mcc_rules: int = 0
+    model_groups: int = 0
+
+class BatchCategorizationOutput(BaseModel):
+    results: List[BatchItemOutput]
+    timings: BatchTimings
 
 
 # --- 4. Логіка Збереження Виправлень ---
 
-def save_correction_to_csv(correction: CorrectionInput):
+def save_correction(correction: CorrectionInput):
     """
-    Дописує нове виправлення в CSV-файл.
+    Зберігає виправлення у сховищі (upsert за користувачем та описом).
     Призначає числовий ID, якщо надано лише назву нової категорії.
     """
-    file_exists = os.path.isfile(CORRECTIONS_FILE)
-    
     # --- ЛОГІКА ДЛЯ ПРИЗНАЧЕННЯ ID (тепер зберігає ID на диск) ---
     corrected_id = correction.corrected_category_id
     corrected_name = correction.corrected_category_name
@@ -320,23 +560,15 @@ def save_correction_to_csv(correction: CorrectionInput):
             
     correction.corrected_category_id = corrected_id
     # --- КІНЕЦЬ ЛОГІКИ ---
-    
-    with open(CORRECTIONS_FILE, 'a', newline='', encoding='utf-8') as f:
-        # ensure consistent columns order when writing
-        fieldnames = ['user_id', 'description', 'original_category_id', 'corrected_category_id', 'original_category_name', 'corrected_category_name']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        if not file_exists:
-            writer.writeheader()
-        
-        row = {
-            'user_id': correction.user_id,
-            'description': correction.description,
-            'original_category_id': correction.original_category_id,
-            'corrected_category_id': corrected_id, 
-            'original_category_name': correction.original_category_name,
-            'corrected_category_name': corrected_name
-        }
-        writer.writerow(row)
+
+    corrections_store.upsert(
+        correction.user_id,
+        correction.description,
+        correction.original_category_id,
+        corrected_id,
+        correction.original_category_name,
+        corrected_name
+    )
         
     # update in-memory map for fast exact-match overrides
     try:
@@ -344,149 +576,144 @@ def save_correction_to_csv(correction: CorrectionInput):
         desc = normalize_description(correction.description)
         cat_id = corrected_id 
         
-        if uid and desc and cat_id is not None:
-            user_corrections_map.setdefault(uid, {})[desc] = int(cat_id)
-            print(f"[Corrections map] Updated in-memory corrections for user {uid}: '{desc}' -> {cat_id}")
+        if uid and desc:
+            # нова версія мапи = поточна + змінений ключ (вкладений dict не змінюється на місці:
+            # його читають без блокувань); мапу, яку ще не завантажено, прочитає з бази перший
+            # запит — _corrections_lock гарантує, що таке читання бачить цей upsert або
+            # встановлює мапу до нашого оновлення
+            def with_correction(overrides):
+                overrides = dict(overrides)
+                if cat_id is not None:
+                    overrides[desc] = int(cat_id)
+                else:
+                    overrides.pop(desc, None)
+                return overrides
+
+            with _corrections_lock(uid):
+                user_corrections_map.compute_if_present(uid, with_correction)
+            user_override_indexes.pop(uid, None)
+            logger.debug("[Corrections map] Updated in-memory corrections for user %s: '%s' -> %s", uid, desc, cat_id)
     except Exception as e:
-        print('⚠️ Failed to update in-memory corrections map:', e)
+        logger.warning('Failed to update in-memory corrections map: %s', e)
+
+
+# сумісність зі старими викликами
+save_correction_to_csv = save_correction
+
+
+def read_user_corrections(user_id: str):
+    """
+    Повертає список виправлень користувача [{'text_features', 'category_id'}] зі сховища
+    (і оновлює in-memory мапу точних виправлень).
+    """
+    user_corrections = []
+    overrides = {}
+    uid = str(user_id).strip()
+    try:
+        with _corrections_lock(uid):
+            rows = corrections_store.get_user_corrections(user_id)
+            # назви без ID розпізнаються одним пакетним викликом (кожна унікальна — один раз)
+            resolved = map_category_names_to_ids([row.get('corrected_category_name') if row.get('corrected_category_id') is None
+                                                  else None for row in rows])
+            for row, resolved_id in zip(rows, resolved):
+                desc = str(row.get('description') or '').strip()
+                corrected = row.get('corrected_category_id')
+                if corrected is None:
+                    corrected = resolved_id
+                if desc and corrected is not None:
+                    user_corrections.append({ 'text_features': desc, 'category_id': int(corrected) })
+                    overrides[row['norm_description']] = int(corrected)
+            # лише якщо мапи ще немає: save_correction тримає наявну мапу актуальною
+            user_corrections_map.setdefault(uid, overrides)
+    except Exception as rc_err:
+        print('⚠️ Failed to read corrections from the store:', rc_err)
+
+    return user_corrections
+
+
+def _train_overlay_model(user_id: str, user_corrections):
+    """
+    Режим "overlay": глобальна модель заморожена, для користувача зберігається
+    лише маленький nearest-neighbour оверлей по його виправленнях.
+    """
+    # остання корекція для однакового опису перемагає
+    latest = {}
+    for corr in user_corrections:
+        latest[normalize_description(corr['text_features'])] = corr
+    texts = [c['text_features'] for c in latest.values()]
+    labels = [c['category_id'] for c in latest.values()]
+
+    overlay = CorrectionOverlay(texts, labels, min_similarity=config.OVERLAY_MIN_SIMILARITY)
+    target_path = _personalized_model_path(user_id)
+    atomic_joblib_dump(overlay, target_path)
+    return OverlayModel(global_model, overlay), target_path
+
+
+def _train_full_personalized_model(user_id: str, user_corrections):
+    """
+    Режим "full": донавчання класифікатора (config.PERSONALIZED_MODEL_TYPE) на глобальних даних + виправленнях.
+    Глобальний корпус уже векторизований (global_corpus), тож векторизуються
+    лише рядки виправлень користувача. На диск пишеться лише класифікатор
+    (featurizer.ClassifierArtifact): TF-IDF корпусу спільний для всіх користувачів.
+    """
+    corpus = global_corpus.get()
+    X, y = corpus.with_extra_rows(
+        [c['text_features'] for c in user_corrections],
+        [c['category_id'] for c in user_corrections]
+    )
+
+    # Навчаємо класифікатор бекенду (TF-IDF з кешованим словником глобального корпусу)
+    backend = get_backend(config.PERSONALIZED_MODEL_TYPE or config.MODEL_TYPE)
+    if not hasattr(backend, 'fit_features'):
+        backend = get_backend("RF")
+    vectorizer = featurizers.intern(corpus.vectorizer, persist=True)
+    model = backend.fit_features(X, y, vectorizer, n_jobs=config.RETRAIN_N_JOBS)
+
+    target_path = _personalized_model_path(user_id)
+    atomic_joblib_dump(ClassifierArtifact.from_model(model, backend=backend.name), target_path)
+    # скомпільована копія старого повного Pipeline (якщо була) більше не відповідає файлу
+    stale_compiled = compiled_artifact_path(target_path)
+    if os.path.exists(stale_compiled):
+        os.remove(stale_compiled)
+    return model, target_path
+
 
 def retrain_personalized_model(user_id: str):
     """
-    Фонове донавчання персональної моделі (Random Forest) для користувача.
+    Фонове донавчання персональної моделі для користувача
+    (config.PERSONALIZATION_MODE: "overlay" або "full" — повне донавчання бекенду).
     """
     try:
         print(f"🔧 Retraining personalized model for user {user_id}...")
-        
-        if not os.path.exists(config.DATA_FILE):
-            print('⚠️ Global data file not found, skipping personalized training')
-            return
+        started = time.perf_counter()
 
-        df = pd.read_csv(config.DATA_FILE, encoding='utf-8-sig', sep=',', engine='python', on_bad_lines='skip')
-        
-        # Читаємо виправлення користувача
-        user_corrections = []
-        if os.path.exists(CORRECTIONS_FILE):
-            try:
-                # prefer pandas with skipping bad lines when available
-                try:
-                    corr_df = pd.read_csv(CORRECTIONS_FILE, encoding='utf-8-sig', engine='python', on_bad_lines='skip')
-                except TypeError:
-                    corr_df = pd.read_csv(CORRECTIONS_FILE, encoding='utf-8-sig', engine='python')
-
-                # if pandas couldn't read any rows (empty or malformed), fallback to robust parsing
-                if corr_df is None or corr_df.empty:
-                    import csv as _csv
-                    with open(CORRECTIONS_FILE, 'r', encoding='utf-8-sig', newline='') as f:
-                        reader = _csv.reader(f)
-                        rows = list(reader)
-                        if not rows:
-                            corr_rows = []
-                        else:
-                            header = rows[0]
-                            data_rows = rows[1:]
-                            normalized = []
-                            for i, cells in enumerate(data_rows, start=2):
-                                if len(cells) < 2:
-                                    print(f"⚠️ Skipping tiny/invalid row {i} in corrections file: {cells}")
-                                    continue
-                                user = cells[0].strip() if len(cells) > 0 else ''
-                                desc = cells[1].strip() if len(cells) > 1 else ''
-                                orig_id = cells[2].strip() if len(cells) > 2 else ''
-                                corr_id = cells[3].strip() if len(cells) > 3 else ''
-                                orig_name = cells[4].strip() if len(cells) > 4 else ''
-                                corr_name = ','.join([c.strip() for c in cells[5:]]) if len(cells) > 5 else (cells[5].strip() if len(cells) == 6 else '')
-                                normalized.append({
-                                    'user_id': user,
-                                    'description': desc,
-                                    'original_category_id': orig_id,
-                                    'corrected_category_id': corr_id,
-                                    'original_category_name': orig_name,
-                                    'corrected_category_name': corr_name
-                                })
-                            corr_df = pd.DataFrame(normalized)
-                            
-                            try:
-                                expected_cols = ['user_id', 'description', 'original_category_id', 'corrected_category_id', 'original_category_name', 'corrected_category_name']
-                                if len(header) < len(expected_cols) or any(c not in header for c in expected_cols):
-                                    import shutil
-                                    # Використовуємо локальний імпорт datetime
-                                    from datetime import datetime
-                                    bak_name = f"{CORRECTIONS_FILE}.bak.{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
-                                    try:
-                                        shutil.copy(CORRECTIONS_FILE, bak_name)
-                                        print(f"ℹ️ Corrections file header inconsistent — created backup: {bak_name}")
-                                        corr_df.to_csv(CORRECTIONS_FILE, index=False, encoding='utf-8-sig')
-                                        print(f"✅ Wrote cleaned corrections file with normalized 6-column header: {CORRECTIONS_FILE}")
-                                    except Exception as wr_err:
-                                        print('⚠️ Failed to backup/overwrite corrections file:', wr_err)
-                            except Exception:
-                                pass
-
-                if corr_df is not None and not corr_df.empty:
-                    corr_rows = corr_df[corr_df['user_id'] == user_id]
-                else:
-                    corr_rows = pd.DataFrame(columns=['user_id','description','original_category_id','corrected_category_id','original_category_name','corrected_category_name'])
-                
-                def resolve_category_id(row):
-                    val = row.get('corrected_category_id', None)
-                    if val is not None and not (pd.isna(val)):
-                        try:
-                            return int(float(val))
-                        except Exception:
-                            pass
-
-                    name_val = row.get('corrected_category_name', '')
-                    if isinstance(name_val, float) and pd.isna(name_val):
-                        name_val = ''
-                    name_val = str(name_val).strip()
-                    if name_val:
-                        mapped = map_category_name_to_id(name_val) 
-                        if mapped is not None:
-                            return mapped
-
-                    return None
-
-                for _, row in corr_rows.iterrows():
-                    desc = str(row.get('description', '')).strip()
-                    corrected = resolve_category_id(row)
-                    if desc and corrected is not None:
-                        user_corrections.append({ 'text_features': desc, 'category_id': int(corrected) })
-                        try:
-                            user_corrections_map.setdefault(user_id, {})[normalize_description(desc)] = int(corrected)
-                        except Exception:
-                            pass
-            except Exception as rc_err:
-                print('⚠️ Failed to read corrections file:', rc_err)
+        user_corrections = read_user_corrections(user_id)
 
         print(f"ℹ️ Found {len(user_corrections)} correction rows for user {user_id} to include in retraining")
         if len(user_corrections) == 0:
             print(f'ℹ️ No corrections found for {user_id}, skipping personalized training')
             return
 
-        # Об'єднуємо глобальні дані + виправлення
-        df_train = df[['text_features', 'category_id']].copy()
-        corr_df_user = pd.DataFrame(user_corrections)
-        df_comb = pd.concat([df_train, corr_df_user], ignore_index=True)
-
-        X = df_comb['text_features']
-        y = df_comb['category_id']
-
-        # Навчаємо легку модель
-        pipeline = Pipeline([
-            ('tfidf', TfidfVectorizer()),
-            ('rf', RandomForestClassifier(random_state=42, n_jobs=-1))
-        ])
+        mode = config.PERSONALIZATION_MODE
+        if mode == "overlay" and global_model is None:
+            print('⚠️ Global model is not loaded, falling back to full personalized training')
+            mode = "full"
+        elif mode == "overlay" and not get_backend(global_model_types()[0]).supports_overlay:
+            print(f'⚠️ Overlays need a TF-IDF global model ({global_model_types()[0]} has none), falling back to full personalized training')
+            mode = "full"
 
-        pipeline.fit(X, y)
-
-        target_path = f"model_user_{user_id}.joblib"
-        _joblib.dump(pipeline, target_path)
+        if mode == "overlay":
+            model, target_path = _train_overlay_model(user_id, user_corrections)
+        else:
+            if not os.path.exists(config.DATA_FILE):
+                print('⚠️ Global data file not found, skipping personalized training')
+                return
+            model, target_path = _train_full_personalized_model(user_id, user_corrections)
         
         # Оновлюємо кеш
-        def user_predict(text: str) -> int:
-            return int(pipeline.predict([text])[0])
-
-        personalized_models_cache[user_id] = user_predict
+        personalized_models_cache.put(user_id, model, nbytes=os.path.getsize(target_path))
+        personalized_model_mtimes[user_id] = _file_mtime_ns(target_path)
+        prediction_cache.invalidate_model(model_key_for(user_id, 'personalized'))
         # update status
         
         # --- ЯВНИЙ ЛОКАЛЬНИЙ ІМПОРТ (ВИПРАВЛЕННЯ ПОМИЛКИ datetime) ---
@@ -495,87 +722,400 @@ def retrain_personalized_model(user_id: str):
 
         user_model_status[user_id] = datetime.utcnow().isoformat()
         save_model_status()
-        print(f"✅ Personalized model for {user_id} trained and saved to {target_path}")
+        RETRAIN_DURATION.labels(mode).observe(time.perf_counter() - started)
+        duration_ms = (time.perf_counter() - started) * 1000
+        print(f"✅ Personalized model ({mode}) for {user_id} trained in {duration_ms:.1f} ms and saved to {target_path}")
         
     except Exception as e:
+        ERRORS.labels('retrain').inc()
         print('❌ Error retraining personalized model:', e)
+        # RetrainScheduler записує помилку в статус користувача (last_error)
+        raise
+
+
+# Debounce + single-flight: серія виправлень користувача -> одне донавчання
+retrain_scheduler = RetrainScheduler(
+    retrain_personalized_model,
+    quiet_window_seconds=config.RETRAIN_QUIET_WINDOW_SECONDS,
+    max_workers=config.RETRAIN_MAX_WORKERS
+)
+
+# Стан кешів і черги зчитується лише під час запиту /metrics
+CallbackGauge('ml_retrain_queue_depth', 'Користувачі, що очікують на донавчання',
+              lambda: retrain_scheduler.queue_depth())
+CallbackGauge('ml_retrain_running', 'Донавчання, що виконуються зараз', lambda: retrain_scheduler.running_count())
+CallbackGauge('ml_personalized_cache_entries', 'Персональні моделі в кеші',
+              lambda: personalized_models_cache.stats()['entries'])
+CallbackGauge('ml_personalized_cache_bytes', 'Оцінений розмір персональних моделей у кеші',
+              lambda: personalized_models_cache.stats()['estimated_bytes'])
+CallbackGauge('ml_personalized_cache_hit_ratio', 'Частка влучань у кеш персональних моделей',
+              lambda: personalized_models_cache.stats()['hit_ratio'])
+CallbackGauge('ml_prediction_cache_entries', 'Записи в кеші результатів прогнозу',
+              lambda: len(prediction_cache))
+CallbackGauge('ml_prediction_cache_hit_ratio', 'Частка влучань у кеш результатів прогнозу',
+              lambda: prediction_cache.stats()['hit_ratio'])
+CallbackGauge('ml_microbatch_max_size', 'Налаштований максимальний розмір мікробатчу',
+              lambda: micro_batcher.max_batch_size if config.MICRO_BATCHING_ENABLED else 0)
+CallbackGauge('ml_microbatch_max_wait_seconds', 'Налаштоване максимальне очікування мікробатчу',
+              lambda: micro_batcher.max_wait_seconds if config.MICRO_BATCHING_ENABLED else 0)
+CallbackGauge('ml_ready', '1 — модель завантажена та прогріта',
+              lambda: int(startup.state == READY and global_model is not None))
+CallbackGauge('ml_startup_phase_duration_seconds', 'Тривалість фаз запуску', labelnames=['phase'],
+              fn=lambda: {name: (p['duration_ms'] / 1000 if p['duration_ms'] is not None else None)
+                          for name, p in startup.snapshot()['phases'].items()})
+
+
+@app.on_event("shutdown")
+def stop_retrain_scheduler():
+    retrain_scheduler.shutdown()
 
 
 # --- 5. Кінцеві Точки (Endpoints) API ---
 
+def _load_personalized_model(user_id: str):
+    """Завантажує персональну модель з диска; повертає (модель, розмір файлу) або None."""
+    personalized_model_path = _personalized_model_path(user_id)
+    mtime_ns = _file_mtime_ns(personalized_model_path)
+    if mtime_ns is None:
+        return None
+    logger.debug("[Cache MISS] Знайдено персоналізовану модель на диску для %s", user_id)
+    try:
+        load_started = time.perf_counter()
+        personalized_model = load_model_artifact(personalized_model_path, featurizers=featurizers)
+        MODEL_LOAD_DURATION.labels('personalized').observe(time.perf_counter() - load_started)
+        if isinstance(personalized_model, CorrectionOverlay):
+            # оверлей працює лише поверх глобальної моделі
+            if global_model is None:
+                return None
+            personalized_model = OverlayModel(global_model, personalized_model)
+        if personalized_model_mtimes.get(user_id) != mtime_ns:
+            # файл новий для цього воркера (напр., модель витіснили з кешу, а інший воркер
+            # її перенавчив): закешовані прогнози попередньої версії більше не дійсні
+            prediction_cache.invalidate_model(model_key_for(user_id, 'personalized'))
+        personalized_model_mtimes[user_id] = mtime_ns
+        return personalized_model, os.path.getsize(personalized_model_path)
+    except Exception as e:
+        ERRORS.labels('model_load').inc()
+        logger.warning("Помилка завантаження персоналізованої моделі %s: %s", user_id, e)
+        return None
+
+
+def get_model_for_user(user_id: str):
+    """
+    Повертає (модель, джерело) для користувача: персональну модель з кешу/диска або глобальну.
+    Модель має метод predict(list_of_texts) — це дозволяє векторизований прогноз для батчів.
+    """
+    model, source, _ = resolve_model_for_user(user_id)
+    return model, source
+
+
+def resolve_model_for_user(user_id: str):
+    """Як get_model_for_user, плюс шлях для метрик: personalized_cache | personalized_disk | global."""
+    if config.CROSS_WORKER_SYNC and user_id in personalized_models_cache:
+        # модель могла бути перенавчена іншим воркером: файл на диску новіший за кешовану копію
+        current_mtime = _file_mtime_ns(_personalized_model_path(user_id))
+        if current_mtime is not None and current_mtime != personalized_model_mtimes.get(user_id):
+            personalized_models_cache.pop(user_id)
+            prediction_cache.invalidate_model(model_key_for(user_id, 'personalized'))
+
+    # 1-2. Кеш, а при промаху — персональна модель з диска
+    loaded_from_disk = []
+
+    def _loader():
+        loaded_from_disk.append(True)
+        return _load_personalized_model(user_id)
+
+    personalized_model = personalized_models_cache.get_or_load(user_id, _loader)
+    if personalized_model is not None:
+        return personalized_model, 'personalized', 'personalized_disk' if loaded_from_disk else 'personalized_cache'
+
+    # 3. Глобальна модель (BERT або RF)
+    logger.debug("[Cache MISS] Використання ГЛОБАЛЬНОЇ моделі для %s", user_id)
+    return global_model, 'global', 'global'
+
+
+def get_user_override_index(user_id: str) -> OverrideIndex:
+    """Повертає (кешований) нечіткий індекс виправлень користувача."""
+    uid = str(user_id).strip()
+    overrides = get_user_corrections_map(uid)
+    cached = user_override_indexes.get(uid)
+    if cached is not None and cached[0] is overrides and cached[1] == len(overrides):
+        return cached[2]
+    index = OverrideIndex(overrides, threshold=config.OVERRIDE_FUZZY_THRESHOLD, normalize=normalize_description)
+    user_override_indexes[uid] = (overrides, len(overrides), index)
+    return index
+
+
+def find_user_override(user_id: str, description: str):
+    """
+    Шукає виправлення користувача для опису: точний збіг, канонічна форма
+    мерчанта або нечіткий (триграмний) збіг. Повертає OverrideMatch або None.
+    """
+    if not user_id or not normalize_description(description):
+        return None
+    return get_user_override_index(user_id).lookup(description)
+
+
+def model_key_for(user_id: str, source: str) -> str:
+    """Ідентичність моделі для кешу результатів: персональна модель користувача або глобальна."""
+    return f"user:{user_id}" if source == 'personalized' else GLOBAL_MODEL_KEY
+
+
+def predict_categories(model, model_key: str, texts):
+    """Як predict_categories_detailed, але лише category_id."""
+    return [p.category_id for p in predict_categories_detailed(model, model_key, texts)]
+
+
+def predict_categories_detailed(model, model_key: str, texts, features=None):
+    """
+    Прогноз для списку описів через кеш результатів: повторні описи беруться
+    з кешу, а унікальні промахи прогнозуються одним predict. Повертає
+    CascadePrediction (впевненість і сходинка — лише для каскаду, інакше None).
+    Промах одиночного опису (/categorize) іде через micro_batcher, щоб
+    одночасні запити до тієї ж моделі поділили один predict.
+    features (FeatureMemo батчу) — ознаки, спільні з іншими моделями того ж TF-IDF.
+    """
+    detailed = hasattr(model, 'predict_details')
+    method = 'predict_details' if detailed else 'predict'
+
+    def as_prediction(pred):
+        if detailed:
+            CASCADE_STAGE.labels(pred.stage).inc()
+            return pred
+        return CascadePrediction(int(pred), None, None)
+
+    keys = [prediction_cache.key_for(model_key, normalize_description(t)) for t in texts]
+    results = [prediction_cache.get(k) for k in keys]
+    missing = {}
+    for key, text, cached in zip(keys, texts, results):
+        if cached is None and key not in missing:
+            missing[key] = text
+    if len(texts) == 1 and missing and config.MICRO_BATCHING_ENABLED:
+        (key, text), = missing.items()
+        pred = as_prediction(micro_batcher.predict(model_key, model, text, method=method))
+        prediction_cache.put(key, pred)
+        return [cached if cached is not None else pred for cached in results]
+    if missing:
+        fresh = {}
+        if features is not None and not detailed and features.shares(model):
+            preds = features.predict(model, list(missing.values()))
+        else:
+            preds = getattr(model, method)(list(missing.values()))
+        for key, pred in zip(missing, preds):
+            fresh[key] = as_prediction(pred)
+            prediction_cache.put(key, fresh[key])
+        results = [cached if cached is not None else fresh[key] for key, cached in zip(keys, results)]
+    return results
+
+
 @app.post("/api/v1/categorize", response_model=CategorizationOutput)
 def categorize_transaction(transaction: TransactionInput):
     """
     Приймає транзакцію і повертає категорію та її ID/Назву.
     """
-    global global_predict_function, personalized_models_cache
-    
-    predict_function_to_use = None
+    wait_for_startup()
     user_id = transaction.user_id
-    
-    personalized_model_path = f"model_user_{user_id}.joblib" 
-    start_time = time.time()
-    # 1. Перевірка кешу
-    if user_id in personalized_models_cache:
-        predict_function_to_use = personalized_models_cache[user_id]
-        print(f"[Cache HIT] Використання моделі з кешу для {user_id}")
-
-    # 2. Перевірка диска (персональна модель)
-    elif os.path.exists(personalized_model_path):
-        print(f"[Cache MISS] Знайдено персоналізовану модель на диску для {user_id}")
-        try:
-            personalized_model = joblib.load(personalized_model_path)
-            
-            def personalized_predict(text: str) -> int:
-                return int(personalized_model.predict([text])[0])
-            
-            predict_function_to_use = personalized_predict
-            personalized_models_cache[user_id] = predict_function_to_use
-            
-        except Exception as e:
-            print(f"Помилка завантаження персоналізованої моделі: {e}")
-            predict_function_to_use = global_predict_function 
-    
-    # 3. Глобальна модель (BERT або RF)
-    else:
-        print(f"[Cache MISS] Використання ГЛОБАЛЬНОЇ моделі для {user_id}")
-        predict_function_to_use = global_predict_function
-            
-    # Check exact-match user corrections first (fast override)
+    start_time = time.perf_counter()
+
+    # Check user corrections first (exact / canonical merchant / fuzzy override)
     try:
-        desc_norm = normalize_description(transaction.description)
-        if user_id and desc_norm and user_corrections_map.get(user_id) and desc_norm in user_corrections_map[user_id]:
-            corrected_id = int(user_corrections_map[user_id][desc_norm])
+        override = find_user_override(user_id, transaction.description)
+        if override is not None:
+            corrected_id = override.category_id
             corrected_name = map_category_id_to_name(corrected_id)
-            print(f"[Exact override] Using user correction for {user_id} - '{transaction.description}' -> {corrected_id} ({corrected_name})")
+            logger.debug("[Override:%s] Using user correction for %s - '%s' -> %s (%s)",
+                         override.rule, user_id, transaction.description, corrected_id, corrected_name)
+            CATEGORIZE_LATENCY.labels(f'override_{override.rule}').observe(time.perf_counter() - start_time)
             return { 
                 'description': transaction.description, 
                 'category_id': corrected_id,
-                'category_name': corrected_name
+                'category_name': corrected_name,
+                'source': 'override',
+                'override_rule': override.rule
             }
     except Exception as e:
-        print('⚠️ Error checking user corrections map:', e)
+        ERRORS.labels('override_lookup').inc()
+        logger.warning('Error checking user corrections map: %s', e)
 
-    if predict_function_to_use is None:
+    # Детерміноване MCC-правило (без виклику моделі)
+    rule_id = find_mcc_rule(transaction.mcc)
+    if rule_id is not None:
+        CATEGORIZE_LATENCY.labels('mcc_rule').observe(time.perf_counter() - start_time)
+        return {
+            'description': transaction.description,
+            'category_id': rule_id,
+            'category_name': map_category_id_to_name(rule_id),
+            'source': 'mcc_rule'
+        }
+
+    model, source, path = resolve_model_for_user(user_id)
+    if model is None:
+        ERRORS.labels('model_unavailable').inc()
         return {"error": "Глобальна модель не завантажена"}, 500
         
     try:
-        category_id = predict_function_to_use(transaction.description)
-        end_time = time.time() # ⏱️ Засікаємо кінець
-        duration_ms = (end_time - start_time) * 1000  # Переводимо в мілісекунди
+        prediction = predict_categories_detailed(model, model_key_for(user_id, source), [transaction.description])[0]
+        category_id = prediction.category_id
+        duration = time.perf_counter() - start_time # ⏱️ Засікаємо кінець
+        CATEGORIZE_LATENCY.labels(path).observe(duration)
         
         category_name = map_category_id_to_name(category_id)
         
-        print(f"⏱️ [PERFORMANCE] Час інференсу: {duration_ms:.2f} мс")
+        logger.debug("⏱️ [PERFORMANCE] Час інференсу (%s): %.2f мс", path, duration * 1000)
         return {
             "description": transaction.description,
             "category_id": category_id,
-            "category_name": category_name
+            "category_name": category_name,
+            "source": source,
+            "confidence": prediction.confidence,
+            "cascade_stage": prediction.stage
         }
     except Exception as e:
+        ERRORS.labels('predict').inc()
+        CATEGORIZE_LATENCY.labels('error').observe(time.perf_counter() - start_time)
         return {"error": f"Помилка під час прогнозування: {str(e)}"}, 400
 
 
+@app.post("/api/v1/categorize-batch", response_model=BatchCategorizationOutput)
+def categorize_batch(batch: BatchCategorizationInput):
+    """
+    Пакетна категоризація: спочатку виправлення користувачів та MCC-правила, далі
+    решта описів групується за моделлю (персональна/глобальна) і для кожної
+    групи виконується один векторизований predict. Порядок результатів
+    збігається з порядком вхідних елементів.
+    """
+    t_start = time.perf_counter()
+    results = [None] * len(batch.items)
+
+    if len(batch.items) > config.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {config.BATCH_MAX_ITEMS} items)")
+    wait_for_startup()
+
+    # 1. Виправлення користувачів (точні / канонічні / нечіткі), далі MCC-правила
+    pending = []  # (index, item)
+    for i, item in enumerate(batch.items):
+        if not str(item.description or '').strip():
+            results[i] = {'description': item.description, 'error': 'Empty description'}
+            continue
+        try:
+            override = find_user_override(item.user_id, item.description)
+        except Exception as e:
+            override = None
+            ERRORS.labels('override_lookup').inc()
+            logger.warning('Error checking user corrections map: %s', e)
+        if override is not None:
+            results[i] = {
+                'description': item.description,
+                'category_id': override.category_id,
+                'category_name': map_category_id_to_name(override.category_id),
+                'source': 'override',
+                'override_rule': override.rule
+            }
+            continue
+        rule_id = find_mcc_rule(item.mcc)
+        if rule_id is not None:
+            results[i] = {
+                'description': item.description,
+                'category_id': rule_id,
+                'category_name': map_category_id_to_name(rule_id),
+                'source': 'mcc_rule'
+            }
+        else:
+            pending.append((i, item))
+    t_overrides = time.perf_counter()
+
+    # 2. Групування за моделлю, що обслуговує користувача
+    groups = {}  # group_key -> {'model', 'source', 'indices', 'texts'}
+    models_by_user = {}
+    for i, item in pending:
+        if item.user_id not in models_by_user:
+            models_by_user[item.user_id] = resolve_model_for_user(item.user_id)
+        model, source, path = models_by_user[item.user_id]
+        key = model_key_for(item.user_id, source)
+        group = groups.setdefault(key, {'model': model, 'source': source, 'path': path, 'indices': [], 'texts': []})
+        group['indices'].append(i)
+        group['texts'].append(item.description)
+    t_resolve = time.perf_counter()
+
+    # 3. Один predict на групу (повторні описи — з кешу результатів); групи з однаковим
+    # TF-IDF (глобальна модель, оверлеї, персональні класифікатори) векторизуються разом
+    features = FeatureMemo()
+    for group in groups.values():
+        if group['model'] is not None:
+            features.register(group['model'], group['texts'])
+    for key, group in groups.items():
+        BATCH_ITEMS.labels(group['path']).inc(len(group['indices']))
+        if group['model'] is None:
+            ERRORS.labels('model_unavailable').inc()
+            for i in group['indices']:
+                results[i] = {'description': batch.items[i].description, 'error': 'Глобальна модель не завантажена'}
+            continue
+        try:
+            predictions = predict_categories_detailed(group['model'], key, group['texts'], features=features)
+            for i, prediction in zip(group['indices'], predictions):
+                results[i] = {
+                    'description': batch.items[i].description,
+                    'category_id': prediction.category_id,
+                    'category_name': map_category_id_to_name(prediction.category_id),
+                    'source': group['source'],
+                    'confidence': prediction.confidence,
+                    'cascade_stage': prediction.stage
+                }
+        except Exception as e:
+            ERRORS.labels('predict').inc()
+            for i in group['indices']:
+                results[i] = {'description': batch.items[i].description, 'error': f"Помилка під час прогнозування: {str(e)}"}
+    t_end = time.perf_counter()
+
+    timings = {
+        'overrides_ms': (t_overrides - t_start) * 1000,
+        'model_resolve_ms': (t_resolve - t_overrides) * 1000,
+        'predict_ms': (t_end - t_resolve) * 1000,
+        'total_ms': (t_end - t_start) * 1000,
+        'items': len(batch.items),
+        'overrides': sum(1 for r in results if r and r.get('source') == 'override'),
+        'mcc_rules': sum(1 for r in results if r and r.get('source') == 'mcc_rule'),
+        'model_groups': len(groups)
+    }
+    for r in results:
+        if r and r.get('source') == 'override':
+            BATCH_ITEMS.labels(f"override_{r['override_rule']}").inc()
+    if timings['mcc_rules']:
+        BATCH_ITEMS.labels('mcc_rule').inc(timings['mcc_rules'])
+    BATCH_LATENCY.observe(t_end - t_start)
+    logger.debug("⏱️ [PERFORMANCE] Батч з %d описів: %.2f мс (%d груп моделей)", len(batch.items), timings['total_ms'], len(groups))
+    return {'results': results, 'timings': timings}
+
+
+@app.get('/health/live')
+def health_live():
+    """Процес живий і обробляє запити (не залежить від завантаження моделі)."""
+    return {'status': 'alive', 'startup_state': startup.state}
+
+
+@app.get('/health/ready')
+def health_ready():
+    """200 — модель завантажена та прогріта; 503 — ще завантажується або завантаження не вдалося."""
+    snapshot = startup.snapshot()
+    ready = snapshot['state'] == READY and global_model is not None
+    body = {
+        'ready': ready,
+        'model_type': config.MODEL_TYPE,
+        'cascade': global_model_types() if config.CASCADE_ENABLED else None,
+        'global_model_loaded': global_model is not None,
+        'mcc_rules': len(mcc_rules),
+        'import_ms': IMPORT_MS,
+        **snapshot,
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+
+@app.get('/metrics')
+def metrics():
+    """Метрики у форматі Prometheus."""
+    return Response(content=METRICS_REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get('/api/v1/user-model-status/{user_id}')
 def get_user_model_status(user_id: str):
     """Return simple status for user's personalized model: if exists and when it was last trained."""
@@ -589,26 +1129,48 @@ def get_user_model_status(user_id: str):
         return { 'error': str(e) }, 500
 
 
+@app.get('/api/v1/retrain-status/{user_id}')
+def get_retrain_status(user_id: str):
+    """Return scheduler state of user's personalized retrain and the global retrain queue depth."""
+    return {
+        'user_id': user_id,
+        'retrain': retrain_scheduler.status(user_id),
+        'queue_depth': retrain_scheduler.queue_depth(),
+        'running': retrain_scheduler.running_count()
+    }
+
+
+@app.get('/api/v1/cache-stats')
+def get_cache_stats():
+    """Return counters of the personalized models cache and the prediction result cache."""
+    return {
+        'personalized_models': personalized_models_cache.stats(),
+        'predictions': prediction_cache.stats(),
+        'micro_batching': {'enabled': config.MICRO_BATCHING_ENABLED, **micro_batcher.stats()}
+    }
+
+
 @app.get('/api/v1/user-corrections/{user_id}')
 def get_user_corrections(user_id: str):
     """Return in-memory corrections map for a user (description->category_id) for debugging/inspection."""
     try:
-        data = user_corrections_map.get(user_id, {})
+        data = get_user_corrections_map(user_id)
         return { 'user_id': user_id, 'corrections': data }
     except Exception as e:
         return { 'error': str(e) }, 500
 
 
 @app.post("/api/v1/submit-correction")
-def submit_correction(correction: CorrectionInput, background_tasks: BackgroundTasks):
+def submit_correction(correction: CorrectionInput):
     try:
-        save_correction_to_csv(correction)
-        # Запуск фонового завдання (не блокує відповідь)
-        background_tasks.add_task(retrain_personalized_model, correction.user_id)
-        print(f"✅ Отримано та збережено виправлення від {correction.user_id}")
+        save_correction(correction)
+        # Планування фонового донавчання (не блокує відповідь; серії виправлень зливаються)
+        retrain_scheduler.submit(correction.user_id)
+        logger.info("Отримано та збережено виправлення від %s", correction.user_id)
         return {"status": "correction_received"}
     except Exception as e:
-        print(f"❌ Помилка збереження виправлення: {str(e)}")
+        ERRORS.labels('correction_save').inc()
+        logger.error("Помилка збереження виправлення: %s", e)
         return {"error": f"Не вдалося зберегти виправлення: {str(e)}"}, 500
 
 
@@ -624,6 +1186,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Час імпорту модуля (без важких залежностей — вони вантажаться у run_startup)
+IMPORT_MS = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 2)
+
 if __name__ == "__main__":
     import uvicorn
     print("🚀 Запуск ML API-сервера на http://localhost:8000")
@@ -0,0 +1,356 @@
+"""
+Реєстр бекендів моделей, спільний для train.py, глобальної моделі в api.py
+та донавчання персональних моделей.
+
+Кожен бекенд описує, як навчити (fit / fit_features), зберегти, завантажити та
+виконати (батчевий) прогноз. Завантажена модель завжди має метод
+predict(list_of_texts). Перемикання бекенду — лише зміна config.MODEL_TYPE.
+"""
+import os
+import threading
+
+import numpy as np
+
+import config
+
+BACKENDS = {}
+
+
+def mmap_mode():
+    """
+    Режим memory-mapping для joblib.load: масиви моделі (збереженої без стиснення)
+    читаються з page cache і фізично спільні для всіх воркерів (serve.py).
+    """
+    return 'r' if getattr(config, 'MODEL_MMAP', False) else None
+
+
+def atomic_joblib_dump(obj, path):
+    """Пише артефакт у тимчасовий файл і атомарно підміняє ним path (інші воркери не побачать напівзаписаний файл)."""
+    import joblib
+    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    try:
+        joblib.dump(obj, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def register_backend(name: str):
+    """Декоратор класу бекенду: реєструє його екземпляр під іменем name."""
+    def decorator(cls):
+        cls.name = name
+        BACKENDS[name] = cls()
+        return cls
+    return decorator
+
+
+def get_backend(name: str = None):
+    name = name or config.MODEL_TYPE
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Непідтримуваний тип моделі: {name}. Доступні: {sorted(BACKENDS)}")
+
+
+class ModelBackend:
+    """Базовий інтерфейс бекенду."""
+    name = None
+    # чи можна будувати персональні оверлеї (overlay.py) поверх моделі: потрібен TF-IDF featurizer
+    supports_overlay = False
+
+    @property
+    def model_path(self) -> str:
+        raise NotImplementedError
+
+    def fit(self, texts, labels, n_jobs=None):
+        raise NotImplementedError
+
+    def save(self, model, path=None):
+        raise NotImplementedError
+
+    def load(self, path=None):
+        raise NotImplementedError
+
+    def predict(self, model, texts):
+        """Батчевий прогноз: масив category_id для списку описів."""
+        return np.asarray(model.predict(list(texts)), dtype=np.int64)
+
+    def predict_one(self, model, text: str) -> int:
+        return int(self.predict(model, [text])[0])
+
+
+class SklearnTextBackend(ModelBackend):
+    """TF-IDF + sklearn-класифікатор, що зберігається як Pipeline у joblib."""
+    path_setting = 'SKLEARN_MODEL_PATH'
+    supports_overlay = True
+
+    @property
+    def model_path(self) -> str:
+        return getattr(config, self.path_setting)
+
+    def make_featurizer(self):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        return TfidfVectorizer()
+
+    def make_classifier(self, n_jobs=None):
+        raise NotImplementedError
+
+    def _pipeline(self, featurizer, classifier):
+        from sklearn.pipeline import Pipeline
+        return Pipeline([('tfidf', featurizer), ('model', classifier)])
+
+    def fit(self, texts, labels, n_jobs=None):
+        pipeline = self._pipeline(self.make_featurizer(), self.make_classifier(n_jobs=n_jobs))
+        pipeline.fit(texts, labels)
+        return pipeline
+
+    def fit_features(self, X, labels, featurizer, n_jobs=None, sample_weight=None):
+        """Навчання лише класифікатора на вже векторизованих ознаках (featurizer вже навчений)."""
+        classifier = self.make_classifier(n_jobs=n_jobs)
+        classifier.fit(X, labels, sample_weight=sample_weight)
+        return self._pipeline(featurizer, classifier)
+
+    def fit_soft(self, texts, soft_labels, classes, n_jobs=None, min_weight=0.01):
+        """
+        Навчання на м'яких мітках (дистиляція, train.py --distill): soft_labels[i, k] —
+        ймовірність класу classes[k] для texts[i]. Кожен опис стає рядками (опис, клас)
+        з вагою-ймовірністю (ймовірності < min_weight відкидаються), тож зважена
+        функція втрат класифікатора — крос-ентропія з розподілом вчителя.
+        TF-IDF навчається на унікальних описах, тож idf не залежить від розгортання.
+        """
+        soft_labels = np.asarray(soft_labels, dtype=np.float64)
+        featurizer = self.make_featurizer()
+        X = featurizer.fit_transform(list(texts))
+        rows, cols = np.nonzero(soft_labels >= min_weight)
+        return self.fit_features(X[rows], np.asarray(classes)[cols], featurizer, n_jobs=n_jobs,
+                                 sample_weight=soft_labels[rows, cols])
+
+    def save(self, model, path=None):
+        atomic_joblib_dump(model, path or self.model_path)
+
+    def load(self, path=None):
+        import joblib
+        return joblib.load(path or self.model_path, mmap_mode=mmap_mode())
+
+
+def compiled_rf_enabled() -> bool:
+    return getattr(config, 'RF_COMPILED_INFERENCE', False)
+
+
+def _is_forest_pipeline(pipeline) -> bool:
+    return hasattr(pipeline, 'steps') and hasattr(pipeline[-1], 'estimators_')
+
+
+@register_backend("RF")
+class RandomForestBackend(SklearnTextBackend):
+    """
+    TF-IDF + RandomForest. З config.RF_COMPILED_INFERENCE прогноз виконує
+    скомпільована модель (compiled_forest.py): save() пише поруч з Pipeline
+    скомпільований артефакт, load() бере його (або компілює Pipeline на льоту).
+    """
+    path_setting = 'SKLEARN_MODEL_PATH'
+
+    def make_classifier(self, n_jobs=None):
+        from sklearn.ensemble import RandomForestClassifier
+        # n_jobs=-1 (використовувати всі ядра) за замовчуванням
+        return RandomForestClassifier(random_state=42, n_jobs=-1 if n_jobs is None else n_jobs)
+
+    def _serving(self, pipeline):
+        if not (compiled_rf_enabled() and _is_forest_pipeline(pipeline)):
+            # SKLEARN_MODEL_PATH може містити не-лісовий Pipeline (напр., від старих train.py --select)
+            return wrap_loaded_model(pipeline)
+        from compiled_forest import compile_forest
+        return compile_forest(pipeline)
+
+    def fit(self, texts, labels, n_jobs=None):
+        return self._serving(super().fit(texts, labels, n_jobs=n_jobs))
+
+    def fit_features(self, X, labels, featurizer, n_jobs=None, sample_weight=None):
+        return self._serving(super().fit_features(X, labels, featurizer, n_jobs=n_jobs,
+                                                  sample_weight=sample_weight))
+
+    def save(self, model, path=None):
+        path = path or self.model_path
+        pipeline = getattr(model, 'pipeline', model)
+        if pipeline is None:
+            raise ValueError("Скомпільована модель, завантажена з диска, не містить Pipeline для збереження")
+        atomic_joblib_dump(pipeline, path)
+        if compiled_rf_enabled() and _is_forest_pipeline(pipeline):
+            from compiled_forest import export_compiled
+            export_compiled(model, path)
+
+    def load(self, path=None):
+        path = path or self.model_path
+        if compiled_rf_enabled():
+            from compiled_forest import load_compiled
+            compiled = load_compiled(path)
+            if compiled is not None:
+                return compiled
+        return self._serving(super().load(path))
+
+
+class LinearTextModel:
+    """
+    Компактна лінійна модель над TF-IDF з швидким шляхом для коротких описів.
+
+    Для кількох описів ознаки рахуються напряму через словник векторизатора
+    (без валідації та розрідженої матриці sklearn), тож прогноз одного рядка
+    займає мікросекунди; великі батчі йдуть через звичайний sklearn-шлях.
+    Результати ідентичні Pipeline.predict.
+    """
+    FAST_PATH_MAX_ROWS = 16
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.featurizer = pipeline[:-1]
+        self.classifier = pipeline[-1]
+        vectorizer = pipeline[0]
+        self._analyzer = vectorizer.build_analyzer()
+        self._vocabulary = vectorizer.vocabulary_
+        self._idf = vectorizer.idf_ if getattr(vectorizer, 'use_idf', True) else None
+        self._sublinear = getattr(vectorizer, 'sublinear_tf', False)
+        self._norm = getattr(vectorizer, 'norm', 'l2')
+        # транспонований view без копії: при mmap-завантаженні ваги лишаються спільними для воркерів
+        self._coef_t = self.classifier.coef_.T
+        self._intercept = np.asarray(self.classifier.intercept_, dtype=np.float64)
+        self.classes_ = self.classifier.classes_
+
+    def __getstate__(self):
+        return {'pipeline': self.pipeline}
+
+    def __setstate__(self, state):
+        self.__init__(state['pipeline'])
+
+    def __getitem__(self, item):
+        return self.pipeline[item]
+
+    def _decision_row(self, text):
+        counts = {}
+        for token in self._analyzer(text):
+            idx = self._vocabulary.get(token)
+            if idx is not None:
+                counts[idx] = counts.get(idx, 0) + 1
+        if not counts:
+            return self._intercept
+        cols = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        if self._sublinear:
+            tf = np.log(tf) + 1
+        if self._idf is not None:
+            tf = tf * self._idf[cols]
+        if self._norm == 'l2':
+            tf = tf / np.sqrt(np.dot(tf, tf))
+        elif self._norm == 'l1':
+            tf = tf / np.abs(tf).sum()
+        return self._intercept + tf @ self._coef_t[cols]
+
+    def predict(self, texts):
+        texts = list(texts)
+        if len(texts) > self.FAST_PATH_MAX_ROWS:
+            return self.pipeline.predict(texts)
+        out = np.empty(len(texts), dtype=self.classes_.dtype)
+        for i, text in enumerate(texts):
+            scores = self._decision_row(text)
+            if scores.shape[0] == 1:  # бінарна класифікація
+                out[i] = self.classes_[int(scores[0] > 0)]
+            else:
+                out[i] = self.classes_[int(scores.argmax())]
+        return out
+
+    def predict_proba(self, texts):
+        texts = list(texts)
+        if len(texts) > self.FAST_PATH_MAX_ROWS or getattr(self.classifier, 'multi_class', None) == 'ovr':
+            return self.pipeline.predict_proba(texts)
+        out = np.empty((len(texts), len(self.classes_)), dtype=np.float64)
+        for i, text in enumerate(texts):
+            scores = self._decision_row(text)
+            if scores.shape[0] == 1:  # бінарна класифікація: сигмоїда
+                positive = 1.0 / (1.0 + np.exp(-scores[0]))
+                out[i] = (1.0 - positive, positive)
+            else:  # мультиноміальна: softmax, як LogisticRegression.predict_proba
+                exp = np.exp(scores - scores.max())
+                out[i] = exp / exp.sum()
+        return out
+
+
+@register_backend("LINEAR")
+class LinearBackend(SklearnTextBackend):
+    """Розріджена лінійна модель (логістична регресія) над TF-IDF: кілобайти замість мегабайтів."""
+    path_setting = 'LINEAR_MODEL_PATH'
+
+    def make_classifier(self, n_jobs=None):
+        from sklearn.linear_model import LogisticRegression
+        return LogisticRegression(C=10.0, max_iter=2000)
+
+    def load(self, path=None):
+        return LinearTextModel(super().load(path))
+
+    def fit(self, texts, labels, n_jobs=None):
+        return LinearTextModel(super().fit(texts, labels, n_jobs=n_jobs))
+
+    def fit_features(self, X, labels, featurizer, n_jobs=None, sample_weight=None):
+        return LinearTextModel(super().fit_features(X, labels, featurizer, n_jobs=n_jobs,
+                                                    sample_weight=sample_weight))
+
+    def save(self, model, path=None):
+        # на диск пишемо звичайний Pipeline — він завантажується і без цього модуля
+        atomic_joblib_dump(getattr(model, 'pipeline', model), path or self.model_path)
+
+
+@register_backend("BERT")
+class BertBackend(ModelBackend):
+    """
+    Донавчений BERT (bert_model.py): каталог save_pretrained з config.BERT_MODEL_PATH.
+    Навчання — train.py (train_bert); тут лише завантаження для CPU-інференсу.
+    """
+
+    @property
+    def model_path(self) -> str:
+        return config.BERT_MODEL_PATH
+
+    def fit(self, texts, labels, n_jobs=None):
+        raise NotImplementedError("BERT навчається через train.py (MODEL_TYPE = \"BERT\")")
+
+    def save(self, model, path=None):
+        raise NotImplementedError("BERT зберігається через Trainer.save_model у train.py")
+
+    def load(self, path=None):
+        from bert_model import load_bert_model
+        return load_bert_model(path or self.model_path)
+
+
+def wrap_loaded_model(model):
+    """
+    Обгортає завантажений з joblib Pipeline у модель зі швидким шляхом:
+    лінійний — у LinearTextModel, RandomForest — у скомпільовану модель.
+    """
+    from sklearn.pipeline import Pipeline
+    if isinstance(model, Pipeline) and hasattr(model[0], 'vocabulary_'):
+        if hasattr(model[-1], 'coef_'):
+            return LinearTextModel(model)
+        if hasattr(model[-1], 'estimators_') and compiled_rf_enabled():
+            from compiled_forest import compile_forest
+            return compile_forest(model)
+    return model
+
+
+def load_model_artifact(path, featurizers=None):
+    """
+    Завантажує артефакт моделі будь-якого бекенду (або оверлей) для прогнозу.
+    Класифікатор без TF-IDF (featurizer.ClassifierArtifact) отримує спільний
+    екземпляр своєї версії з реєстру featurizers; старі повні Pipeline — як є.
+    """
+    if compiled_rf_enabled():
+        from compiled_forest import load_compiled
+        compiled = load_compiled(path)
+        if compiled is not None:
+            return compiled
+    import joblib
+    from featurizer import ClassifierArtifact
+    artifact = joblib.load(path, mmap_mode=mmap_mode())
+    if isinstance(artifact, ClassifierArtifact):
+        if featurizers is None:
+            raise ValueError(f"{path} містить лише класифікатор: потрібен реєстр TF-IDF")
+        artifact = artifact.bind(featurizers)
+    return wrap_loaded_model(artifact)
@@ -0,0 +1,169 @@
+"""
+Інфраструктура мікробенчмарків: фікстура bench вимірює час (мінімум і медіану
+з кількох повторів) та пікову пам'ять (tracemalloc, окремий прогін) і порівнює
+результат з baseline.json.
+
+Baseline записано на іншій машині, тож він масштабується на відношення часу
+еталонного навантаження (calibrate) тут і під час запису baseline. Регресія —
+сповільнення більше за допуск, що водночас перевищує MIN_SECONDS_DELTA (теж
+помножену на це відношення): поріг відносний, підлога відсікає лише шум таймера.
+Перевищення ліміту підтверджується повторним заміром після перекалібрування.
+
+    cd ml && python -m pytest benchmarks -q
+
+Змінні середовища:
+  ML_BENCH_SCALES=1,10,100       масштаби синтетичних даних
+  ML_BENCH_UPDATE_BASELINE=1     записати поточні результати в baseline.json
+  ML_BENCH_TOLERANCE=1.0         допустиме сповільнення відносно baseline (1.0 — удвічі)
+  ML_BENCH_MEMORY_TOLERANCE=0.5  допустиме зростання пікової пам'яті (0.5 — на 50%)
+"""
+import json
+import random
+import os
+import statistics
+import time
+import tracemalloc
+
+import pytest
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+RESULTS_FILE = os.path.join(BENCH_DIR, 'last_results.json')
+
+# Підлоги шуму: коротші за це відхилення не вважаються регресією. Час — на машині,
+# де записано baseline (множиться на speed_factor); менша за найкоротший бенчмарк (~1.3 мс)
+MIN_SECONDS_DELTA = 0.001
+MIN_MEMORY_DELTA_MB = 1.0
+# Ключ baseline.json з часом еталонного навантаження на машині, де записано baseline
+CALIBRATION_KEY = '_calibration'
+
+
+def bench_scales():
+    return [int(s) for s in os.environ.get('ML_BENCH_SCALES', '1,10,100').split(',') if s.strip()]
+
+
+def calibrate(repeat=5) -> float:
+    """Найкращий час еталонного навантаження (Python-цикл + сортування), секунди."""
+    rng = random.Random(0)
+    data = [rng.random() for _ in range(100_000)]
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        total = 0.0
+        for value in data:
+            total += value * value
+        sorted(data)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class Bench:
+    def __init__(self, results, baseline, update, tolerance, memory_tolerance, calibration=None):
+        self.results = results
+        self.baseline = baseline
+        self.update = update
+        self.tolerance = tolerance
+        self.memory_tolerance = memory_tolerance
+        # у скільки разів ця машина повільніша за ту, де записано baseline (1.0 — невідомо)
+        self.base_calibration = (baseline.get(CALIBRATION_KEY) or {}).get('seconds')
+        self.speed_factor = calibration / self.base_calibration if calibration and self.base_calibration else 1.0
+
+    def __call__(self, name, fn, setup=None, repeat=3, **meta):
+        """
+        Вимірює fn() (або fn(setup()), якщо заданий setup — він не входить у час).
+        Повертає dict з seconds (мінімум), median_seconds, peak_mb.
+        """
+        timings = self._time(fn, setup, repeat)
+        limit = self._time_limit(name)
+        if limit is not None and min(timings) > limit:
+            # підтвердження: швидкість спільної машини плаває, тож перекалібровуємо і міряємо ще раз
+            self._recalibrate()
+            retry = self._time(fn, setup, repeat)
+            if min(retry) < min(timings):
+                timings = retry
+
+        args = (setup(),) if setup else ()
+        tracemalloc.start()
+        try:
+            fn(*args)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        result = {
+            'seconds': round(min(timings), 6),
+            'median_seconds': round(statistics.median(timings), 6),
+            'peak_mb': round(peak / 2 ** 20, 3),
+            'repeat': len(timings),
+            **meta,
+        }
+        self.results[name] = result
+        self._check(name, result)
+        return result
+
+    @staticmethod
+    def _time(fn, setup, repeat):
+        timings = []
+        for _ in range(max(1, repeat)):
+            args = (setup(),) if setup else ()
+            started = time.perf_counter()
+            fn(*args)
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    def _recalibrate(self):
+        if self.base_calibration:
+            self.speed_factor = calibrate() / self.base_calibration
+
+    def _time_limit(self, name):
+        """Найбільший допустимий час бенчмарку (None — немає baseline або його оновлюють)."""
+        base = self.baseline.get(name)
+        if self.update or not base:
+            return None
+        expected = base['seconds'] * self.speed_factor
+        return max(expected * (1 + self.tolerance), expected + MIN_SECONDS_DELTA * self.speed_factor)
+
+    def _check(self, name, result):
+        limit = self._time_limit(name)
+        if limit is None:
+            return
+        base = self.baseline[name]
+        problems = []
+        if result['seconds'] > limit:
+            expected = base['seconds'] * self.speed_factor
+            problems.append(f"час {expected * 1000:.2f} → {result['seconds'] * 1000:.2f} мс "
+                            f"(baseline × {self.speed_factor:.2f})")
+        mem_limit = base['peak_mb'] * (1 + self.memory_tolerance)
+        if result['peak_mb'] > mem_limit and result['peak_mb'] - base['peak_mb'] > MIN_MEMORY_DELTA_MB:
+            problems.append(f"пам'ять {base['peak_mb']:.1f} → {result['peak_mb']:.1f} MB")
+        if problems:
+            pytest.fail(f"Регресія бенчмарку {name}: " + ', '.join(problems), pytrace=False)
+
+
+@pytest.fixture(scope='session')
+def bench_session():
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    update = os.environ.get('ML_BENCH_UPDATE_BASELINE') == '1'
+    calibration = calibrate()
+    results = {CALIBRATION_KEY: {'seconds': round(calibration, 6)}}
+    yield Bench(results, baseline, update,
+                tolerance=float(os.environ.get('ML_BENCH_TOLERANCE', '1.0')),
+                memory_tolerance=float(os.environ.get('ML_BENCH_MEMORY_TOLERANCE', '0.5')),
+                calibration=calibration)
+
+    with open(RESULTS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2, sort_keys=True)
+    if update:
+        merged = {**baseline, **results}
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write('\n')
+
+
+@pytest.fixture
+def bench(bench_session):
+    return bench_session
@@ -0,0 +1,61 @@
+"""
+Синтетичні дані для бенчмарків, масштабовані від реального датасету.
+
+Масштаб 1x — 50 користувачів по 20 виправлень (1000 рядків CSV); 10x і 100x
+множать кількість користувачів. Описи та категорії беруться з
+monobank_transactions_augmented2.csv з їх реальною частотою, тож
+розподіл мерчантів такий самий, як у продакшн-даних.
+"""
+import csv
+import os
+import random
+
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_FILE = os.path.join(ML_DIR, 'monobank_transactions_augmented2.csv')
+
+BASE_USERS = 50
+CORRECTIONS_PER_USER = 20
+CSV_HEADER = ['user_id', 'description', 'original_category_id', 'corrected_category_id',
+              'original_category_name', 'corrected_category_name']
+
+
+def load_rows(path=DATA_FILE):
+    """[(опис, category_id)] з навчального датасету."""
+    rows = []
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            desc = (row.get('text_features') or '').strip()
+            try:
+                rows.append((desc, int(float(row['category_id']))))
+            except (KeyError, ValueError):
+                continue
+    return [r for r in rows if r[0]]
+
+
+def user_ids(scale: int):
+    return [f'bench-user-{i}' for i in range(BASE_USERS * scale)]
+
+
+def corrections(rows, scale: int, seed: int = 0, id_to_name=None):
+    """Синтетичні виправлення: CORRECTIONS_PER_USER на користувача, категорія зміщена від оригінальної."""
+    rng = random.Random(seed)
+    id_to_name = id_to_name or {}
+    # зсув лише в межах відомих категорій (мапінг сервісу або категорії датасету)
+    known = sorted(id_to_name) or sorted({category_id for _, category_id in rows})
+    out = []
+    for uid in user_ids(scale):
+        for desc, category_id in rng.sample(rows, CORRECTIONS_PER_USER):
+            position = known.index(category_id) if category_id in known else 0
+            corrected = known[(position + rng.randint(1, 5)) % len(known)]
+            out.append([uid, desc, category_id, corrected,
+                        id_to_name.get(category_id, ''), id_to_name.get(corrected, '')])
+    return out
+
+
+def write_corrections_csv(path, rows, scale: int, seed: int = 0, id_to_name=None):
+    data = corrections(rows, scale, seed, id_to_name)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        writer.writerows(data)
+    return len(data)
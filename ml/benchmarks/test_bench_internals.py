@@ -0,0 +1,193 @@
+"""
+Мікробенчмарки: старт (міграція/читання виправлень), мапінг назв категорій,
+донавчання, завантаження моделей, одиночний vs батчевий прогноз, скомпільований
+RF проти sklearn — на 1x/10x/100x.
+"""
+import os
+import random
+
+import pytest
+
+import api
+import config
+import synthetic
+from backends import get_backend
+from corrections_store import CorrectionsStore
+from global_corpus import GlobalCorpusProvider
+from model_cache import ModelCache
+from prediction_cache import PredictionCache
+from snapshot_state import SnapshotDict
+from conftest import bench_scales
+
+SCALES = bench_scales()
+SINGLE_PREDICT_CALLS = 100
+
+
+@pytest.fixture(scope='session')
+def rows():
+    return synthetic.load_rows()
+
+
+@pytest.fixture(scope='session')
+def trained_models(rows, tmp_path_factory):
+    """RF і LINEAR, навчені на повному датасеті (як train.py)."""
+    out = tmp_path_factory.mktemp('models')
+    texts = [d for d, _ in rows]
+    labels = [c for _, c in rows]
+    paths = {}
+    for name in ('RF', 'LINEAR'):
+        backend = get_backend(name)
+        paths[name] = str(out / f'{name}.joblib')
+        backend.save(backend.fit(texts, labels), paths[name])
+    return paths
+
+
+@pytest.fixture
+def isolated_api(tmp_path, monkeypatch):
+    """Порожній стан api у тимчасовому каталозі; повертає функцію, що створює свіже сховище."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+    monkeypatch.setattr(api, 'prediction_cache', PredictionCache(max_entries=config.PREDICTION_CACHE_MAX_ENTRIES))
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict())
+    monkeypatch.setattr(api, 'user_override_indexes', SnapshotDict())
+    monkeypatch.setattr(api, 'user_model_status', SnapshotDict())
+    stores = []
+
+    def new_store():
+        store = CorrectionsStore(str(tmp_path / f'corrections-{len(stores)}.sqlite3'), normalize=api.normalize_description)
+        stores.append(store)
+        monkeypatch.setattr(api, 'corrections_store', store)
+        return store
+
+    new_store()
+    yield new_store
+    for store in stores:
+        store.close()
+
+
+def _repeat(scale):
+    return 3 if scale < 100 else 1
+
+
+@pytest.mark.parametrize('scale', SCALES)
+def test_load_user_corrections(bench, isolated_api, rows, scale):
+    """Старт: одноразова міграція CSV з виправленнями у SQLite (1000 рядків × scale)."""
+    n = synthetic.write_corrections_csv(api.CORRECTIONS_FILE, rows, scale, id_to_name=api.ID_TO_NAME)
+    # кожен повтор — на свіжій базі (міграція виконується один раз на базу)
+    result = bench(f'load_user_corrections[{scale}x]', lambda _store: api.load_user_corrections(),
+                   setup=isolated_api, repeat=_repeat(scale), rows=n)
+    assert api.corrections_store.count() > 0
+    assert result['seconds'] > 0
+
+
+@pytest.mark.parametrize('scale', SCALES)
+def test_corrections_lookup_per_user(bench, isolated_api, rows, scale):
+    """Холодне читання виправлень 50 користувачів — не повинно залежати від загальної кількості."""
+    synthetic.write_corrections_csv(api.CORRECTIONS_FILE, rows, scale, id_to_name=api.ID_TO_NAME)
+    api.load_user_corrections()
+    users = random.Random(0).sample(synthetic.user_ids(scale), synthetic.BASE_USERS)
+
+    def lookup_all():
+        api.user_corrections_map.clear()
+        for uid in users:
+            api.get_user_corrections_map(uid)
+
+    bench(f'corrections_lookup_50_users[{scale}x]', lookup_all)
+    assert 0 < len(api.user_corrections_map[users[0]]) <= synthetic.CORRECTIONS_PER_USER
+
+
+@pytest.mark.parametrize('scale', SCALES)
+def test_map_category_name_to_id(bench, rows, scale):
+    """Мапінг назв категорій з виправлень (відомі, інший регістр, кастомні) у ID."""
+    rng = random.Random(scale)
+    known = list(api.ID_TO_NAME.values())
+    pool = known + [n.lower() for n in known] + ['Ліки', 'Подарунки', 'Ремонт авто', 'аптека']
+    names = [rng.choice(pool) for _ in range(1000 * scale)]
+
+    def map_all():
+        for name in names:
+            api.map_category_name_to_id(name)
+
+    bench(f'map_category_name_to_id[{scale}x]', map_all, repeat=_repeat(scale), names=len(names))
+
+
+@pytest.mark.parametrize('scale', SCALES)
+def test_retrain_overlay(bench, isolated_api, rows, trained_models, monkeypatch, scale):
+    """Донавчання в режимі overlay для користувача з 20 × scale виправленнями."""
+    monkeypatch.setattr(config, 'PERSONALIZATION_MODE', 'overlay')
+    monkeypatch.setattr(api, 'global_model', get_backend('LINEAR').load(trained_models['LINEAR']))
+    store = api.corrections_store
+    rng = random.Random(scale)
+    for desc, category_id in rng.sample(rows, min(len(rows), synthetic.CORRECTIONS_PER_USER * scale)):
+        store.upsert('heavy', desc, category_id, (category_id + 1) % 21)
+
+    bench(f'retrain_overlay[{scale}x]', lambda: api.retrain_personalized_model('heavy'),
+          repeat=_repeat(scale), corrections=store.count('heavy'))
+    assert os.path.exists('model_user_heavy.joblib')
+
+
+def test_retrain_full(bench, isolated_api, rows, monkeypatch, tmp_path):
+    """Повне донавчання (RF) на кешованому векторизованому корпусі + 20 виправлень."""
+    monkeypatch.setattr(config, 'PERSONALIZATION_MODE', 'full')
+    monkeypatch.setattr(config, 'RETRAIN_N_JOBS', 1)
+    monkeypatch.setattr(config, 'DATA_FILE', synthetic.DATA_FILE)
+    provider = GlobalCorpusProvider(synthetic.DATA_FILE, cache_dir=str(tmp_path / 'corpus'))
+    monkeypatch.setattr(api, 'global_corpus', provider)
+    provider.get()
+    for desc, category_id in random.Random(0).sample(rows, synthetic.CORRECTIONS_PER_USER):
+        api.corrections_store.upsert('full-user', desc, category_id, (category_id + 1) % 21)
+
+    bench('retrain_full_rf', lambda: api.retrain_personalized_model('full-user'), repeat=1)
+    assert provider.builds == 1
+
+
+@pytest.mark.parametrize('backend_name', ['RF', 'LINEAR'])
+def test_model_load(bench, trained_models, backend_name):
+    """Завантаження глобальної моделі з диска (MODEL_MMAP як у config)."""
+    backend = get_backend(backend_name)
+    path = trained_models[backend_name]
+    bench(f'model_load[{backend_name}]', lambda: backend.load(path),
+          file_mb=round(os.path.getsize(path) / 2 ** 20, 3))
+
+
+@pytest.mark.parametrize('scale', SCALES)
+@pytest.mark.parametrize('backend_name', ['RF', 'LINEAR'])
+def test_predict_single_vs_batch(bench, rows, trained_models, backend_name, scale):
+    """100 одиночних predict([опис]) проти одного predict на 100 × scale описів."""
+    model = get_backend(backend_name).load(trained_models[backend_name])
+    rng = random.Random(scale)
+    texts = [rng.choice(rows)[0] for _ in range(100 * scale)]
+    single_texts = texts[:SINGLE_PREDICT_CALLS]
+
+    def single():
+        for text in single_texts:
+            model.predict([text])
+
+    if scale == SCALES[0]:
+        bench(f'predict_single_x{SINGLE_PREDICT_CALLS}[{backend_name}]', single)
+    bench(f'predict_batch[{backend_name}][{scale}x]', lambda: model.predict(texts),
+          repeat=_repeat(scale), items=len(texts))
+
+
+@pytest.mark.parametrize('scale', SCALES)
+def test_predict_rf_compiled_vs_sklearn(bench, rows, trained_models, scale):
+    """
+    RF: sklearn Pipeline (n_jobs як у продакшні) проти скомпільованої моделі, як її
+    завантажує сервіс (батчі від SKLEARN_MIN_ROWS ідуть через довантажений Pipeline).
+    """
+    import joblib
+    pipeline = joblib.load(trained_models['RF'])
+    compiled = get_backend('RF').load(trained_models['RF'])
+    assert compiled.pipeline is None
+    rng = random.Random(scale)
+    texts = [rng.choice(rows)[0] for _ in range(100 * scale)]
+    single_texts = texts[:SINGLE_PREDICT_CALLS]
+
+    if scale == SCALES[0]:
+        for name, model in (('sklearn', pipeline), ('compiled', compiled)):
+            bench(f'predict_rf_single_x{SINGLE_PREDICT_CALLS}[{name}]',
+                  lambda model=model: [model.predict([t]) for t in single_texts])
+    for name, model in (('sklearn', pipeline), ('compiled', compiled)):
+        bench(f'predict_rf_batch[{name}][{scale}x]', lambda model=model: model.predict(texts),
+              repeat=_repeat(scale), items=len(texts))
+    assert (compiled.predict(single_texts) == pipeline.predict(single_texts)).all()
@@ -0,0 +1,148 @@
+"""
+BERT-класифікатор (MODEL_TYPE = "BERT") для обслуговування на CPU.
+
+Модель завантажується один раз з локального каталогу (config.BERT_MODEL_PATH,
+його пише train.py) без жодних звернень до Hugging Face Hub. Для CPU:
+  - динамічна int8-квантизація nn.Linear (config.BERT_QUANTIZE) — ваги
+    шарів уваги та FFN у 4 рази менші, матричні множення швидші;
+  - динамічний padding: батч доповнюється до найдовшого опису в ньому, а не
+    до max_length=64 (описи транзакцій — 5-15 токенів), описи сортуються за
+    довжиною, щоб у кожен батч потрапляли схожі;
+  - torch.inference_mode і фіксована кількість потоків (config.BERT_NUM_THREADS).
+
+torch і transformers імпортуються лише тут, тож RF/LINEAR працюють без них.
+"""
+import os
+import re
+import warnings
+
+import numpy as np
+
+import config
+
+# файли ваг, які пише Trainer.save_model / save_pretrained
+WEIGHT_FILES = ('model.safetensors', 'pytorch_model.bin')
+
+
+def has_weights(path: str) -> bool:
+    return any(os.path.exists(os.path.join(path, name)) for name in WEIGHT_FILES)
+
+
+def _enable_offline():
+    # huggingface_hub читає ці змінні під час імпорту; local_files_only нижче — друга лінія захисту
+    os.environ['HF_HUB_OFFLINE'] = '1'
+    os.environ['TRANSFORMERS_OFFLINE'] = '1'
+
+
+def _category_ids(model_config):
+    """
+    category_id для кожного виходу моделі. train.py навчає на category_id як на
+    індексах класів, тож мітка — або сам id ("7"), або типова назва "LABEL_7".
+    """
+    ids = []
+    for index in range(model_config.num_labels):
+        label = str(model_config.id2label.get(index, index))
+        match = re.fullmatch(r'(?:LABEL_)?(-?\d+)', label)
+        ids.append(int(match.group(1)) if match else index)
+    return np.asarray(ids, dtype=np.int64)
+
+
+def quantize(model):
+    """Динамічна int8-квантизація всіх nn.Linear (ваги int8, активації квантуються на льоту)."""
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+    with warnings.catch_warnings():
+        # eager-квантизація в torch позначена як deprecated на користь torchao, але працює
+        warnings.simplefilter('ignore')
+        return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class BertTextModel:
+    """Токенізатор + BertForSequenceClassification з інтерфейсом predict(texts) / predict_proba(texts)."""
+
+    def __init__(self, model, tokenizer, max_length: int = 64, batch_size: int = 32, quantized: bool = False):
+        self.model = model.eval()
+        self.tokenizer = tokenizer
+        self.max_length = int(max_length)
+        self.batch_size = max(1, int(batch_size))
+        self.quantized = quantized
+        self.classes_ = _category_ids(model.config)
+        self._pad_id = tokenizer.pad_token_id or 0
+
+    def __getstate__(self):
+        raise TypeError("BertTextModel не серіалізується через joblib; збережіть модель через save_pretrained")
+
+    def _encode(self, texts):
+        """Токени кожного опису (з [CLS]/[SEP], обрізані до max_length), без padding."""
+        return self.tokenizer([str(t) for t in texts], truncation=True, max_length=self.max_length,
+                              padding=False, return_attention_mask=False,
+                              return_token_type_ids=False)['input_ids']
+
+    def _pad(self, sequences):
+        """Динамічний padding: до найдовшої послідовності батчу."""
+        import torch
+        width = max(len(s) for s in sequences)
+        input_ids = np.full((len(sequences), width), self._pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(sequences), width), dtype=np.int64)
+        for row, seq in enumerate(sequences):
+            input_ids[row, :len(seq)] = seq
+            attention_mask[row, :len(seq)] = 1
+        return torch.from_numpy(input_ids), torch.from_numpy(attention_mask)
+
+    def logits(self, texts):
+        import torch
+        texts = list(texts)
+        out = np.empty((len(texts), len(self.classes_)), dtype=np.float32)
+        if not texts:
+            return out
+        sequences = self._encode(texts)
+        # схожі за довжиною описи — в одному батчі, щоб padding був мінімальним
+        order = sorted(range(len(sequences)), key=lambda i: len(sequences[i]))
+        with torch.inference_mode():
+            for start in range(0, len(order), self.batch_size):
+                rows = order[start:start + self.batch_size]
+                input_ids, attention_mask = self._pad([sequences[i] for i in rows])
+                result = self.model(input_ids=input_ids, attention_mask=attention_mask)
+                out[rows] = result.logits.float().numpy()
+        return out
+
+    def predict_proba(self, texts):
+        scores = self.logits(texts).astype(np.float64)
+        scores -= scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        return scores / scores.sum(axis=1, keepdims=True)
+
+    def predict(self, texts):
+        return self.classes_[self.logits(texts).argmax(axis=1)]
+
+
+def load_bert_model(path=None, quantized=None, num_threads=None, max_length=None, batch_size=None):
+    """
+    Завантажує збережену train.py модель з локального каталогу path (без мережі).
+    Параметри за замовчуванням — з config (BERT_QUANTIZE, BERT_NUM_THREADS, ...).
+    """
+    path = path or config.BERT_MODEL_PATH
+    quantized = config.BERT_QUANTIZE if quantized is None else quantized
+    num_threads = config.BERT_NUM_THREADS if num_threads is None else num_threads
+    if not os.path.isdir(path) or not has_weights(path):
+        raise FileNotFoundError(
+            f"BERT model weights not found in {path} (expected one of {', '.join(WEIGHT_FILES)}). "
+            f"Train the model with MODEL_TYPE = \"BERT\" (run train.py).")
+
+    _enable_offline()
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    if num_threads:
+        torch.set_num_threads(int(num_threads))
+    tokenizer = AutoTokenizer.from_pretrained(path, local_files_only=True)
+    model = AutoModelForSequenceClassification.from_pretrained(path, local_files_only=True)
+    model.eval()
+    if quantized:
+        model = quantize(model)
+    return BertTextModel(
+        model, tokenizer,
+        max_length=config.BERT_MAX_LENGTH if max_length is None else max_length,
+        batch_size=config.BERT_BATCH_SIZE if batch_size is None else batch_size,
+        quantized=bool(quantized),
+    )
@@ -0,0 +1,87 @@
+"""
+Каскад моделей з порогом впевненості (config.CASCADE_ENABLED).
+
+Дешева модель (напр. LINEAR, мікросекунди) відповідає сама, якщо максимальна
+ймовірність її predict_proba не менша за поріг; решта описів іде до
+наступної, дорожчої моделі (RF, BERT). Остання модель відповідає завжди.
+Кожен прогноз повертається разом з впевненістю та назвою моделі-"сходинки",
+що відповіла. Поріг підбирається офлайн: python train.py --cascade-sweep.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+# confidence і stage — None, якщо модель не каскад (або не повертає ймовірностей)
+CascadePrediction = namedtuple('CascadePrediction', ['category_id', 'confidence', 'stage'])
+
+
+def top_class(model, texts):
+    """(category_id, ймовірність) найімовірнішого класу для кожного опису."""
+    proba = np.asarray(model.predict_proba(texts))
+    best = proba.argmax(axis=1)
+    return np.asarray(model.classes_).take(best), proba[np.arange(len(best)), best]
+
+
+class CascadeModel:
+    """
+    Послідовність (назва, модель) з інтерфейсом predict(texts) / predict_details(texts).
+    Усі моделі, крім останньої, мають predict_proba і classes_.
+    """
+
+    def __init__(self, stages, threshold: float):
+        self.stages = list(stages)
+        if not self.stages:
+            raise ValueError("Каскад має містити хоча б одну модель")
+        for name, model in self.stages[:-1]:
+            if not hasattr(model, 'predict_proba'):
+                raise ValueError(f"Модель каскаду {name} не має predict_proba")
+        self.threshold = float(threshold)
+
+    @property
+    def stage_names(self):
+        return [name for name, _ in self.stages]
+
+    @property
+    def overlay_featurizer(self):
+        """TF-IDF першої моделі (для персональних оверлеїв) або None, якщо вона без TF-IDF."""
+        first = self.stages[0][1]
+        try:
+            featurizer = first[:-1]
+        except TypeError:
+            return None
+        return featurizer if hasattr(featurizer, 'transform') else None
+
+    def predict_details(self, texts):
+        texts = list(texts)
+        category_ids = np.zeros(len(texts), dtype=np.int64)
+        confidence = np.full(len(texts), np.nan)
+        answered_by = np.zeros(len(texts), dtype=np.intp)
+        pending = np.arange(len(texts))
+        last = len(self.stages) - 1
+        for index, (_, model) in enumerate(self.stages):
+            if not len(pending):
+                break
+            batch = [texts[i] for i in pending]
+            if index == last and not hasattr(model, 'predict_proba'):
+                category_ids[pending] = np.asarray(model.predict(batch))
+                answered_by[pending] = index
+                break
+            labels, probs = top_class(model, batch)
+            accept = np.ones(len(pending), dtype=bool) if index == last else probs >= self.threshold
+            rows = pending[accept]
+            category_ids[rows] = labels[accept]
+            confidence[rows] = probs[accept]
+            answered_by[rows] = index
+            pending = pending[~accept]
+        names = self.stage_names
+        return [CascadePrediction(int(c), None if np.isnan(p) else float(p), names[s])
+                for c, p, s in zip(category_ids.tolist(), confidence.tolist(), answered_by.tolist())]
+
+    def predict(self, texts):
+        return np.asarray([p.category_id for p in self.predict_details(texts)], dtype=np.int64)
+
+
+def load_cascade(names, threshold: float):
+    """Завантажує моделі бекендів names (у порядку зростання вартості) з їх model_path."""
+    from backends import get_backend
+    return CascadeModel([(name, get_backend(name).load()) for name in names], threshold=threshold)
@@ -0,0 +1,245 @@
+"""
+Реєстр категорій: ID ↔ назва, розпізнавання назв з виправлень і створення нових категорій.
+
+Назви компілюються в незмінний індекс (CategoryIndex):
+  - точна таблиця назва → ID;
+  - таблиця всіх підрядків назв (у нижньому регістрі) → перша категорія, що його містить;
+  - автомат Aho-Corasick по назвах: один прохід по вхідному рядку знаходить
+    усі назви, що в ньому трапляються.
+resolve() працює за час, лінійний від довжини вхідної назви, і дає той самий
+результат, що й перебір усіх категорій: першу за порядком категорію, назва якої
+містить вхід або міститься в ньому.
+
+Нові категорії (get_or_create) створюються під блокуванням: між потоками —
+threading.Lock, між воркер-процесами — flock на <файл>.lock. Перед призначенням ID
+файл мапінгів перечитується, тож два воркери не видадуть один ID різним назвам.
+Файл пишеться атомарно (тимчасовий файл + os.replace), а індекс підміняється
+цілком: читачі без блокувань бачать або стару, або нову версію.
+"""
+import json
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: лише блокування між потоками
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path):
+    """Ексклюзивне блокування між процесами (flock на <path>.lock); на Windows — без нього."""
+    if fcntl is None:
+        yield
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(f"{path}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class CategoryIndex:
+    """Незмінний скомпільований індекс категорій; entries — [(id, назва)] у порядку пріоритету."""
+
+    def __init__(self, entries, fallbacks=()):
+        self.entries = list(entries)
+        self.id_to_name = {cid: name for cid, name in self.entries}
+        self.name_to_id = {name: cid for cid, name in self.entries}
+        # порядок (пріоритет) -> ID: спершу назви, потім евристичні фрагменти fallbacks
+        self._order_ids = [cid for cid, _ in self.entries] + [cid for _, cid in fallbacks]
+        self._contained_in = {}
+        for order, (_, name) in enumerate(self.entries):
+            low = name.lower()
+            for start in range(len(low)):
+                for end in range(start + 1, len(low) + 1):
+                    self._contained_in.setdefault(low[start:end], order)
+        patterns = [name.lower() for _, name in self.entries] + [fragment.lower() for fragment, _ in fallbacks]
+        self._build_automaton(patterns)
+
+    def _build_automaton(self, patterns):
+        """Aho-Corasick: для кожного стану — найменший порядок шаблону, що закінчується в ньому."""
+        goto = [{}]
+        best = [None]
+        for order, pattern in enumerate(patterns):
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    best.append(None)
+                state = nxt
+            if best[state] is None or order < best[state]:
+                best[state] = order
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                inherited = best[fail[nxt]]
+                if inherited is not None and (best[nxt] is None or inherited < best[nxt]):
+                    best[nxt] = inherited
+        self._goto, self._fail, self._best = goto, fail, best
+
+    def _first_pattern_in(self, text):
+        state, found = 0, None
+        goto, fail, best = self._goto, self._fail, self._best
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            order = best[state]
+            if order is not None and (found is None or order < found):
+                found = order
+        return found
+
+    def resolve(self, name):
+        """ID категорії для назви з виправлення або None, якщо її не розпізнано."""
+        if not name:
+            return None
+        name = str(name).strip()
+        if name in self.name_to_id:
+            return self.name_to_id[name]
+        low = name.lower()
+        if not low:
+            return None
+        candidates = [order for order in (self._contained_in.get(low), self._first_pattern_in(low))
+                      if order is not None]
+        return self._order_ids[min(candidates)] if candidates else None
+
+
+class CategoryRegistry:
+    """
+    Поточна версія CategoryIndex + динамічні категорії у файлі path ({"id": "назва"}).
+    base — вбудовані категорії (у файл не пишуться).
+    """
+
+    def __init__(self, base: dict, path: str, fallbacks=(), default_name: str = None):
+        self.base = dict(base)
+        self.path = path
+        self.fallbacks = tuple(fallbacks)
+        self.default_name = default_name
+        self._lock = threading.Lock()
+        self._file_stat = None
+        self.index = CategoryIndex(self.base.items(), self.fallbacks)
+
+    @property
+    def id_to_name(self):
+        return self.index.id_to_name
+
+    @property
+    def name_to_id(self):
+        return self.index.name_to_id
+
+    def resolve(self, name):
+        return self.index.resolve(name)
+
+    def resolve_many(self, names):
+        """Як resolve для кожної назви; кожна унікальна назва розпізнається один раз."""
+        index = self.index
+        resolved = {}
+        out = []
+        for name in names:
+            if name not in resolved:
+                resolved[name] = index.resolve(name)
+            out.append(resolved[name])
+        return out
+
+    def name_for(self, category_id, default=None):
+        """Назва за ID; невідомий ID — привід перечитати файл (категорію міг створити інший воркер)."""
+        name = self.index.id_to_name.get(category_id)
+        if name is None and self._file_changed():
+            self.load()
+            name = self.index.id_to_name.get(category_id)
+        return default if name is None else name
+
+    # --- файл динамічних мапінгів ---
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _file_changed(self) -> bool:
+        return self._stat() != self._file_stat
+
+    def _read_file(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return {int(k): str(v) for k, v in json.load(f).items()}
+
+    def _merge(self, dynamic) -> int:
+        """Додає невідомі ID з dynamic і підміняє індекс; повертає кількість доданих."""
+        entries = list(self.index.entries)
+        known_ids = set(self.index.id_to_name)
+        known_names = set(self.index.name_to_id)
+        added = 0
+        for cid, name in dynamic.items():
+            if cid not in known_ids and name not in known_names:
+                entries.append((cid, name))
+                known_ids.add(cid)
+                known_names.add(name)
+                added += 1
+        if added:
+            self.index = CategoryIndex(entries, self.fallbacks)
+        return added
+
+    def load(self) -> int:
+        """Зчитує динамічні категорії з файлу; повертає кількість нових."""
+        with self._lock:
+            self._file_stat = self._stat()
+            return self._merge(self._read_file())
+
+    def _save(self):
+        dynamic = {str(cid): name for cid, name in self.index.entries if cid not in self.base}
+        tmp_path = f"{self.path}.tmp.{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(dynamic, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._file_stat = self._stat()
+
+    def get_or_create(self, category_name):
+        """
+        ID категорії з точно такою назвою або новий ID (максимальний + 1),
+        збережений у файл. Повертає (ID, чи створено нову категорію).
+        """
+        name = str(category_name or '').strip()
+        if not name:
+            return self.index.name_to_id.get(self.default_name, 0), False
+        existing = self.index.name_to_id.get(name)
+        if existing is not None:
+            return existing, False
+        with self._lock, file_lock(self.path):
+            # інший воркер міг уже створити цю (або іншу) категорію
+            self._file_stat = self._stat()
+            self._merge(self._read_file())
+            existing = self.index.name_to_id.get(name)
+            if existing is not None:
+                return existing, False
+            new_id = max(self.index.id_to_name, default=-1) + 1
+            self.index = CategoryIndex(self.index.entries + [(new_id, name)], self.fallbacks)
+            self._save()
+            return new_id, True
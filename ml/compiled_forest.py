@@ -0,0 +1,317 @@
+"""
+Скомпільований TF-IDF + RandomForest: інференс на плоских numpy-масивах.
+
+Pipeline.predict для одного короткого опису платить за валідацію sklearn,
+розріджену матрицю TF-IDF і диспетчеризацію 100 дерев через joblib — ~11 мс.
+compile_forest() перетворює навчений Pipeline на кілька масивів (ознака, поріг,
+дочірні вузли всіх дерев, ймовірності листків) і словник векторизатора.
+
+Обхід векторизований по всіх деревах і рядках одразу. Рядок TF-IDF майже
+весь нульовий, тож таблиця переходів "куди піти з вузла при нульовій ознаці"
+будується один раз під час компіляції; для конкретного рядка в ній
+перераховуються лише вузли, що перевіряють його ненульові ознаки, після чого
+кожен крок спуску — одна індексація numpy.
+
+Результати ідентичні sklearn: ознаки приводяться до float32, як у
+DecisionTreeClassifier, а ймовірності дерев сумуються в тому ж порядку, що й у
+RandomForestClassifier.predict_proba (n_jobs=1).
+
+Скомпільована модель зберігається поруч з Pipeline (compiled_artifact_path) і
+завантажується через mmap: на відміну від дерев sklearn, її масиви спільні для
+всіх воркерів serve.py.
+"""
+import math
+import os
+import threading
+
+import numpy as np
+
+from backends import atomic_joblib_dump, mmap_mode
+
+
+def compiled_artifact_path(path: str) -> str:
+    """production_model_rf.joblib -> production_model_rf.compiled.joblib"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.compiled{ext or '.joblib'}"
+
+
+def _file_signature(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+class CompiledForest:
+    """Ліс дерев рішень як плоскі масиви; predict/predict_proba приймають матрицю ознак."""
+    # версія формату: артефакт іншої версії перекомпільовується з Pipeline
+    FORMAT_VERSION = 1
+
+    def __init__(self, forest):
+        if getattr(forest, 'n_outputs_', 1) != 1:
+            raise ValueError("Підтримуються лише ліси з одним виходом")
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        self.format_version = self.FORMAT_VERSION
+        self.classes_ = np.asarray(forest.classes_)
+        n_classes = len(self.classes_)
+        offsets = np.cumsum([0] + [t.node_count for t in trees])
+        n_nodes = int(offsets[-1])
+
+        feature = np.zeros(n_nodes, dtype=np.int32)
+        threshold = np.zeros(n_nodes, dtype=np.float64)
+        left = np.zeros(n_nodes, dtype=np.int32)
+        right = np.zeros(n_nodes, dtype=np.int32)
+        leaf_slot = np.full(n_nodes, -1, dtype=np.int32)
+        leaf_proba = []
+        n_leaves = 0
+        for tree, offset in zip(trees, offsets[:-1]):
+            nodes = np.arange(offset, offset + tree.node_count, dtype=np.int32)
+            is_leaf = tree.children_left == -1
+            feature[nodes] = np.where(is_leaf, 0, tree.feature)
+            threshold[nodes] = np.where(is_leaf, 0.0, tree.threshold)
+            # листок веде сам у себе: зайві кроки спуску нічого не змінюють
+            left[nodes] = np.where(is_leaf, nodes, tree.children_left + offset)
+            right[nodes] = np.where(is_leaf, nodes, tree.children_right + offset)
+            # sklearn >= 1.4 зберігає в value частки класів і віддає їх як є;
+            # старіші артефакти містять кількості — їх нормуємо, як тодішній predict_proba
+            proba = tree.value[:, 0, :n_classes]
+            normalizer = proba.sum(axis=1)
+            if not np.allclose(normalizer[is_leaf], 1.0):
+                normalizer[normalizer == 0.0] = 1.0
+                proba = proba / normalizer[:, np.newaxis]
+            leaf_slot[nodes[is_leaf]] = np.arange(n_leaves, n_leaves + int(is_leaf.sum()), dtype=np.int32)
+            leaf_proba.append(proba[is_leaf])
+            n_leaves += int(is_leaf.sum())
+
+        internal = leaf_slot < 0
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_slot = leaf_slot
+        self.leaf_proba = np.ascontiguousarray(np.concatenate(leaf_proba), dtype=np.float64)
+        self.roots = offsets[:-1].astype(np.intp)
+        self.n_nodes = n_nodes
+        self.n_features = int(getattr(forest, 'n_features_in_', int(feature.max()) + 1))
+        self.max_depth = max(int(t.max_depth) for t in trees)
+        # перехід з кожного вузла при нульовому значенні його ознаки
+        self.zero_next = np.where(internal & (0.0 > threshold), right, left).astype(np.intp)
+        # внутрішні вузли, згруповані за ознакою (CSR): які вузли перераховувати для ненульової ознаки
+        internal_nodes = np.flatnonzero(internal).astype(np.int32)
+        order = np.argsort(feature[internal_nodes], kind='stable')
+        self.feature_nodes = internal_nodes[order]
+        self.feature_ptr = np.zeros(self.n_features + 1, dtype=np.int64)
+        np.cumsum(np.bincount(feature[internal_nodes], minlength=self.n_features), out=self.feature_ptr[1:])
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.threshold, self.left, self.right, self.leaf_slot, self.leaf_proba,
+                                      self.roots, self.zero_next, self.feature_nodes, self.feature_ptr))
+
+    def _rows_per_chunk(self) -> int:
+        # таблиця переходів чанка — rows × n_nodes; ~2.5 MB лишаються в кеші процесора
+        return max(1, 320_000 // max(1, self.n_nodes))
+
+    def _proba_chunk(self, n_rows, rows, cols, vals):
+        """Ймовірності для n_rows рядків, заданих ненульовими (рядок, ознака, значення float32)."""
+        row_base = np.arange(n_rows, dtype=np.intp) * self.n_nodes
+        table = (row_base[:, np.newaxis] + self.zero_next).ravel()
+
+        counts = self.feature_ptr[cols + 1] - self.feature_ptr[cols]
+        total = int(counts.sum())
+        if total:
+            # для кожної ненульової ознаки рядка — усі вузли, що її перевіряють
+            starts = np.repeat(self.feature_ptr[cols] - (np.cumsum(counts) - counts), counts)
+            nodes = self.feature_nodes[starts + np.arange(total)]
+            base = np.repeat(row_base[rows], counts)
+            # float32 <= float64, як у sklearn (X приводиться до float32)
+            go_left = np.repeat(vals, counts) <= self.threshold[nodes]
+            table[base + nodes] = base + np.where(go_left, self.left[nodes], self.right[nodes])
+
+        node = (row_base[:, np.newaxis] + self.roots).ravel()
+        for _ in range(self.max_depth):
+            node = table[node]
+
+        leaves = self.leaf_slot[node - np.repeat(row_base, self.n_estimators)]
+        proba = self.leaf_proba[leaves].reshape(n_rows, self.n_estimators, -1)
+        # послідовна сума по деревах — той самий порядок додавання, що й у RandomForestClassifier
+        return np.cumsum(proba, axis=1)[:, -1] / self.n_estimators
+
+    def predict_proba_coo(self, n_rows, rows, cols, vals):
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        vals = np.asarray(vals, dtype=np.float32)
+        out = np.empty((n_rows, len(self.classes_)), dtype=np.float64)
+        chunk = self._rows_per_chunk()
+        for start in range(0, n_rows, chunk):
+            stop = min(n_rows, start + chunk)
+            lo, hi = np.searchsorted(rows, [start, stop])
+            out[start:stop] = self._proba_chunk(stop - start, rows[lo:hi] - start, cols[lo:hi], vals[lo:hi])
+        return out
+
+    def predict_proba(self, X):
+        """X — матриця ознак (scipy.sparse або щільна)."""
+        if hasattr(X, 'tocoo'):
+            X = X.tocsr()
+            X.sort_indices()
+            rows = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))
+            return self.predict_proba_coo(X.shape[0], rows, X.indices, X.data)
+        X = np.asarray(X, dtype=np.float32)
+        rows, cols = np.nonzero(X)
+        return self.predict_proba_coo(X.shape[0], rows, cols, X[rows, cols])
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+class CompiledForestModel:
+    """
+    TF-IDF + CompiledForest з інтерфейсом predict(texts).
+
+    Для кількох описів TF-IDF рахується напряму через словник векторизатора
+    (як у LinearTextModel). Від SKLEARN_MIN_ROWS описів цикл sklearn по деревах
+    (на C і на всіх ядрах) швидший за numpy-обхід, тож такі батчі йдуть через
+    вихідний Pipeline — він довантажується з диска при першому великому батчі.
+    Індексація [:-1] / [-1] повертає векторизатор / ліс — як у Pipeline, тож
+    модель працює і як база OverlayModel.
+    """
+    FAST_PATH_MAX_ROWS = 16
+    SKLEARN_MIN_ROWS = 128
+
+    def __init__(self, vectorizer, forest: CompiledForest, pipeline=None, source_signature=None):
+        self.featurizer = vectorizer
+        self.classifier = forest
+        self.classes_ = forest.classes_
+        # вихідний Pipeline: у щойно навченої моделі (для збереження) або довантажений
+        # з source_path для великих батчів; на диск разом зі скомпільованою моделлю не пишеться
+        self.pipeline = pipeline
+        self.source_signature = source_signature
+        self.source_path = None
+        self._pipeline_lock = threading.Lock()
+        self._bind_vectorizer()
+
+    def _bind_vectorizer(self):
+        vectorizer = self.featurizer
+        self._analyzer = vectorizer.build_analyzer()
+        self._vocabulary = vectorizer.vocabulary_
+        self._idf = vectorizer.idf_ if getattr(vectorizer, 'use_idf', True) else None
+        self._sublinear = getattr(vectorizer, 'sublinear_tf', False)
+        self._norm = getattr(vectorizer, 'norm', 'l2')
+
+    def __getstate__(self):
+        return {'featurizer': self.featurizer, 'classifier': self.classifier,
+                'source_signature': self.source_signature}
+
+    def __setstate__(self, state):
+        self.__init__(state['featurizer'], state['classifier'], source_signature=state['source_signature'])
+
+    def __getitem__(self, item):
+        if item == slice(None, -1) or item == 0:
+            return self.featurizer
+        if item == -1 or item == 1:
+            return self.classifier
+        raise IndexError(item)
+
+    def _row_features(self, text):
+        """Ненульові TF-IDF ознаки одного опису, обчислені як у TfidfVectorizer.transform."""
+        counts = {}
+        for token in self._analyzer(text):
+            idx = self._vocabulary.get(token)
+            if idx is not None:
+                counts[idx] = counts.get(idx, 0) + 1
+        if not counts:
+            return [], []
+        cols = sorted(counts)
+        tf = np.array([counts[c] for c in cols], dtype=np.float64)
+        if self._sublinear:
+            tf = np.log(tf) + 1.0
+        if self._idf is not None:
+            tf = tf * self._idf[cols]
+        # послідовне накопичення, як у sklearn.utils.sparsefuncs_fast
+        if self._norm == 'l2':
+            total = 0.0
+            for v in tf.tolist():
+                total += v * v
+            if total != 0.0:
+                tf = tf / math.sqrt(total)
+        elif self._norm == 'l1':
+            total = 0.0
+            for v in tf.tolist():
+                total += abs(v)
+            if total != 0.0:
+                tf = tf / total
+        return cols, tf
+
+    def _large_batch_pipeline(self):
+        """Pipeline, з якого скомпільовано модель, або None, якщо файл уже інший."""
+        if self.pipeline is not None or self.source_path is None:
+            return self.pipeline
+        with self._pipeline_lock:
+            path, self.source_path = self.source_path, None
+            if self.pipeline is None and path is not None:
+                try:
+                    if _file_signature(path) == self.source_signature:
+                        import joblib
+                        pipeline = joblib.load(path, mmap_mode=mmap_mode())
+                        if _file_signature(path) == self.source_signature:
+                            self.pipeline = pipeline
+                except OSError:
+                    pass
+        return self.pipeline
+
+    def predict_proba(self, texts):
+        texts = list(texts)
+        if len(texts) >= self.SKLEARN_MIN_ROWS:
+            pipeline = self._large_batch_pipeline()
+            if pipeline is not None:
+                return pipeline.predict_proba(texts)
+        if len(texts) > self.FAST_PATH_MAX_ROWS:
+            return self.classifier.predict_proba(self.featurizer.transform(texts))
+        rows, cols, vals = [], [], []
+        for i, text in enumerate(texts):
+            row_cols, row_vals = self._row_features(text)
+            rows.extend([i] * len(row_cols))
+            cols.extend(row_cols)
+            vals.extend(row_vals)
+        return self.classifier.predict_proba_coo(len(texts), rows, cols, vals)
+
+    def predict(self, texts):
+        return self.classes_.take(np.argmax(self.predict_proba(texts), axis=1), axis=0)
+
+
+def compile_forest(pipeline, source_signature=None) -> CompiledForestModel:
+    """Компілює навчений Pipeline([('tfidf', TfidfVectorizer), ('model', RandomForestClassifier)])."""
+    vectorizer, forest = pipeline[0], pipeline[-1]
+    if not hasattr(vectorizer, 'vocabulary_') or not hasattr(forest, 'estimators_'):
+        raise ValueError("Очікується навчений Pipeline TF-IDF + RandomForest")
+    return CompiledForestModel(vectorizer, CompiledForest(forest), pipeline=pipeline,
+                               source_signature=source_signature)
+
+
+def export_compiled(model, path: str) -> str:
+    """
+    Записує скомпільовану модель поруч з Pipeline, збереженим у path.
+    Артефакт запам'ятовує (розмір, mtime) Pipeline, тож застарілий файл ігнорується.
+    """
+    if not isinstance(model, CompiledForestModel):
+        model = compile_forest(model)
+    compiled = CompiledForestModel(model.featurizer, model.classifier, source_signature=_file_signature(path))
+    target = compiled_artifact_path(path)
+    atomic_joblib_dump(compiled, target)
+    return target
+
+
+def load_compiled(path: str):
+    """Скомпільована модель для Pipeline з path або None, якщо її немає чи вона застаріла."""
+    target = compiled_artifact_path(path)
+    if not os.path.exists(target) or not os.path.exists(path):
+        return None
+    import joblib
+    compiled = joblib.load(target, mmap_mode=mmap_mode())
+    if (not isinstance(compiled, CompiledForestModel)
+            or getattr(compiled.classifier, 'format_version', None) != CompiledForest.FORMAT_VERSION
+            or compiled.source_signature != _file_signature(path)):
+        return None
+    compiled.source_path = path
+    return compiled
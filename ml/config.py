@@ -1,7 +1,115 @@
+# Бекенд моделі (див. backends.py): "RF", "LINEAR" або "BERT"
 MODEL_TYPE = "RF" 
 
 DATA_FILE = "monobank_transactions_augmented2.csv"
 SKLEARN_MODEL_PATH = "production_model_rf.joblib"
+LINEAR_MODEL_PATH = "production_model_linear.joblib"
 
 BERT_BASE_MODEL = "bert-base-multilingual-cased"
-BERT_MODEL_PATH = ".\production_bert_model"
\ No newline at end of file
+BERT_MODEL_PATH = "production_bert_model"
+# CPU-інференс BERT (bert_model.py): динамічна int8-квантизація nn.Linear, кількість
+# потоків torch (None — за замовчуванням torch; з serve.py краще 1 на воркер),
+# обрізання довгих описів і розмір батчу (padding — до найдовшого опису в батчі)
+BERT_QUANTIZE = True
+BERT_NUM_THREADS = None
+BERT_MAX_LENGTH = 64
+BERT_BATCH_SIZE = 32
+
+# Максимальна кількість елементів у одному запиті /api/v1/categorize-batch
+BATCH_MAX_ITEMS = 1000
+
+# LRU-кеш персоналізованих моделей (None = без обмеження)
+PERSONALIZED_CACHE_MAX_ENTRIES = 64
+PERSONALIZED_CACHE_MAX_BYTES = 2 * 1024 ** 3  # оцінений розмір усіх моделей у кеші
+PERSONALIZED_CACHE_TTL_SECONDS = None  # напр. 3600 — видаляти моделі, що не використовувались годину
+
+# Режим персоналізації: "overlay" — заморожена глобальна модель + маленький
+# nearest-neighbour оверлей по виправленнях користувача (мілісекунди, кілобайти);
+# "full" — повне донавчання TF-IDF + RandomForest на глобальних даних + виправленнях.
+PERSONALIZATION_MODE = "overlay"
+# Мінімальна косинусна схожість, за якої оверлей перемагає глобальну модель
+OVERLAY_MIN_SIMILARITY = 0.6
+
+# Планувальник донавчання: виправлення в межах тихого вікна зливаються в одне донавчання
+RETRAIN_QUIET_WINDOW_SECONDS = 5.0
+RETRAIN_MAX_WORKERS = 1  # скільки користувачів можна донавчати паралельно
+RETRAIN_N_JOBS = 1  # n_jobs для RandomForest у режимі PERSONALIZATION_MODE = "full"
+
+# SQLite (WAL) база виправлень користувачів; старі CSV переносяться в неї при старті
+CORRECTIONS_DB_PATH = "user_corrections.sqlite3"
+
+# Кеш векторизованого глобального корпусу (ключ — хеш вмісту DATA_FILE); None — лише в пам'яті
+GLOBAL_CORPUS_CACHE_DIR = ".corpus_cache"
+
+# Спільні заморожені TF-IDF за версією (featurizer.py): персональні моделі режиму "full"
+# зберігаються лише як класифікатор і посилаються на версію TF-IDF у цьому каталозі
+FEATURIZER_DIR = ".featurizers"
+
+# Мінімальна триграмна (Dice) схожість канонічних назв мерчантів для нечіткого збігу з виправленням
+OVERRIDE_FUZZY_THRESHOLD = 0.75
+
+# RF-моделі виконуються скомпільованими (compiled_forest.py): ті самі прогнози, ~0.2 мс замість ~11 мс
+# на один опис; train.py пише production_model_rf.compiled.joblib поруч з Pipeline
+RF_COMPILED_INFERENCE = True
+
+# Підбір моделі (train.py --select): стратифікована крос-валідація сітки TF-IDF × класифікатор;
+# переможець — найшвидший з кандидатів, чия точність не нижча за найкращу більш ніж на допуск
+SELECT_CV_FOLDS = 5
+SELECT_N_JOBS = -1
+SELECT_ACCURACY_TOLERANCE = 0.002
+
+# Дистиляція (train.py --distill): студент (DISTILL_STUDENT, sklearn-бекенд) навчається на
+# м'яких мітках вчителя (DISTILL_TEACHER, зазвичай донавчений BERT) по навчальному CSV та
+# нерозміченим описам (DISTILL_UNLABELED_FILE: CSV з text_features/description або по опису в рядку).
+# Ціль для розмічених рядків — суміш розподілу вчителя з температурою і справжньої мітки
+DISTILL_TEACHER = "BERT"
+DISTILL_STUDENT = "RF"
+DISTILL_TEMPERATURE = 2.0
+DISTILL_HARD_LABEL_WEIGHT = 0.3
+DISTILL_UNLABELED_FILE = None
+
+# Каскад (cascade.py): глобальну модель замінює ланцюжок CASCADE_MODEL_TYPES (від дешевої
+# до дорогої); модель відповідає, якщо її впевненість (max predict_proba) не менша за
+# CASCADE_CONFIDENCE_THRESHOLD, інакше опис іде далі. Поріг: python train.py --cascade-sweep
+CASCADE_ENABLED = False
+CASCADE_MODEL_TYPES = ["LINEAR", "RF"]
+CASCADE_CONFIDENCE_THRESHOLD = 0.6
+
+# Кеш результатів прогнозу за (модель, версія, опис); 0 — вимкнено
+PREDICTION_CACHE_MAX_ENTRIES = 50000
+# Мікробатчинг одночасних одиночних /api/v1/categorize до однієї моделі: лідер чекає
+# до MICRO_BATCH_MAX_WAIT_MS (лише коли запити йдуть частіше за цей інтервал) або
+# до MICRO_BATCH_MAX_SIZE описів і виконує один predict на всіх
+MICRO_BATCHING_ENABLED = True
+MICRO_BATCH_MAX_SIZE = 32
+MICRO_BATCH_MAX_WAIT_MS = 2.0
+# Бекенд для PERSONALIZATION_MODE = "full" (None — як MODEL_TYPE)
+PERSONALIZED_MODEL_TYPE = None
+
+# Детерміновані MCC-правила (будуються train.py): MCC з достатньою підтримкою та
+# чистотою категорії відповідаються з таблиці без виклику моделі
+MCC_RULES_PATH = "mcc_rules.json"
+MCC_RULES_ENABLED = True
+MCC_RULE_MIN_SUPPORT = 20
+MCC_RULE_MIN_PURITY = 0.98
+
+# Багатопроцесне обслуговування (serve.py): моделі завантажуються один раз до fork,
+# воркери ділять їх сторінки пам'яті (copy-on-write + mmap масивів моделі)
+SERVING_HOST = "0.0.0.0"
+SERVING_PORT = 8000
+SERVING_WORKERS = 4
+MODEL_MMAP = True
+# Воркери помічають виправлення/донавчання, зроблені іншими воркерами (перевірка не частіше ніж раз на інтервал)
+CROSS_WORKER_SYNC = True
+CROSS_WORKER_SYNC_INTERVAL_SECONDS = 0.5
+
+# Запуск: "background" — модель і стан вантажаться у фоновому потоці (сервер одразу
+# відповідає на /health/live, /health/ready стає 200 після прогріву); "blocking" — як раніше
+STARTUP_MODE = "background"
+# Скільки запит на категоризацію чекає фонового завантаження, перш ніж отримати 503
+STARTUP_WAIT_SECONDS = 30.0
+# Описи для прогріву моделі перед першим запитом
+WARMUP_TEXTS = ["АТБ", "Сільпо", "Київстар", "Uber", "Аптека Доброго Дня"]
+
+# Рівень логування сервісу: "DEBUG" вмикає per-request записи (override, кеш, час інференсу)
+LOG_LEVEL = "INFO"
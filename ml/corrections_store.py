@@ -0,0 +1,271 @@
+"""
+Сховище виправлень користувачів на SQLite (WAL) замість append-only CSV.
+
+Ключ (user_id, нормалізований опис) унікальний, тому повторні виправлення
+того самого опису зливаються (upsert, перемагає останнє). Читання для одного
+користувача йде по індексу і не залежить від загальної кількості виправлень.
+Старі CSV-файли переносяться одноразовою міграцією.
+
+Кожен запис отримує наступний revision і мітку writer свого сховища, тож
+воркер може запитати, чиї виправлення змінили інші процеси після його
+останньої перевірки (changed_users_since).
+"""
+import csv
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+
+CSV_COLUMNS = ['user_id', 'description', 'original_category_id', 'corrected_category_id',
+               'original_category_name', 'corrected_category_name']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS corrections (
+    user_id TEXT NOT NULL,
+    norm_description TEXT NOT NULL,
+    description TEXT NOT NULL,
+    original_category_id INTEGER,
+    corrected_category_id INTEGER,
+    original_category_name TEXT,
+    corrected_category_name TEXT,
+    updated_at TEXT NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0,
+    writer TEXT,
+    PRIMARY KEY (user_id, norm_description)
+);
+CREATE TABLE IF NOT EXISTS migrations (
+    name TEXT PRIMARY KEY,
+    rows INTEGER NOT NULL,
+    applied_at TEXT NOT NULL
+);
+"""
+# колонки, яких немає в базах, створених до появи revision
+_ADDED_COLUMNS = (
+    ('revision', 'INTEGER NOT NULL DEFAULT 0'),
+    ('writer', 'TEXT'),
+)
+_INDEXES = 'CREATE INDEX IF NOT EXISTS corrections_revision ON corrections (revision);'
+
+
+def _default_normalize(desc) -> str:
+    if desc is None:
+        return ''
+    return str(desc).strip().lower()
+
+
+def _to_int(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    if not value:
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
+
+
+def _clean_text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def read_corrections_csv(path):
+    """
+    Толерантно читає CSV з виправленнями: заголовок буває на 4 або 6 колонок,
+    а рядки — змішаної довжини, тому колонки зіставляються за позицією.
+    Повертає список dict з ключами CSV_COLUMNS.
+    """
+    rows = []
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return rows
+        for i, cells in enumerate(reader, start=2):
+            if len(cells) < 2:
+                print(f"⚠️ Skipping tiny/invalid row {i} in corrections file {path}: {cells}")
+                continue
+            row = {col: (cells[idx].strip() if idx < len(cells) else '') for idx, col in enumerate(CSV_COLUMNS)}
+            if len(cells) > len(CSV_COLUMNS):
+                # коми всередині назви категорії
+                row['corrected_category_name'] = ','.join(c.strip() for c in cells[len(CSV_COLUMNS) - 1:])
+            rows.append(row)
+    return rows
+
+
+class CorrectionsStore:
+    """Потокобезпечне сховище виправлень (окреме SQLite-з'єднання на потік)."""
+
+    def __init__(self, path: str, normalize=_default_normalize):
+        self.path = path
+        self.normalize = normalize
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._version_conn = None
+        self._version_lock = threading.Lock()
+        # мітка записів цього сховища: власні зміни не треба скидати з кешів
+        self.writer = uuid.uuid4().hex
+        if hasattr(os, 'register_at_fork'):
+            # SQLite-з'єднання не можна переносити через fork (serve.py) — дочірній процес відкриває свої
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._local = threading.local()
+        self._version_conn = None
+        self._version_lock = threading.Lock()
+        self.writer = uuid.uuid4().hex  # дочірній процес — окремий воркер
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with self._init_lock:
+                if not self._initialized:
+                    conn.executescript(_SCHEMA)
+                    existing = {r[1] for r in conn.execute('PRAGMA table_info(corrections)')}
+                    for column, definition in _ADDED_COLUMNS:
+                        if column not in existing:
+                            try:
+                                conn.execute(f'ALTER TABLE corrections ADD COLUMN {column} {definition}')
+                            except sqlite3.OperationalError as e:
+                                # інший воркер щойно додав ту саму колонку
+                                if 'duplicate column' not in str(e):
+                                    raise
+                    conn.executescript(_INDEXES)
+                    self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    def upsert(self, user_id, description, original_category_id=None, corrected_category_id=None,
+               original_category_name=None, corrected_category_name=None, conn=None):
+        """Додає виправлення або замінює попереднє для того самого (user_id, опис)."""
+        uid = str(user_id).strip()
+        desc = str(description or '').strip()
+        norm = self.normalize(desc)
+        if not uid or not norm:
+            return False
+        params = (
+            uid, norm, desc,
+            _to_int(original_category_id), _to_int(corrected_category_id),
+            _clean_text(original_category_name), _clean_text(corrected_category_name),
+            datetime.utcnow().isoformat(), self.writer
+        )
+        # revision рахується в тій самій інструкції, що й запис: SQLite серіалізує записувачів
+        sql = """
+            INSERT INTO corrections (user_id, norm_description, description, original_category_id,
+                                     corrected_category_id, original_category_name, corrected_category_name, updated_at,
+                                     revision, writer)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, (SELECT COALESCE(MAX(revision), 0) + 1 FROM corrections), ?)
+            ON CONFLICT(user_id, norm_description) DO UPDATE SET
+                description = excluded.description,
+                original_category_id = excluded.original_category_id,
+                corrected_category_id = excluded.corrected_category_id,
+                original_category_name = excluded.original_category_name,
+                corrected_category_name = excluded.corrected_category_name,
+                updated_at = excluded.updated_at,
+                revision = excluded.revision,
+                writer = excluded.writer
+        """
+        if conn is not None:
+            conn.execute(sql, params)
+        else:
+            with self._conn() as c:
+                c.execute(sql, params)
+        return True
+
+    def get_user_corrections(self, user_id) -> list:
+        """Усі (вже злиті) виправлення користувача в порядку їх оновлення."""
+        cur = self._conn().execute(
+            'SELECT * FROM corrections WHERE user_id = ? ORDER BY updated_at, rowid',
+            (str(user_id).strip(),)
+        )
+        return [dict(r) for r in cur.fetchall()]
+
+    def get_user_overrides(self, user_id) -> dict:
+        """{нормалізований опис: corrected_category_id} для точних збігів."""
+        cur = self._conn().execute(
+            'SELECT norm_description, corrected_category_id FROM corrections '
+            'WHERE user_id = ? AND corrected_category_id IS NOT NULL',
+            (str(user_id).strip(),)
+        )
+        return {r[0]: int(r[1]) for r in cur.fetchall()}
+
+    def last_revision(self) -> int:
+        """Найбільший revision у базі (0 для порожньої)."""
+        return self._conn().execute('SELECT COALESCE(MAX(revision), 0) FROM corrections').fetchone()[0]
+
+    def changed_users_since(self, revision: int):
+        """
+        Користувачі, чиї виправлення інші сховища (воркери) змінили після revision,
+        і новий revision для наступного виклику. Власні записи не повертаються.
+        """
+        rows = self._conn().execute(
+            'SELECT user_id, revision, writer FROM corrections WHERE revision > ?', (revision,)
+        ).fetchall()
+        users = {r[0] for r in rows if r[2] != self.writer}
+        return users, max([revision] + [r[1] for r in rows])
+
+    def count(self, user_id=None) -> int:
+        if user_id is None:
+            return self._conn().execute('SELECT COUNT(*) FROM corrections').fetchone()[0]
+        return self._conn().execute('SELECT COUNT(*) FROM corrections WHERE user_id = ?', (str(user_id).strip(),)).fetchone()[0]
+
+    def migrate_csv(self, csv_path, resolve_category_name=None, resolve_category_names=None) -> int:
+        """
+        Одноразово переносить CSV-файл у сховище (повторний виклик нічого не робить).
+        Якщо corrected_category_id порожній, пробує resolve_category_name(назва)
+        або — для всіх таких рядків одним викликом — resolve_category_names(назви).
+        Повертає кількість перенесених рядків.
+        """
+        if not os.path.exists(csv_path):
+            return 0
+        name = os.path.basename(csv_path)
+        conn = self._conn()
+        if conn.execute('SELECT 1 FROM migrations WHERE name = ?', (name,)).fetchone():
+            return 0
+        rows = read_corrections_csv(csv_path)
+        resolved = {}
+        if resolve_category_names is not None:
+            names = list({row['corrected_category_name'] for row in rows
+                          if _to_int(row['corrected_category_id']) is None and row['corrected_category_name']})
+            resolved = dict(zip(names, resolve_category_names(names)))
+        migrated = 0
+        with conn:
+            for row in rows:
+                corrected_id = _to_int(row['corrected_category_id'])
+                if corrected_id is None and row['corrected_category_name']:
+                    if resolve_category_names is not None:
+                        corrected_id = resolved.get(row['corrected_category_name'])
+                    elif resolve_category_name:
+                        corrected_id = resolve_category_name(row['corrected_category_name'])
+                if self.upsert(row['user_id'], row['description'], row['original_category_id'], corrected_id,
+                               row['original_category_name'], row['corrected_category_name'], conn=conn):
+                    migrated += 1
+            conn.execute('INSERT INTO migrations (name, rows, applied_at) VALUES (?, ?, ?)',
+                         (name, migrated, datetime.utcnow().isoformat()))
+        return migrated
+
+    def data_version(self) -> int:
+        """
+        PRAGMA data_version окремого з'єднання: змінюється, коли будь-яке інше
+        з'єднання (інший потік чи воркер-процес) зафіксувало зміни в базі.
+        """
+        with self._version_lock:
+            if self._version_conn is None:
+                self._conn()  # гарантує наявність схеми
+                self._version_conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            return self._version_conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,177 @@
+"""
+Спільний заморожений TF-IDF ("featurizer") для глобальної та персональних моделей.
+
+Версія featurizer — хеш його словника, idf та параметрів, тож два векторизатори,
+навчені на тому самому корпусі, мають однакову версію і дають однакові ознаки.
+Сервіс тримає один екземпляр на версію (FeaturizerRegistry): персональні моделі
+режиму "full" зберігаються лише як класифікатор + версія (ClassifierArtifact) і
+при завантаженні отримують спільний екземпляр замість власної копії словника.
+
+У батчі (FeatureMemo) описи всіх моделей з однаковою версією — глобальної,
+оверлеїв, персональних класифікаторів — векторизуються одним transform, а
+кожна модель отримує готові рядки розрідженої матриці.
+"""
+import hashlib
+import os
+import threading
+import weakref
+
+import numpy as np
+
+# версії вже обчислені для векторизатора (словник не змінюється після навчання)
+_versions = weakref.WeakKeyDictionary()
+
+
+def featurizer_version(vectorizer) -> str:
+    """Версія навченого TF-IDF: хеш параметрів, словника та idf (16 hex-символів)."""
+    try:
+        return _versions[vectorizer]
+    except KeyError:
+        pass
+    digest = hashlib.sha256()
+    params = sorted((name, repr(value)) for name, value in vectorizer.get_params().items())
+    digest.update(repr(params).encode('utf-8'))
+    for term, index in sorted(vectorizer.vocabulary_.items()):
+        digest.update(f"{term}\t{index}\n".encode('utf-8'))
+    idf = getattr(vectorizer, 'idf_', None)
+    if idf is not None:
+        digest.update(np.ascontiguousarray(idf, dtype=np.float64).tobytes())
+    version = digest.hexdigest()[:16]
+    _versions[vectorizer] = version
+    return version
+
+
+def feature_predictor(model):
+    """
+    (TF-IDF, predict(X)) для моделі, що вміє прогнозувати по готових ознаках,
+    або None (каскад, BERT, довільні обгортки).
+    """
+    if hasattr(model, 'predict_features'):
+        vectorizer = model.feature_source
+        return (vectorizer, model.predict_features) if vectorizer is not None else None
+    try:
+        vectorizer, classifier = model[0], model[-1]
+    except (TypeError, IndexError, KeyError):
+        return None
+    if hasattr(vectorizer, 'vocabulary_') and hasattr(classifier, 'predict'):
+        return vectorizer, classifier.predict
+    return None
+
+
+class ClassifierArtifact:
+    """
+    Персональна модель на диску: лише навчений класифікатор і версія TF-IDF,
+    ознаки якого він приймає (словник — спільний, у FeaturizerRegistry).
+    """
+
+    def __init__(self, classifier, featurizer_version: str, backend=None):
+        self.classifier = classifier
+        self.featurizer_version = featurizer_version
+        self.backend = backend
+
+    @classmethod
+    def from_model(cls, model, backend=None):
+        """Класифікатор навченої моделі (Pipeline, LinearTextModel, CompiledForestModel з pipeline)."""
+        pipeline = getattr(model, 'pipeline', None) or model
+        return cls(pipeline[-1], featurizer_version(pipeline[0]), backend=backend)
+
+    def bind(self, registry):
+        """Pipeline зі спільним TF-IDF потрібної версії; FileNotFoundError, якщо її немає."""
+        from sklearn.pipeline import Pipeline
+        vectorizer = registry.get(self.featurizer_version)
+        if vectorizer is None:
+            raise FileNotFoundError(f"Featurizer {self.featurizer_version} not found in {registry.directory}")
+        return Pipeline([('tfidf', vectorizer), ('model', self.classifier)])
+
+
+class FeaturizerRegistry:
+    """
+    Заморожені TF-IDF за версією: один екземпляр на версію в процесі та копія на
+    диску (directory/tfidf-<версія>.joblib) для класифікаторів, що на неї посилаються.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._by_version = {}
+
+    def path_for(self, version: str) -> str:
+        return os.path.join(self.directory, f"tfidf-{version}.joblib")
+
+    def versions(self):
+        return sorted(self._by_version)
+
+    def intern(self, vectorizer, persist: bool = False):
+        """
+        Канонічний екземпляр для версії vectorizer (перший зареєстрований).
+        persist=True — гарантує копію на диску (для збереження ClassifierArtifact).
+        """
+        version = featurizer_version(vectorizer)
+        with self._lock:
+            vectorizer = self._by_version.setdefault(version, vectorizer)
+        if persist:
+            self._save(version, vectorizer)
+        return vectorizer
+
+    def get(self, version: str):
+        """Екземпляр версії з пам'яті або з диска; None, якщо її ніде немає."""
+        vectorizer = self._by_version.get(version)
+        if vectorizer is not None:
+            return vectorizer
+        path = self.path_for(version)
+        if not os.path.exists(path):
+            return None
+        import joblib
+        loaded = joblib.load(path)
+        if featurizer_version(loaded) != version:
+            raise ValueError(f"{path} містить TF-IDF іншої версії")
+        with self._lock:
+            return self._by_version.setdefault(version, loaded)
+
+    def _save(self, version, vectorizer):
+        path = self.path_for(version)
+        if os.path.exists(path):
+            return
+        from backends import atomic_joblib_dump
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_joblib_dump(vectorizer, path)
+
+
+class FeatureMemo:
+    """
+    Ознаки в межах одного батчу. Моделі реєструють свої описи; описи всіх
+    моделей з однаковою версією TF-IDF векторизуються одним transform під час
+    першого прогнозу, далі кожна модель отримує свої рядки готової матриці.
+    """
+
+    def __init__(self):
+        self._rows = {}         # версія -> {опис: номер рядка}
+        self._vectorizers = {}  # версія -> TF-IDF
+        self._models = {}       # версія -> кількість зареєстрованих моделей
+        self._matrices = {}     # версія -> CSR
+
+    def register(self, model, texts):
+        source = feature_predictor(model)
+        if source is None:
+            return None
+        version = featurizer_version(source[0])
+        rows = self._rows.setdefault(version, {})
+        for text in texts:
+            rows.setdefault(text, len(rows))
+        self._vectorizers.setdefault(version, source[0])
+        self._models[version] = self._models.get(version, 0) + 1
+        return version
+
+    def shares(self, model) -> bool:
+        """Чи ділить модель ознаки хоча б з однією іншою моделлю батчу."""
+        source = feature_predictor(model)
+        return source is not None and self._models.get(featurizer_version(source[0]), 0) > 1
+
+    def predict(self, model, texts):
+        vectorizer, predict = feature_predictor(model)
+        version = featurizer_version(vectorizer)
+        rows = self._rows[version]
+        X = self._matrices.get(version)
+        if X is None:
+            X = self._matrices[version] = self._vectorizers[version].transform(list(rows)).tocsr()
+        return predict(X[[rows[text] for text in texts]])
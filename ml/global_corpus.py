@@ -0,0 +1,151 @@
+"""
+Кешований, заздалегідь векторизований глобальний навчальний корпус.
+
+Глобальний датасет змінюється лише при запуску train.py, тому він читається
+(через train.load_and_clean_data) і векторизується один раз: словник TF-IDF та
+розріджена матриця ознак тримаються в пам'яті й зберігаються на диск у
+каталозі, ключем якого є хеш вмісту CSV. Донавчання персональних моделей
+векторизує лише нові рядки виправлень і дописує їх до кешованої матриці.
+"""
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+
+def file_content_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class GlobalCorpus:
+    """Векторизований глобальний корпус: vectorizer, X (CSR), labels, content_hash."""
+
+    def __init__(self, vectorizer, X, labels, content_hash):
+        self.vectorizer = vectorizer
+        self.X = X
+        self.labels = labels
+        self.content_hash = content_hash
+
+    @property
+    def n_rows(self):
+        return self.X.shape[0]
+
+    def with_extra_rows(self, texts, labels):
+        """Повертає (X, y): кешована матриця + векторизовані додаткові рядки."""
+        if not texts:
+            return self.X, self.labels
+        import scipy.sparse as sp
+        X_extra = self.vectorizer.transform(texts)
+        X = sp.vstack([self.X, X_extra], format='csr')
+        y = np.concatenate([self.labels, np.asarray(labels, dtype=self.labels.dtype)])
+        return X, y
+
+    # --- кеш на диску ---
+    @staticmethod
+    def _cache_paths(cache_dir, content_hash):
+        base = os.path.join(cache_dir, content_hash[:16])
+        return {
+            'vectorizer': base + '.vectorizer.joblib',
+            'data': base + '.data.npy',
+            'indices': base + '.indices.npy',
+            'indptr': base + '.indptr.npy',
+            'shape': base + '.shape.npy',
+            'labels': base + '.labels.npy',
+        }
+
+    def save(self, cache_dir):
+        import joblib
+        os.makedirs(cache_dir, exist_ok=True)
+        paths = self._cache_paths(cache_dir, self.content_hash)
+        X = self.X.tocsr()
+        np.save(paths['data'], X.data)
+        np.save(paths['indices'], X.indices)
+        np.save(paths['indptr'], X.indptr)
+        np.save(paths['shape'], np.asarray(X.shape))
+        np.save(paths['labels'], self.labels)
+        # векторизатор пишемо останнім — його наявність означає повний кеш
+        joblib.dump(self.vectorizer, paths['vectorizer'])
+
+    @classmethod
+    def load_cached(cls, cache_dir, content_hash, mmap=True):
+        import joblib
+        import scipy.sparse as sp
+        paths = cls._cache_paths(cache_dir, content_hash)
+        if not os.path.exists(paths['vectorizer']):
+            return None
+        mode = 'r' if mmap else None
+        X = sp.csr_matrix(
+            (np.load(paths['data'], mmap_mode=mode),
+             np.load(paths['indices'], mmap_mode=mode),
+             np.load(paths['indptr'], mmap_mode=mode)),
+            shape=tuple(np.load(paths['shape'])),
+            copy=False
+        )
+        labels = np.load(paths['labels'])
+        return cls(joblib.load(paths['vectorizer']), X, labels, content_hash)
+
+    @classmethod
+    def build(cls, data_file, content_hash):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from train import load_and_clean_data
+
+        df = load_and_clean_data(data_file)
+        vectorizer = TfidfVectorizer()
+        X = vectorizer.fit_transform(df['text_features']).tocsr()
+        labels = df['labels'].to_numpy(dtype=np.int64)
+        return cls(vectorizer, X, labels, content_hash)
+
+
+class GlobalCorpusProvider:
+    """
+    Лінивий потокобезпечний доступ до GlobalCorpus. CSV перечитується лише
+    тоді, коли змінились його mtime/розмір і, відповідно, хеш вмісту.
+    """
+
+    def __init__(self, data_file, cache_dir=None, mmap=True):
+        self.data_file = data_file
+        self.cache_dir = cache_dir
+        self.mmap = mmap
+        self._lock = threading.Lock()
+        self._corpus = None
+        self._stat = None
+        self.builds = 0
+        self.disk_loads = 0
+
+    def get(self) -> GlobalCorpus:
+        st = os.stat(self.data_file)
+        stat_key = (st.st_mtime_ns, st.st_size)
+        corpus = self._corpus
+        if corpus is not None and self._stat == stat_key:
+            return corpus
+        with self._lock:
+            if self._corpus is not None and self._stat == stat_key:
+                return self._corpus
+            content_hash = file_content_hash(self.data_file)
+            if self._corpus is not None and self._corpus.content_hash == content_hash:
+                self._stat = stat_key
+                return self._corpus
+            corpus = None
+            if self.cache_dir:
+                try:
+                    corpus = GlobalCorpus.load_cached(self.cache_dir, content_hash, mmap=self.mmap)
+                except Exception as e:
+                    print(f"⚠️ Не вдалося прочитати кеш корпусу: {e}")
+                if corpus is not None:
+                    self.disk_loads += 1
+            if corpus is None:
+                corpus = GlobalCorpus.build(self.data_file, content_hash)
+                self.builds += 1
+                if self.cache_dir:
+                    try:
+                        corpus.save(self.cache_dir)
+                    except Exception as e:
+                        print(f"⚠️ Не вдалося зберегти кеш корпусу: {e}")
+            self._corpus = corpus
+            self._stat = stat_key
+            return corpus
@@ -1,70 +1,590 @@
-import requests
+"""
+Сценарне навантажувальне тестування ML API.
+
+Описи транзакцій беруться з monobank_transactions_augmented2.csv (з їх
+реальною частотою), користувачі — синтетична популяція. Сценарії покривають
+дорогі шляхи: виправлення користувачів, холодні персональні моделі, донавчання
+паралельно з інференсом, батчі.
+
+Режими навантаження:
+  * закритий цикл (--concurrency N): N потоків шлють запити один за одним;
+  * відкритий цикл (--rate R): запити надходять з інтенсивністю R/с (пуассонівський
+    потік) незалежно від того, чи встиг сервіс відповісти. Латентність рахується від
+    запланованого моменту відправлення, тож черга на боці клієнта теж потрапляє у p99.
+
+Цілі:
+  * --in-process (за замовчуванням): ASGI-застосунок api.app у цьому ж процесі,
+    без мережі, з тимчасовим робочим каталогом (реальні виправлення не зачіпаються);
+  * --url http://localhost:8000: запущений сервер (потрібен пакет requests;
+    синтетичні користувачі мають префікс loadtest-).
+
+Результати пишуться в JSON (--out) і порівнюються з попереднім запуском
+(--compare baseline.json): регресія p50/p95/p99 або пропускної здатності понад
+--tolerance повертає код виходу 1.
+
+Приклади:
+    python load_test.py --list
+    python load_test.py global_mix --requests 2000 --concurrency 8 --out global.json
+    python load_test.py cold_personalized --rate 50 --duration 20 --compare global.json
+    python load_test.py retrain_concurrent --url http://localhost:8000 --rate 20 --duration 30
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
 import time
-import concurrent.futures
-import statistics
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATA_FILE = os.path.join(ML_DIR, 'monobank_transactions_augmented2.csv')
+
+CATEGORIZE = '/api/v1/categorize'
+CATEGORIZE_BATCH = '/api/v1/categorize-batch'
+SUBMIT_CORRECTION = '/api/v1/submit-correction'
+
+# kind — група, за якою рахується статистика (напр. 'categorize' і 'correction' окремо)
+Request = namedtuple('Request', ['kind', 'path', 'payload'])
+Result = namedtuple('Result', ['kind', 'status', 'latency', 'sources'])
+
+
+# --- Дані ---
+
+def load_transactions(path=DEFAULT_DATA_FILE):
+    """Рядки датасету як dict(description, mcc, category_id); частоти описів зберігаються."""
+    rows = []
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            desc = (row.get('text_features') or '').strip()
+            if not desc:
+                continue
+            try:
+                category_id = int(float(row.get('category_id') or ''))
+                mcc = int(float(row.get('mcc') or 0))
+            except ValueError:
+                continue
+            rows.append({'description': desc, 'mcc': mcc or None, 'category_id': category_id})
+    if not rows:
+        raise ValueError(f"У {path} немає придатних рядків")
+    return rows
+
+
+class Workload:
+    """Джерело випадкових транзакцій і синтетичних користувачів для сценарію."""
+
+    def __init__(self, transactions, users=100, seed=42, use_mcc=True, user_prefix='loadtest'):
+        self.transactions = transactions
+        self.users = max(1, users)
+        self.use_mcc = use_mcc
+        self.user_prefix = user_prefix
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        # лише категорії, що існують у даних (і в моделі), — без шляху невідомої категорії
+        self.category_ids = sorted({t['category_id'] for t in transactions})
+
+    def user_id(self, i: int) -> str:
+        return f'{self.user_prefix}-{i}'
+
+    def random_user(self) -> str:
+        with self._lock:
+            return self.user_id(self.rng.randrange(self.users))
+
+    def random_transaction(self) -> dict:
+        with self._lock:
+            return self.rng.choice(self.transactions)
+
+    def categorize_payload(self, user_id, txn) -> dict:
+        payload = {'description': txn['description'], 'user_id': user_id}
+        if self.use_mcc and txn['mcc']:
+            payload['mcc'] = txn['mcc']
+        return payload
+
+    def correction_payload(self, user_id, txn) -> dict:
+        # виправлення на "сусідню" відому категорію, щоб воно відрізнялось від глобальної моделі
+        ids = self.category_ids
+        corrected = ids[(ids.index(txn['category_id']) + 1) % len(ids)]
+        return {'user_id': user_id, 'description': txn['description'],
+                'original_category_id': txn['category_id'],
+                'corrected_category_id': corrected}
+
+
+# --- Сценарії ---
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    def decorator(cls):
+        cls.name = name
+        SCENARIOS[name] = cls
+        return cls
+    return decorator
+
+
+class Scenario:
+    """Базовий сценарій: setup() готує стан, next_request() генерує наступний запит."""
+    name = None
+    # після setup скинути кеші in-process (перші запити користувачів підуть на диск)
+    cold = False
+
+    def __init__(self, workload: Workload, batch_size: int = 100):
+        self.workload = workload
+        self.batch_size = batch_size
+
+    def setup(self, client):
+        pass
+
+    def next_request(self) -> Request:
+        raise NotImplementedError
+
+
+@scenario('hot_single')
+class HotSingle(Scenario):
+    """Старий load_test.py: один користувач, один опис ("Київстар") — верхня межа через кеш."""
+
+    def next_request(self):
+        return Request('categorize', CATEGORIZE, {'description': 'Київстар', 'user_id': self.workload.user_id(0)})
+
+
+@scenario('global_mix')
+class GlobalMix(Scenario):
+    """Реальні описи з датасету від багатьох користувачів без персоналізації (глобальна модель, MCC-правила)."""
+
+    def next_request(self):
+        w = self.workload
+        return Request('categorize', CATEGORIZE, w.categorize_payload(w.random_user(), w.random_transaction()))
+
+
+@scenario('override_hits')
+class OverrideHits(Scenario):
+    """Користувачі з виправленнями запитують виправлені описи: точні збіги та варіації мерчанта (нечіткий пошук)."""
+    CORRECTIONS_PER_USER = 5
+    VARIANTS = ('{}', '{} 1234', 'Скасування. {}', '{}  ', '{} #12')
+
+    def setup(self, client):
+        self.corrected = defaultdict(list)
+        w = self.workload
+        for i in range(w.users):
+            uid = w.user_id(i)
+            for _ in range(self.CORRECTIONS_PER_USER):
+                txn = w.random_transaction()
+                client.post(SUBMIT_CORRECTION, w.correction_payload(uid, txn))
+                self.corrected[uid].append(txn['description'])
+        wait_for_retrains(client)
+
+    def next_request(self):
+        w = self.workload
+        uid = w.random_user()
+        with w._lock:
+            desc = w.rng.choice(self.corrected[uid])
+            variant = w.rng.choice(self.VARIANTS)
+        return Request('categorize', CATEGORIZE, {'description': variant.format(desc), 'user_id': uid})
+
+
+@scenario('cold_personalized')
+class ColdPersonalized(Scenario):
+    """Кожен користувач має персональну модель; кеші скинуто, тож перші звернення вантажать модель з диска."""
+    cold = True
+
+    def setup(self, client):
+        w = self.workload
+        for i in range(w.users):
+            client.post(SUBMIT_CORRECTION, w.correction_payload(w.user_id(i), w.random_transaction()))
+        wait_for_retrains(client)
+
+    def next_request(self):
+        w = self.workload
+        payload = w.categorize_payload(w.random_user(), w.random_transaction())
+        payload.pop('mcc', None)  # повз MCC-правила — до моделі
+        return Request('categorize', CATEGORIZE, payload)
+
+
+@scenario('retrain_concurrent')
+class RetrainConcurrent(ColdPersonalized):
+    """Інференс персональних моделей, поки ~10% запитів — нові виправлення, що запускають донавчання."""
+    cold = False
+    CORRECTION_SHARE = 0.1
+
+    def next_request(self):
+        w = self.workload
+        with w._lock:
+            is_correction = w.rng.random() < self.CORRECTION_SHARE
+        if is_correction:
+            return Request('correction', SUBMIT_CORRECTION, w.correction_payload(w.random_user(), w.random_transaction()))
+        return super().next_request()
+
+
+@scenario('batch')
+class Batch(Scenario):
+    """/categorize-batch з batch_size описів від різних користувачів (як синхронізація виписки)."""
+
+    def next_request(self):
+        w = self.workload
+        items = [w.categorize_payload(w.random_user(), w.random_transaction()) for _ in range(self.batch_size)]
+        return Request('batch', CATEGORIZE_BATCH, {'items': items})
+
+
+# --- Клієнти ---
+
+class HttpClient:
+    """Запущений сервер по HTTP."""
 
-# Налаштування тесту
-URL = "http://localhost:8000/api/v1/categorize"
-NUM_REQUESTS = 50  # Скільки всього запитів відправити
-CONCURRENT_USERS = 1 # Скільки "користувачів" одночасно
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=64, pool_maxsize=256)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
-# Тестові дані
-PAYLOAD = {
-    "description": "Київстар",
-    "user_id": "load_test_user"
-}
+    def __enter__(self):
+        return self
 
-def send_request(request_id):
+    def __exit__(self, *exc):
+        self.session.close()
+
+    @property
+    def target(self):
+        return self.base_url
+
+    def post(self, path, payload):
+        resp = self.session.post(self.base_url + path, json=payload, timeout=self.timeout)
+        return resp.status_code, _json_or_none(resp)
+
+    def get(self, path):
+        resp = self.session.get(self.base_url + path, timeout=self.timeout)
+        return resp.status_code, _json_or_none(resp)
+
+    def reset_caches(self):
+        return False
+
+
+class InProcessClient:
+    """
+    ASGI-застосунок api.app у цьому процесі (starlette TestClient, без мережі).
+    Робочий каталог тимчасовий: база виправлень і персональні моделі не змішуються з реальними.
+    """
+
+    def __init__(self, quiet_window_seconds: float = 0.05, workdir: str = None):
+        self.quiet_window_seconds = quiet_window_seconds
+        self.workdir = workdir
+        self._tmp = None
+        self._cwd = None
+        self._client = None
+        self.api = None
+
+    @property
+    def target(self):
+        return 'in-process'
+
+    def __enter__(self):
+        if ML_DIR not in sys.path:
+            sys.path.insert(0, ML_DIR)
+        import config
+        # моделі, датасет і MCC-правила — з ml/, змінюваний стан — у тимчасовому каталозі
+        for name in ('SKLEARN_MODEL_PATH', 'LINEAR_MODEL_PATH', 'DATA_FILE', 'MCC_RULES_PATH'):
+            setattr(config, name, os.path.join(ML_DIR, getattr(config, name)))
+        if self.workdir is None:
+            self._tmp = tempfile.TemporaryDirectory(prefix='ml-loadtest-')
+            self.workdir = self._tmp.name
+        config.CORRECTIONS_DB_PATH = os.path.join(self.workdir, 'corrections.sqlite3')
+        config.GLOBAL_CORPUS_CACHE_DIR = os.path.join(ML_DIR, config.GLOBAL_CORPUS_CACHE_DIR)
+        config.RETRAIN_QUIET_WINDOW_SECONDS = self.quiet_window_seconds
+        self._cwd = os.getcwd()
+        os.chdir(self.workdir)
+
+        import api
+        from fastapi.testclient import TestClient
+        self.api = api
+        self._client = TestClient(api.app)
+        self._client.__enter__()  # startup-події (фонове завантаження моделі)
+        deadline = time.time() + 120
+        while self._client.get('/health/ready').status_code != 200:
+            if time.time() > deadline:
+                raise RuntimeError('Сервіс не став готовим за 120 с')
+            time.sleep(0.1)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            self._client.__exit__(*exc)
+        finally:
+            os.chdir(self._cwd)
+            if self._tmp is not None:
+                self._tmp.cleanup()
+
+    def post(self, path, payload):
+        resp = self._client.post(path, json=payload)
+        return resp.status_code, _json_or_none(resp)
+
+    def get(self, path):
+        resp = self._client.get(path)
+        return resp.status_code, _json_or_none(resp)
+
+    def reset_caches(self):
+        self.api.personalized_models_cache.clear()
+        self.api.prediction_cache.invalidate_all()
+        return True
+
+
+def _json_or_none(resp):
     try:
-        start = time.time()
-        response = requests.post(URL, json=PAYLOAD)
-        end = time.time()
-        
-        latency = (end - start) * 1000 # Час у мс
-        
-        if response.status_code == 200:
-            return latency
-        else:
-            print(f"❌ Помилка {response.status_code}: {response.text}")
-            return None
+        return resp.json()
+    except ValueError:
+        return None
+
+
+def wait_for_retrains(client, timeout: float = 600.0, poll: float = 0.2):
+    """Чекає, поки черга донавчання спорожніє (після setup сценарію)."""
+    deadline = time.time() + timeout
+    time.sleep(poll)
+    while time.time() < deadline:
+        status, body = client.get('/api/v1/retrain-status/loadtest')
+        if status != 200 or not body or (body['queue_depth'] == 0 and body['running'] == 0):
+            return
+        time.sleep(poll)
+    raise TimeoutError('Черга донавчання не спорожніла')
+
+
+# --- Виконання ---
+
+def _sources(body):
+    if not isinstance(body, dict):
+        return ()
+    if 'results' in body:
+        return tuple(r.get('source') or 'error' for r in body['results'])
+    if 'source' in body:
+        return (body['source'],)
+    return ()
+
+
+def _send(client, request, scheduled_at):
+    try:
+        status, body = client.post(request.path, request.payload)
     except Exception as e:
         print(f"❌ Збій запиту: {e}")
+        status, body = 0, None
+    return Result(request.kind, status, time.perf_counter() - scheduled_at, _sources(body))
+
+
+def run_closed_loop(client, scen, requests: int, concurrency: int, duration: float = None):
+    """concurrency потоків, кожен шле наступний запит після відповіді на попередній."""
+    results = []
+    lock = threading.Lock()
+    remaining = [requests]
+    deadline = time.perf_counter() + duration if duration else None
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] <= 0 or (deadline and time.perf_counter() >= deadline):
+                    return
+                remaining[0] -= 1
+            request = scen.next_request()
+            result = _send(client, request, time.perf_counter())
+            with lock:
+                results.append(result)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, concurrency))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def run_open_loop(client, scen, rate: float, requests: int, duration: float = None, max_in_flight: int = 256,
+                  seed: int = 42):
+    """Пуассонівський потік запитів з інтенсивністю rate/с; латентність — від запланованого моменту."""
+    rng = random.Random(seed)
+    total = requests if not duration else int(rate * duration)
+    futures = []
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        start = time.perf_counter()
+        next_at = start
+        for _ in range(total):
+            next_at += rng.expovariate(rate)
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(_send, client, scen.next_request(), next_at))
+    return [f.result() for f in futures]
+
+
+def percentile(sorted_values, q: float) -> float:
+    """Перцентиль з лінійною інтерполяцією (q від 0 до 100)."""
+    if not sorted_values:
         return None
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def summarize(results, wall_seconds: float) -> dict:
+    by_kind = defaultdict(list)
+    for r in results:
+        by_kind[r.kind].append(r)
+    kinds = {}
+    for kind, items in by_kind.items():
+        ok = sorted(r.latency * 1000 for r in items if r.status == 200)
+        kinds[kind] = {
+            'requests': len(items),
+            'errors': sum(1 for r in items if r.status != 200),
+            'throughput_rps': round(len(ok) / wall_seconds, 3) if wall_seconds else None,
+            'latency_ms': {
+                'p50': _round(percentile(ok, 50)),
+                'p95': _round(percentile(ok, 95)),
+                'p99': _round(percentile(ok, 99)),
+                'mean': _round(sum(ok) / len(ok)) if ok else None,
+                'max': _round(ok[-1]) if ok else None,
+            },
+        }
+    sources = Counter(s for r in results for s in r.sources)
+    return {
+        'requests': len(results),
+        'errors': sum(1 for r in results if r.status != 200),
+        'wall_seconds': round(wall_seconds, 3),
+        'throughput_rps': round(sum(1 for r in results if r.status == 200) / wall_seconds, 3) if wall_seconds else None,
+        'kinds': kinds,
+        'sources': dict(sources.most_common()),
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+
+def run_scenario(client, name: str, transactions, users=100, requests=1000, concurrency=8, rate=None,
+                 duration=None, batch_size=100, seed=42, warmup=0, use_mcc=True) -> dict:
+    """Готує і виконує сценарій; повертає словник результатів (той самий, що пишеться в JSON)."""
+    workload = Workload(transactions, users=users, seed=seed, use_mcc=use_mcc)
+    scen = SCENARIOS[name](workload, batch_size=batch_size)
+    setup_started = time.perf_counter()
+    scen.setup(client)
+    setup_seconds = time.perf_counter() - setup_started
+    caches_reset = client.reset_caches() if scen.cold else False
+    if warmup:
+        run_closed_loop(client, scen, warmup, concurrency)
 
-print(f"🚀 Запуск навантажувального тестування...")
-print(f"🎯 Ціль: {URL}")
-print(f"📦 Всього запитів: {NUM_REQUESTS}")
-print(f"👥 Паралельних потоків: {CONCURRENT_USERS}")
-print("-" * 40)
-
-start_total = time.time()
-
-# Запуск паралельних запитів
-latencies = []
-with concurrent.futures.ThreadPoolExecutor(max_workers=CONCURRENT_USERS) as executor:
-    results = executor.map(send_request, range(NUM_REQUESTS))
-    for res in results:
-        if res is not None:
-            latencies.append(res)
-
-end_total = time.time()
-total_duration = end_total - start_total
-
-# Розрахунок статистики
-if latencies:
-    avg_latency = statistics.mean(latencies)
-    min_latency = min(latencies)
-    max_latency = max(latencies)
-    throughput = len(latencies) / total_duration
-    
+    started = time.perf_counter()
+    if rate:
+        results = run_open_loop(client, scen, rate, requests, duration, seed=seed)
+    else:
+        results = run_closed_loop(client, scen, requests, concurrency, duration)
+    wall = time.perf_counter() - started
+
+    report = {
+        'scenario': name,
+        'target': client.target,
+        'arrival': {'mode': 'open' if rate else 'closed', 'rate': rate, 'concurrency': None if rate else concurrency},
+        'users': users,
+        'batch_size': batch_size if name == 'batch' else None,
+        'seed': seed,
+        'setup_seconds': round(setup_seconds, 3),
+        'caches_reset': caches_reset,
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+    }
+    report.update(summarize(results, wall))
+    return report
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.1) -> list:
+    """Регресії відносно baseline: зростання p50/p95/p99 або падіння пропускної здатності понад tolerance."""
+    regressions = []
+    for kind, cur in current.get('kinds', {}).items():
+        base = baseline.get('kinds', {}).get(kind)
+        if not base:
+            continue
+        for q in ('p50', 'p95', 'p99'):
+            c, b = cur['latency_ms'].get(q), base['latency_ms'].get(q)
+            if c is not None and b and c > b * (1 + tolerance):
+                regressions.append(f"{kind} {q}: {b:.2f} → {c:.2f} мс (+{(c / b - 1) * 100:.0f}%)")
+        c, b = cur.get('throughput_rps'), base.get('throughput_rps')
+        if c is not None and b and c < b * (1 - tolerance):
+            regressions.append(f"{kind} throughput: {b:.1f} → {c:.1f} req/s ({(c / b - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_report(report: dict):
     print("\n📊 РЕЗУЛЬТАТИ ТЕСТУВАННЯ:")
-    print("-" * 40)
-    print(f"✅ Успішних запитів: {len(latencies)} / {NUM_REQUESTS}")
-    print(f"⏱️ Загальний час: {total_duration:.2f} сек")
-    print(f"⚡ Пропускна здатність (Throughput): {throughput:.2f} req/sec")
-    print("-" * 40)
-    print(f"🐢 Середній час відгуку (Avg Latency): {avg_latency:.2f} мс")
-    print(f"🐇 Мінімальний час (Min Latency): {min_latency:.2f} мс")
-    print(f"🐌 Максимальний час (Max Latency): {max_latency:.2f} мс")
-else:
-    print("❌ Усі запити завершилися помилкою.")
\ No newline at end of file
+    print("-" * 60)
+    print(f"🎯 Сценарій: {report['scenario']} ({report['target']}, {report['arrival']['mode']}-loop)")
+    print(f"✅ Успішних запитів: {report['requests'] - report['errors']} / {report['requests']}")
+    print(f"⏱️ Загальний час: {report['wall_seconds']:.2f} сек, підготовка: {report['setup_seconds']:.2f} сек")
+    print(f"⚡ Пропускна здатність (Throughput): {report['throughput_rps']:.2f} req/sec")
+    for kind, stats in report['kinds'].items():
+        lat = stats['latency_ms']
+        if lat['p50'] is None:
+            print(f"   {kind:<12} усі {stats['requests']} запитів з помилкою")
+            continue
+        print(f"   {kind:<12} n={stats['requests']:<6} p50={lat['p50']:.2f} p95={lat['p95']:.2f} "
+              f"p99={lat['p99']:.2f} max={lat['max']:.2f} мс, помилок: {stats['errors']}")
+    if report['sources']:
+        print(f"🔀 Шляхи розв'язання: {report['sources']}")
+    print("-" * 60)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сценарне навантажувальне тестування ML API")
+    parser.add_argument('scenario', nargs='?', default='global_mix', choices=sorted(SCENARIOS))
+    parser.add_argument('--list', action='store_true', help='показати сценарії')
+    parser.add_argument('--url', help='базовий URL сервера (за замовчуванням — in-process ASGI)')
+    parser.add_argument('--data', default=DEFAULT_DATA_FILE)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--duration', type=float, help='тривалість, с (замість --requests)')
+    parser.add_argument('--concurrency', type=int, default=8, help='закритий цикл: кількість потоків')
+    parser.add_argument('--rate', type=float, help='відкритий цикл: запитів за секунду')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=0, help='запитів прогріву (не враховуються)')
+    parser.add_argument('--no-mcc', action='store_true', help='не передавати MCC (усе йде до моделі)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', help='зберегти результати в JSON')
+    parser.add_argument('--compare', help='JSON попереднього запуску для порівняння')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='допустиме погіршення (0.1 = 10%%)')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, cls in sorted(SCENARIOS.items()):
+            print(f"{name:<20} {cls.__doc__.strip()}")
+        return 0
+
+    transactions = load_transactions(args.data)
+    client = HttpClient(args.url) if args.url else InProcessClient()
+    print(f"🚀 Запуск сценарію {args.scenario}: {len(transactions)} транзакцій у датасеті, {args.users} користувачів")
+    with client:
+        report = run_scenario(client, args.scenario, transactions, users=args.users, requests=args.requests,
+                              concurrency=args.concurrency, rate=args.rate, duration=args.duration,
+                              batch_size=args.batch_size, seed=args.seed, warmup=args.warmup,
+                              use_mcc=not args.no_mcc)
+    print_report(report)
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 Результати збережено в {args.out}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ Регресії відносно {args.compare}:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print(f"✅ Без регресій відносно {args.compare} (допуск {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+Налаштування логування ML-сервісу.
+
+Записи потрапляють у чергу (QueueHandler), а в stderr їх пише окремий потік
+(QueueListener), тож запит не чекає на синхронний вивід. Потоки не
+переживають fork (serve.py, recategorize.py): у дочірньому процесі черга і
+потік-слухач створюються заново (os.register_at_fork). Детальні
+per-request записи мають рівень DEBUG і за замовчуванням (LOG_LEVEL="INFO")
+навіть не форматуються.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+
+LOGGER_NAME = 'ml'
+
+_listener = None
+_handler = None
+
+
+def _start_listener(handlers):
+    """Нова черга і потік-слухач; QueueHandler логера переводиться на нову чергу."""
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    if _handler is not None:
+        _handler.queue = log_queue
+    return log_queue
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def _restart_after_fork():
+    # потік батьківського процесу в дитині не існує: без нового слухача записи лише накопичуються в черзі
+    if _listener is not None:
+        _start_listener(_listener.handlers)
+
+
+def configure_logging(level='INFO'):
+    """Ідемпотентно налаштовує логер 'ml' з асинхронним виводом."""
+    global _handler
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    if _listener is not None:
+        return logger
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    log_queue = _start_listener([stream])
+    atexit.register(_stop_listener)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_restart_after_fork)
+    _handler = logging.handlers.QueueHandler(log_queue)
+    logger.addHandler(_handler)
+    logger.propagate = False
+    return logger
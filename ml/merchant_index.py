@@ -0,0 +1,111 @@
+"""
+Канонізація назв мерчантів та нечіткий індекс виправлень користувача.
+
+Точний збіг normalize_description (strip + lower) пропускає варіанти, які
+користувач уже виправляв: "Скасування. АТБ", "АТБ 1234", інші пробіли чи
+пунктуація, латинські літери замість схожих кириличних. Індекс спершу шукає
+точний збіг, потім збіг канонічної форми, потім — найближчу канонічну форму
+за символьними триграмами з порогом схожості, і повідомляє, яке правило спрацювало.
+"""
+import re
+import unicodedata
+from collections import defaultdict, namedtuple
+
+OverrideMatch = namedtuple('OverrideMatch', ['category_id', 'rule', 'score', 'matched'])
+
+# Префікси скасувань/повернень: "Скасування. АТБ" -> "АТБ"
+_CANCELLATION_RE = re.compile(
+    r'^\s*(скасування|відміна|повернення|cancel(lation)?|refund|reversal)\b[\s.:,\-]*',
+    re.IGNORECASE
+)
+# Маски карток: 545708****0522, *0522
+_CARD_MASK_RE = re.compile(r'\d{0,6}\*{2,}\d{0,4}')
+# Номери терміналів/магазинів: окремі числа, "#12", "№12", "-4" в кінці
+_NUMBER_RE = re.compile(r'(?<![^\W\d_])[#№]?\d+(?![^\W\d_])')
+_PUNCT_RE = re.compile(r'[^\w\s]|_', re.UNICODE)
+_SPACES_RE = re.compile(r'\s+')
+
+# Кириличні літери, що виглядають як латинські (після lower()), зводимо до латиниці
+_LOOKALIKES = str.maketrans({
+    'а': 'a', 'в': 'b', 'е': 'e', 'є': 'e', 'і': 'i', 'ї': 'i', 'к': 'k', 'м': 'm', 'н': 'h',
+    'о': 'o', 'р': 'p', 'с': 'c', 'т': 't', 'у': 'y', 'х': 'x',
+    '’': "'", 'ʼ': "'", '`': "'",
+})
+
+
+def canonicalize_merchant(desc) -> str:
+    """Канонічна форма опису транзакції для порівняння мерчантів."""
+    if desc is None:
+        return ''
+    text = unicodedata.normalize('NFKC', str(desc)).strip()
+    # багаторядкові описи: мерчант у першому рядку
+    text = text.split('\n', 1)[0]
+    text = _CANCELLATION_RE.sub('', text)
+    text = text.lower()
+    text = _CARD_MASK_RE.sub(' ', text)
+    text = _PUNCT_RE.sub(' ', text.translate(_LOOKALIKES))
+    text = _NUMBER_RE.sub(' ', text)
+    return _SPACES_RE.sub(' ', text).strip()
+
+
+def trigrams(text: str) -> set:
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class OverrideIndex:
+    """
+    Індекс виправлень одного користувача.
+
+    overrides: {normalize_description(опис): category_id}.
+    """
+
+    def __init__(self, overrides: dict, threshold: float = 0.75, normalize=None):
+        self.threshold = threshold
+        self._normalize = normalize or (lambda d: '' if d is None else str(d).strip().lower())
+        self.exact = dict(overrides)
+        self.canonical = {}
+        for desc, category_id in overrides.items():
+            canon = canonicalize_merchant(desc)
+            if canon:
+                self.canonical[canon] = category_id
+        self._keys = list(self.canonical)
+        self._key_grams = [trigrams(k) for k in self._keys]
+        self._postings = defaultdict(list)
+        for idx, grams in enumerate(self._key_grams):
+            for g in grams:
+                self._postings[g].append(idx)
+
+    def __len__(self):
+        return len(self.exact)
+
+    def lookup(self, description):
+        """Повертає OverrideMatch або None."""
+        norm = self._normalize(description)
+        if not norm:
+            return None
+        if norm in self.exact:
+            return OverrideMatch(int(self.exact[norm]), 'exact', 1.0, norm)
+
+        canon = canonicalize_merchant(description)
+        if not canon:
+            return None
+        if canon in self.canonical:
+            return OverrideMatch(int(self.canonical[canon]), 'canonical', 1.0, canon)
+
+        if len(canon) < 3 or not self._keys:
+            return None
+        grams = trigrams(canon)
+        shared = defaultdict(int)
+        for g in grams:
+            for idx in self._postings.get(g, ()):
+                shared[idx] += 1
+        best_idx, best_score = None, 0.0
+        for idx, count in shared.items():
+            score = 2.0 * count / (len(grams) + len(self._key_grams[idx]))
+            if score > best_score:
+                best_idx, best_score = idx, score
+        if best_idx is not None and best_score >= self.threshold:
+            key = self._keys[best_idx]
+            return OverrideMatch(int(self.canonical[key]), 'fuzzy', round(best_score, 4), key)
+        return None
@@ -0,0 +1,173 @@
+"""
+Адаптивний мікробатчинг одиночних прогнозів.
+
+Більшість трафіку — паралельні одиночні /api/v1/categorize від Node-бекенду;
+кожен такий виклик окремо платить фіксовану вартість sklearn-прогнозу (для RF —
+обхід 100 дерев + пул потоків joblib) і конкурує за GIL. MicroBatcher збирає
+одночасні запити до ОДНІЄЇ моделі в один векторизований predict.
+
+Перший запит у порожній черзі стає "лідером": він чекає, поки назбирається
+max_batch_size описів або мине max_wait_seconds, виконує predict для всіх і
+роздає кожному його результат. Очікування адаптивне: якщо запити до моделі
+приходять рідше, ніж раз на max_wait_seconds (оцінка за ковзним середнім
+інтервалів між ними), лідер не чекає зовсім — за низького навантаження
+латентність не зростає. Крім того, поки predict цієї моделі вже виконується,
+нові запити накопичуються в наступному батчі й виконуються одразу після
+нього: під насиченням (predict довший за інтервал між запитами) батч
+формується сам, без додаткового очікування.
+"""
+import threading
+import time
+
+
+class _Batch:
+    __slots__ = ('model', 'method', 'texts', 'results', 'error', 'done', 'full', 'created_at')
+
+    def __init__(self, model, method):
+        self.model = model
+        self.method = method
+        self.texts = []
+        self.results = None
+        self.error = None
+        self.done = threading.Event()
+        self.full = False
+        self.created_at = time.perf_counter()
+
+
+class _KeyState:
+    __slots__ = ('open_batch', 'running', 'last_arrival', 'interarrival')
+
+    def __init__(self):
+        self.open_batch = None
+        self.running = 0  # скільки predict цієї моделі виконується зараз
+        self.last_arrival = None
+        self.interarrival = None  # ковзне середнє інтервалу між запитами, с
+
+
+class MicroBatcher:
+    # вага нового інтервалу в ковзному середньому
+    EWMA_ALPHA = 0.2
+    # статистика ключів без запитів довше за це прибирається
+    IDLE_KEY_SECONDS = 60.0
+    SWEEP_EVERY = 1024
+
+    def __init__(self, max_batch_size: int = 32, max_wait_seconds: float = 0.002, on_flush=None):
+        """
+        on_flush(size, waited_seconds) викликається після кожного predict (метрики).
+        """
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_seconds = max(0.0, float(max_wait_seconds))
+        self.on_flush = on_flush
+        self._cond = threading.Condition()
+        self._keys = {}
+        self._calls = 0
+        self.flushes = 0
+        self.items = 0
+
+    def predict(self, key, model, text, method: str = 'predict'):
+        """
+        Прогноз одного опису; key ідентифікує модель (напр. model_key_for):
+        запити з різними key не змішуються в одному батчі, а якщо під тим самим
+        key прийшла інша (перезавантажена) модель, відкритий батч закривається.
+        method — метод моделі, що приймає список описів (напр. predict_details
+        каскаду). Блокує до отримання результату; виняток predict прокидається
+        кожному учаснику батчу.
+        """
+        with self._cond:
+            state = self._keys.get(key)
+            if state is None:
+                state = self._keys[key] = _KeyState()
+            now = time.perf_counter()
+            if state.last_arrival is not None:
+                gap = now - state.last_arrival
+                state.interarrival = gap if state.interarrival is None else (
+                    self.EWMA_ALPHA * gap + (1 - self.EWMA_ALPHA) * state.interarrival)
+            state.last_arrival = now
+
+            self._calls += 1
+            if self._calls % self.SWEEP_EVERY == 0:
+                self._sweep(now)
+
+            batch = state.open_batch
+            if batch is not None and (batch.model is not model or batch.method != method):
+                batch.full = True
+                state.open_batch = batch = None
+                self._cond.notify_all()
+            if batch is None:
+                batch = state.open_batch = _Batch(model, method)
+                leader = True
+            else:
+                leader = False
+            index = len(batch.texts)
+            batch.texts.append(text)
+            if len(batch.texts) >= self.max_batch_size:
+                # повний батч більше не приймає запитів; лідер виконає його одразу
+                batch.full = True
+                state.open_batch = None
+                self._cond.notify_all()
+
+            if leader:
+                deadline = batch.created_at + (self.max_wait_seconds if self._should_wait(state) else 0.0)
+                while not batch.full:
+                    if state.running:
+                        # попередній батч ще виконується — збираємо запити, що приходять
+                        self._cond.wait()
+                        continue
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                # закриваємо батч: наступні запити відкриють новий
+                if state.open_batch is batch:
+                    state.open_batch = None
+                state.running += 1
+
+        if leader:
+            self._run(state, batch)
+        else:
+            batch.done.wait()
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[index]
+
+    def _should_wait(self, state) -> bool:
+        if self.max_batch_size <= 1 or self.max_wait_seconds <= 0:
+            return False
+        # чекати має сенс, лише якщо за max_wait очікується хоча б ще один запит
+        return state.interarrival is not None and state.interarrival < self.max_wait_seconds
+
+    def _sweep(self, now):
+        for key in [k for k, st in self._keys.items()
+                    if st.open_batch is None and st.running == 0
+                    and now - st.last_arrival > self.IDLE_KEY_SECONDS]:
+            del self._keys[key]
+
+    def _run(self, state, batch):
+        waited = time.perf_counter() - batch.created_at
+        try:
+            batch.results = list(getattr(batch.model, batch.method)(batch.texts))
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+        with self._cond:
+            state.running -= 1
+            self._cond.notify_all()
+            self.flushes += 1
+            self.items += len(batch.texts)
+        if self.on_flush is not None:
+            try:
+                self.on_flush(len(batch.texts), waited)
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_seconds * 1000,
+                'flushes': self.flushes,
+                'items': self.items,
+                'avg_batch_size': (self.items / self.flushes) if self.flushes else 0.0,
+                'keys': len(self._keys),
+            }
@@ -0,0 +1,239 @@
+"""
+Обмежений за пам'яттю LRU-кеш для персоналізованих моделей.
+
+Замінює звичайний dict `personalized_models_cache` в api.py: обмежує кількість
+записів і оцінений розмір у байтах, витісняє найдавніше використані моделі,
+опційно видаляє записи, що не використовувались довше за TTL, і рахує
+hit/miss/eviction/load-time. Безпечний для виклику з потоків threadpool,
+у якому FastAPI виконує sync-ендпоінти.
+
+Читання не бере блокувань (copy-on-write, як snapshot_state.py): записи
+лежать у dict, який після публікації не змінюється; put/pop/витіснення під
+блокуванням будують новий dict і підміняють посилання. Порядок LRU — лічильник
+звернень у самому записі, тож влучання в кеш нічого не перебудовує.
+"""
+import itertools
+import pickle
+import threading
+import time
+
+
+class _CountingWriter:
+    """File-like об'єкт, що лише рахує записані байти (без копіювання даних)."""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+
+def estimate_model_bytes(model) -> int:
+    """Оцінює розмір моделі як довжину її pickle-представлення."""
+    writer = _CountingWriter()
+    try:
+        pickle.dump(model, writer, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return 0
+    return writer.size
+
+
+class _Entry:
+    __slots__ = ('value', 'nbytes', 'last_access', 'last_used')
+
+    def __init__(self, value, nbytes, last_access, last_used):
+        self.value = value
+        self.nbytes = nbytes
+        self.last_access = last_access
+        self.last_used = last_used
+
+
+class ModelCache:
+    """
+    Потокобезпечний LRU-кеш з обмеженням за кількістю записів та байтами.
+
+    max_entries / max_bytes / ttl_seconds можуть бути None (без обмеження).
+    Лічильники hits/misses оновлюються без блокування (статистика може
+    недорахувати кілька звернень під конкуренцією).
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, ttl_seconds=None, size_fn=estimate_model_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._size_fn = size_fn
+        # незмінний після публікації dict: читачі беруть посилання без блокування
+        self._entries = {}
+        self._clock = itertools.count()
+        self._lock = threading.RLock()
+        self._load_locks = {}
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.loads = 0
+        self.load_time_total = 0.0
+
+    # --- dict-подібний інтерфейс (сумісність зі старим кодом) ---
+    def __contains__(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and not self._expired(entry, time.monotonic())
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def __delitem__(self, key):
+        if self.pop(key) is None:
+            raise KeyError(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+    # --- основні операції ---
+    def _expired(self, entry, now):
+        return self.ttl_seconds is not None and now - entry.last_access > self.ttl_seconds
+
+    def _remove(self, entries, key):
+        """Видаляє key з нової (ще не опублікованої) копії entries."""
+        entry = entries.pop(key)
+        self._total_bytes -= entry.nbytes
+        return entry
+
+    def _touch(self, entry, now):
+        entry.last_access = now
+        entry.last_used = next(self._clock)
+
+    def _expire(self, key, entry):
+        with self._lock:
+            if self._entries.get(key) is entry:
+                entries = dict(self._entries)
+                self._remove(entries, key)
+                self._entries = entries
+                self.expirations += 1
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and self._expired(entry, now):
+            self._expire(key, entry)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return default
+        self._touch(entry, now)
+        self.hits += 1
+        return entry.value
+
+    def put(self, key, value, nbytes=None):
+        if nbytes is None:
+            nbytes = self._size_fn(value) if self._size_fn else 0
+        with self._lock:
+            entries = dict(self._entries)
+            if key in entries:
+                self._remove(entries, key)
+            entries[key] = _Entry(value, nbytes, time.monotonic(), next(self._clock))
+            self._total_bytes += nbytes
+            self._enforce_limits(entries, keep=key)
+            self._entries = entries
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            entries = dict(self._entries)
+            value = self._remove(entries, key).value
+            self._entries = entries
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._total_bytes = 0
+
+    def get_or_load(self, key, loader):
+        """
+        Повертає модель з кешу або завантажує її через loader() (single-flight:
+        паралельні запити для одного ключа чекають на одне завантаження).
+        Якщо loader повертає None, нічого не кешується.
+        loader може повернути кортеж (model, nbytes), щоб не оцінювати розмір повторно.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            # інший потік міг уже завантажити модель, поки ми чекали
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry, time.monotonic()):
+                self._touch(entry, time.monotonic())
+                return entry.value
+
+            try:
+                started = time.perf_counter()
+                loaded = loader()
+                elapsed = time.perf_counter() - started
+                nbytes = None
+                if isinstance(loaded, tuple):
+                    loaded, nbytes = loaded
+                if loaded is None:
+                    return None
+                with self._lock:
+                    self.loads += 1
+                    self.load_time_total += elapsed
+                # публікуємо запис до зняття load-lock: потік, що прийде після, знайде його в кеші
+                self.put(key, loaded, nbytes=nbytes)
+                return loaded
+            finally:
+                with self._lock:
+                    if self._load_locks.get(key) is load_lock:
+                        del self._load_locks[key]
+
+    def _enforce_limits(self, entries, keep=None):
+        now = time.monotonic()
+        if self.ttl_seconds is not None:
+            for key in [k for k, e in entries.items() if self._expired(e, now) and k != keep]:
+                self._remove(entries, key)
+                self.expirations += 1
+
+        def over_limit():
+            if self.max_entries is not None and len(entries) > self.max_entries:
+                return True
+            return self.max_bytes is not None and self._total_bytes > self.max_bytes
+
+        if not over_limit():
+            return
+        # найдавніше використані — першими; щойно доданий запис (keep) не витісняється
+        for key in sorted((k for k in entries if k != keep), key=lambda k: entries[k].last_used):
+            if not over_limit():
+                break
+            self._remove(entries, key)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'estimated_bytes': self._total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'loads': self.loads,
+                'load_time_total_ms': self.load_time_total * 1000,
+                'load_time_avg_ms': (self.load_time_total / self.loads * 1000) if self.loads else 0.0,
+            }
@@ -0,0 +1,92 @@
+"""
+Легкі персональні "оверлеї" поверх замороженої глобальної моделі.
+
+Замість повного донавчання TF-IDF + RandomForest на всьому глобальному датасеті
+для кожного користувача зберігається лише маленька модель найближчого сусіда,
+побудована на його виправленнях у TF-IDF-просторі глобальної моделі. Оверлей
+перемагає глобальну модель лише тоді, коли косинусна схожість з найближчим
+виправленням не менша за поріг.
+"""
+import numpy as np
+
+
+class CorrectionOverlay:
+    """
+    Nearest-neighbour модель по виправленнях одного користувача.
+
+    На диск зберігаються тільки тексти, мітки та поріг (кілобайти); матриця
+    ознак будується через bind() з векторизатора глобальної моделі.
+    """
+
+    def __init__(self, texts, labels, min_similarity: float):
+        self.texts = [str(t) for t in texts]
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.min_similarity = float(min_similarity)
+        self._matrix = None
+        self._bound_to = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_matrix'] = None
+        state['_bound_to'] = None
+        return state
+
+    def __len__(self):
+        return len(self.texts)
+
+    def bind(self, featurizer):
+        """Обчислює (L2-нормовані) TF-IDF вектори виправлень у просторі featurizer."""
+        if self._bound_to is not featurizer:
+            self._matrix = featurizer.transform(self.texts).tocsr()
+            self._bound_to = featurizer
+        return self
+
+    def query(self, X):
+        """Для кожного рядка X повертає (мітка найближчого виправлення, косинусна схожість)."""
+        n = X.shape[0]
+        if self._matrix is None or self._matrix.shape[0] == 0:
+            return np.zeros(n, dtype=np.int64), np.zeros(n)
+        sims = (X @ self._matrix.T).toarray()
+        best = sims.argmax(axis=1)
+        return self.labels[best], sims[np.arange(n), best]
+
+
+class OverlayModel:
+    """
+    Глобальний pipeline + персональний оверлей з інтерфейсом predict(texts).
+
+    Текст векторизується один раз; ці ж ознаки йдуть і в класифікатор
+    глобальної моделі, і в пошук найближчого виправлення.
+    """
+
+    def __init__(self, base_pipeline, overlay: CorrectionOverlay):
+        self.base_pipeline = base_pipeline
+        self.overlay = overlay
+        featurizer = getattr(base_pipeline, 'overlay_featurizer', None)
+        if featurizer is not None:
+            # каскад (cascade.py): базовий прогноз — по текстах, оверлей — у TF-IDF першої моделі
+            self._featurizer = featurizer
+            self._classifier = None
+        else:
+            self._featurizer = base_pipeline[:-1]
+            self._classifier = base_pipeline[-1]
+        overlay.bind(self._featurizer)
+
+    @property
+    def feature_source(self):
+        """TF-IDF, ознаки якого приймає predict_features (None поверх каскаду)."""
+        return None if self._classifier is None else self.base_pipeline[0]
+
+    def predict_features(self, X):
+        """Прогноз по вже векторизованих ознаках (featurizer.FeatureMemo)."""
+        return self._combine(X, np.asarray(self._classifier.predict(X)))
+
+    def _combine(self, X, base):
+        labels, sims = self.overlay.query(X)
+        return np.where(sims >= self.overlay.min_similarity, labels, base)
+
+    def predict(self, texts):
+        X = self._featurizer.transform(texts)
+        if self._classifier is None:
+            return self._combine(X, np.asarray(self.base_pipeline.predict(list(texts))))
+        return self.predict_features(X)
@@ -0,0 +1,103 @@
+"""
+LRU-кеш результатів прогнозу, ключем якого є (модель, її версія, нормалізований опис).
+
+Описи транзакцій дуже повторювані ("АТБ", "Київстар", "Рукавичка"), тому
+повторний мерчант коштує пошуку в словнику замість проходу по 100 деревах.
+Версія моделі входить у ключ: завершене донавчання користувача інвалідовує
+лише його записи, а перезавантаження глобальної моделі — записи всіх.
+
+Номери версій беруться з одного лічильника і ніколи не повторюються, тому
+старі записи моделі недосяжні без перебору кешу й просто витісняються LRU.
+Версії зберігаються лише для max_entries моделей, що інвалідовувались
+найпізніше; модель без запису отримує _version_floor — номер, не менший
+за версію будь-якої витісненої моделі.
+"""
+import threading
+from collections import OrderedDict
+
+GLOBAL_MODEL_KEY = 'global'
+
+
+class PredictionCache:
+    def __init__(self, max_entries: int = 50000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = OrderedDict()
+        self._version_counter = 0
+        self._version_floor = 0
+        self._global_version = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return bool(self.max_entries)
+
+    def key_for(self, model_key: str, desc_norm: str):
+        """Ключ з поточними версіями моделі та глобальної моделі (фіксується ДО прогнозу)."""
+        # спершу словник, потім підлога: invalidate_model піднімає підлогу раніше, ніж прибирає запис
+        version = self._versions.get(model_key)
+        if version is None:
+            version = self._version_floor
+        return (model_key, version, self._global_version, desc_norm)
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, category_id):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = category_id
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_model(self, model_key: str):
+        """Нова версія моделі (напр. після донавчання користувача): старі записи стають недосяжні, їх витіснить LRU."""
+        with self._lock:
+            self._version_counter += 1
+            self._versions[model_key] = self._version_counter
+            self._versions.move_to_end(model_key)
+            while len(self._versions) > max(self.max_entries, 1):
+                self._version_floor = self._version_counter
+                self._versions.popitem(last=False)
+            self.invalidations += 1
+
+    def invalidate_all(self):
+        """Перезавантаження глобальної моделі: інвалідовує записи всіх моделей."""
+        with self._lock:
+            self._global_version += 1
+            self._entries.clear()
+            # без записів версії моделей більше не потрібні: нова глобальна версія відсікає все старе
+            self._versions.clear()
+            self.invalidations += 1
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'tracked_models': len(self._versions),
+                'global_version': self._global_version,
+            }
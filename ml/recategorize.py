@@ -0,0 +1,301 @@
+"""
+Масова перекатегоризація збережених транзакцій (після зміни глобальної моделі).
+
+Вхід — CSV або NDJSON з полями user_id, description, mcc, amount (інші поля
+переносяться у вихід без змін; для CSV-виходу з NDJSON —
+поля першого рядка). Файл читається потоково частинами по
+--chunk-size рядків, частини розподіляються між --workers процесами; у пам'яті
+одночасно не більше 2 × workers частин, тож пам'ять не залежить від розміру
+входу. Кожна частина обробляється тим самим шляхом, що й /api/v1/categorize-batch:
+виправлення користувачів, MCC-правила, персональні та глобальна модель.
+
+Модель, мапінги, виправлення та MCC-правила завантажуються один раз у головному
+процесі до fork (як у serve.py); персональні моделі кожен воркер вантажить
+лише раз завдяки кешу моделей. Без fork (Windows) кожен воркер завантажує стан сам.
+
+Результати дописуються у вихідний файл у порядку входу; після кожної частини
+у <вихід>.progress.json фіксується кількість оброблених рядків і розмір
+виходу. Перерваний запуск продовжується з цього місця (--restart — почати заново).
+
+Запуск:
+    python recategorize.py transactions.csv recategorized.csv [--workers N] [--chunk-size N]
+    python recategorize.py export.ndjson recategorized.ndjson --workers 4
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+
+RESULT_FIELDS = ['category_id', 'category_name', 'source', 'override_rule', 'confidence', 'cascade_stage', 'error']
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+PROGRESS_EVERY_SECONDS = 5.0
+
+
+def detect_format(path: str, explicit=None) -> str:
+    if explicit:
+        return explicit
+    return 'ndjson' if path.lower().endswith(NDJSON_EXTENSIONS) else 'csv'
+
+
+def progress_path(output_path: str) -> str:
+    return f"{output_path}.progress.json"
+
+
+def _input_signature(path: str) -> dict:
+    st = os.stat(path)
+    return {'input': os.path.abspath(path), 'input_size': st.st_size, 'input_mtime_ns': st.st_mtime_ns}
+
+
+# --- Читання входу ---
+
+def read_rows(path: str, fmt: str):
+    """Потоково повертає (поля входу, ітератор рядків-словників)."""
+    f = open(path, 'r', encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(f)
+        fields = list(reader.fieldnames or [])
+
+        def rows():
+            with f:
+                yield from reader
+        return fields, rows()
+
+    # поля NDJSON — ключі першого рядка (потрібні для CSV-виходу); інші ключі CSV не потрапляють
+    first = None
+    for line in f:
+        if line.strip():
+            first = json.loads(line)
+            break
+
+    def rows():
+        with f:
+            if first is None:
+                return
+            yield first
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    return (list(first) if first is not None else []), rows()
+
+
+def iter_chunks(rows, chunk_size: int, skip: int = 0):
+    """Частини по chunk_size рядків; перші skip рядків (уже оброблені) пропускаються."""
+    chunk = []
+    for index, row in enumerate(rows):
+        if index < skip:
+            continue
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# --- Обробка частини у воркері ---
+
+def _optional_int(value):
+    try:
+        return int(float(value)) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _optional_float(value):
+    try:
+        return float(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _require_global_model():
+    """Без глобальної моделі кожен рядок став би помилкою, а запуск — "завершеним"."""
+    import api
+    if api.global_model is None:
+        raise SystemExit("❌ Глобальна модель не завантажена — перекатегоризацію зупинено")
+
+
+def _load_service_state():
+    """Ініціалізатор воркера: стан уже успадковано від головного процесу (fork) або вантажиться тут."""
+    import api
+    if api.global_model is None:
+        api.run_startup()
+    _require_global_model()
+
+
+def categorize_chunk(rows):
+    """Категоризує частину рядків шляхом /api/v1/categorize-batch; повертає рядки з полями результату."""
+    import api
+    out = []
+    for start in range(0, len(rows), config.BATCH_MAX_ITEMS):
+        part = rows[start:start + config.BATCH_MAX_ITEMS]
+        items = [api.BatchItemInput(user_id=str(row.get('user_id') or ''),
+                                    description=str(row.get('description') or ''),
+                                    mcc=_optional_int(row.get('mcc')),
+                                    amount=_optional_float(row.get('amount')))
+                 for row in part]
+        response = api.categorize_batch(api.BatchCategorizationInput(items=items))
+        for row, result in zip(part, response['results']):
+            out.append({**row, **{field: result.get(field) for field in RESULT_FIELDS}})
+    return out
+
+
+# --- Запис виходу та контрольні точки ---
+
+class _Output:
+    def __init__(self, path: str, fmt: str, fields, resume_bytes=None):
+        self.fmt = fmt
+        self.fields = fields
+        if resume_bytes is None:
+            self.file = open(path, 'w', encoding='utf-8', newline='')
+            if fmt == 'csv':
+                csv.writer(self.file).writerow(fields)
+        else:
+            # відкидаємо все, що було дописано після останньої контрольної точки
+            with open(path, 'r+b') as f:
+                f.truncate(resume_bytes)
+            self.file = open(path, 'a', encoding='utf-8', newline='')
+        self.writer = (csv.DictWriter(self.file, fieldnames=fields, extrasaction='ignore')
+                       if fmt == 'csv' else None)
+
+    def write(self, rows) -> int:
+        """Дописує рядки і повертає розмір файлу після надійного запису на диск."""
+        if self.writer is not None:
+            self.writer.writerows(rows)
+        else:
+            self.file.writelines(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def _save_progress(path: str, state: dict):
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _load_progress(input_path: str, output_path: str, restart: bool):
+    """Стан попереднього запуску для цього входу або None (новий запуск)."""
+    path = progress_path(output_path)
+    if restart or not os.path.exists(output_path):
+        return None
+    if not os.path.exists(path):
+        raise SystemExit(f"{output_path} вже існує без {path}; використайте --restart, щоб перезаписати")
+    with open(path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    if {k: state.get(k) for k in ('input', 'input_size', 'input_mtime_ns')} != _input_signature(input_path):
+        raise SystemExit(f"{path} належить іншому (або зміненому) входу; використайте --restart")
+    return state
+
+
+def recategorize(input_path: str, output_path: str, workers: int = 1, chunk_size: int = 1000,
+                 input_format=None, output_format=None, restart: bool = False, preload: bool = True):
+    """
+    Перекатегоризує input_path у output_path; повертає підсумок
+    (rows, seconds, rows_per_second, sources). preload=False — стан api вже підготовлено.
+    """
+    in_fmt = detect_format(input_path, input_format)
+    out_fmt = detect_format(output_path, output_format)
+    state = _load_progress(input_path, output_path, restart)
+    if state is not None and state.get('completed'):
+        print(f"✅ {output_path} вже містить усі {state['rows_done']} рядків (--restart, щоб повторити)")
+        return {'rows': 0, 'seconds': 0.0, 'rows_per_second': 0.0, 'sources': {}, 'resumed_from': state['rows_done']}
+
+    if preload:
+        import api
+        if api.global_model is None:
+            print("🔄 Завантаження моделей у головному процесі (до fork)...")
+            api.run_startup()
+    _require_global_model()
+
+    fields, rows = read_rows(input_path, in_fmt)
+    skip = state['rows_done'] if state else 0
+    if state is None:
+        state = {**_input_signature(input_path), 'rows_done': 0, 'output_bytes': 0, 'completed': False}
+    out_fields = fields + [f for f in RESULT_FIELDS if f not in fields]
+    output = _Output(output_path, out_fmt, out_fields, resume_bytes=state['output_bytes'] if skip else None)
+    if skip:
+        print(f"↩️ Продовження з рядка {skip} ({output_path})")
+    else:
+        state['output_bytes'] = output.write([])
+        _save_progress(progress_path(output_path), state)
+
+    workers = max(1, int(workers))
+    chunks = iter_chunks(rows, max(1, int(chunk_size)), skip=skip)
+    sources = Counter()
+    done = 0
+    started = last_report = time.perf_counter()
+
+    def commit(results):
+        nonlocal done, last_report
+        state['output_bytes'] = output.write(results)
+        state['rows_done'] += len(results)
+        _save_progress(progress_path(output_path), state)
+        done += len(results)
+        sources.update(r.get('source') or 'error' for r in results)
+        now = time.perf_counter()
+        if now - last_report >= PROGRESS_EVERY_SECONDS:
+            last_report = now
+            print(f"⏱️ {state['rows_done']} рядків, {done / (now - started):.0f} рядків/с")
+
+    try:
+        if workers == 1:
+            for chunk in chunks:
+                commit(categorize_chunk(chunk))
+        else:
+            context = multiprocessing.get_context('fork' if hasattr(os, 'fork') else 'spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_load_service_state) as pool:
+                inflight = deque()
+                for chunk in chunks:
+                    inflight.append(pool.submit(categorize_chunk, chunk))
+                    if len(inflight) >= 2 * workers:
+                        commit(inflight.popleft().result())
+                while inflight:
+                    commit(inflight.popleft().result())
+        state['completed'] = True
+        _save_progress(progress_path(output_path), state)
+    finally:
+        output.close()
+
+    seconds = time.perf_counter() - started
+    summary = {
+        'rows': done,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(done / seconds, 1) if seconds > 0 else 0.0,
+        'sources': dict(sources),
+        'resumed_from': skip,
+    }
+    print(f"✅ Перекатегоризовано {done} рядків за {seconds:.1f} с ({summary['rows_per_second']:.0f} рядків/с, "
+          f"{workers} воркерів): {dict(sources)}")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Масова перекатегоризація транзакцій з CSV/NDJSON")
+    parser.add_argument('input', help="CSV або NDJSON з user_id, description, mcc, amount")
+    parser.add_argument('output', help="вихідний CSV або NDJSON (.ndjson/.jsonl)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=config.BATCH_MAX_ITEMS)
+    parser.add_argument('--input-format', choices=['csv', 'ndjson'])
+    parser.add_argument('--output-format', choices=['csv', 'ndjson'])
+    parser.add_argument('--restart', action='store_true', help="ігнорувати збережений прогрес і почати заново")
+    args = parser.parse_args(argv)
+    recategorize(args.input, args.output, workers=args.workers, chunk_size=args.chunk_size,
+                 input_format=args.input_format, output_format=args.output_format, restart=args.restart)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,190 @@
+"""
+Планувальник донавчання персональних моделей з debounce та single-flight.
+
+Серія виправлень від одного користувача в межах "тихого вікна" зливається в
+одне донавчання; для одного користувача ніколи не виконується два донавчання
+одночасно, а виправлення, що надійшли під час запуску, ставлять у чергу рівно
+один наступний запуск.
+
+Debounce і single-flight діють у межах одного процесу: воркери serve.py, що
+отримали виправлення одного користувача, можуть донавчати його одночасно
+(файл моделі підміняється атомарно, тож перемагає останнє донавчання).
+
+Стан користувача живе в _states лише поки донавчання заплановане чи йде;
+після завершення без follow-up він переходить в обмежений LRU _finished,
+звідки його бачить status() і підхоплює наступний submit().
+"""
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class _UserState:
+    __slots__ = ('deadline', 'running', 'followup', 'submissions', 'coalesced', 'runs',
+                 'last_started', 'last_finished', 'last_duration_ms', 'last_error')
+
+    def __init__(self):
+        self.deadline = None      # monotonic-час запланованого запуску
+        self.running = False
+        self.followup = False     # виправлення надійшли під час запуску
+        self.submissions = 0
+        self.coalesced = 0
+        self.runs = 0
+        self.last_started = None
+        self.last_finished = None
+        self.last_duration_ms = None
+        self.last_error = None
+
+
+class RetrainScheduler:
+    """
+    run_fn(user_id) виконується у пулі з max_workers потоків не раніше ніж через
+    quiet_window_seconds після останнього submit(user_id). Результати останніх
+    max_finished завершених користувачів лишаються доступними через status().
+    """
+
+    def __init__(self, run_fn, quiet_window_seconds: float = 5.0, max_workers: int = 1,
+                 max_finished: int = 1000):
+        self._run_fn = run_fn
+        self.quiet_window_seconds = quiet_window_seconds
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self._states = {}  # лише заплановані або запущені
+        self._finished = OrderedDict()
+        self._heap = []  # (deadline, user_id); застарілі записи пропускаються
+        self._cond = threading.Condition()
+        self._executor = None
+        self._thread = None
+        self._stopped = False
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='retrain')
+            self._thread = threading.Thread(target=self._loop, name='retrain-scheduler', daemon=True)
+            self._thread.start()
+
+    def _schedule(self, user_id, state):
+        state.deadline = time.monotonic() + self.quiet_window_seconds
+        heapq.heappush(self._heap, (state.deadline, user_id))
+        self._cond.notify()
+
+    def submit(self, user_id: str):
+        """Реєструє нове виправлення користувача та (від)кладає його донавчання."""
+        with self._cond:
+            if self._stopped:
+                return
+            self._ensure_started()
+            state = self._states.get(user_id)
+            if state is None:
+                # лічильники попередніх запусків продовжуються
+                state = self._finished.pop(user_id, None) or _UserState()
+                self._states[user_id] = state
+            state.submissions += 1
+            if state.running:
+                if state.followup:
+                    state.coalesced += 1
+                state.followup = True
+                return
+            if state.deadline is not None:
+                state.coalesced += 1
+            self._schedule(user_id, state)
+
+    def _loop(self):
+        with self._cond:
+            while not self._stopped:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                deadline, user_id = self._heap[0]
+                state = self._states.get(user_id)
+                if state is None or state.deadline != deadline:
+                    heapq.heappop(self._heap)  # перепланований або вже запущений
+                    continue
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                state.deadline = None
+                state.running = True
+                self._executor.submit(self._run, user_id)
+
+    def _run(self, user_id):
+        state = self._states[user_id]
+        started = time.monotonic()
+        with self._cond:
+            state.last_started = time.time()
+        error = None
+        try:
+            self._run_fn(user_id)
+        except Exception as e:  # run_fn сам логує помилку і прокидає її сюди
+            error = str(e)
+        with self._cond:
+            state.running = False
+            state.runs += 1
+            state.last_finished = time.time()
+            state.last_duration_ms = (time.monotonic() - started) * 1000
+            state.last_error = error
+            if state.followup and not self._stopped:
+                state.followup = False
+                self._schedule(user_id, state)
+            else:
+                state.followup = False
+                del self._states[user_id]
+                self._finished[user_id] = state
+                while len(self._finished) > self.max_finished:
+                    self._finished.popitem(last=False)
+
+    def queue_depth(self) -> int:
+        """Кількість користувачів, що очікують на донавчання (заплановані + follow-up)."""
+        with self._cond:
+            return sum(1 for s in self._states.values() if s.deadline is not None or s.followup)
+
+    def running_count(self) -> int:
+        with self._cond:
+            return sum(1 for s in self._states.values() if s.running)
+
+    def status(self, user_id: str) -> dict:
+        with self._cond:
+            state = self._states.get(user_id) or self._finished.get(user_id)
+            if state is None:
+                return {'state': 'idle', 'submissions': 0, 'runs': 0}
+            if state.running:
+                current = 'running'
+            elif state.deadline is not None:
+                current = 'scheduled'
+            else:
+                current = 'idle'
+            return {
+                'state': current,
+                'followup_queued': state.followup,
+                'scheduled_in_ms': max(0.0, (state.deadline - time.monotonic()) * 1000) if state.deadline is not None else None,
+                'submissions': state.submissions,
+                'coalesced': state.coalesced,
+                'runs': state.runs,
+                'last_started': state.last_started,
+                'last_finished': state.last_finished,
+                'last_duration_ms': state.last_duration_ms,
+                'last_error': state.last_error,
+            }
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Чекає, поки не залишиться запланованих/запущених донавчань (для тестів і завершення роботи)."""
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                busy = any(s.deadline is not None or s.running or s.followup for s in self._states.values())
+            if not busy:
+                return True
+            if end is not None and time.monotonic() >= end:
+                return False
+            time.sleep(0.01)
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
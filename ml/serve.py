@@ -0,0 +1,125 @@
+"""
+Багатопроцесний запуск ML API (замість одного процесу uvicorn).
+
+Глобальна модель, мапінги та MCC-правила завантажуються (і прогріваються) ОДИН раз у
+батьківському процесі, після чого він робить fork на SERVING_WORKERS воркерів,
+які слухають спільний сокет. Сторінки пам'яті моделі лишаються спільними
+(copy-on-write; gc.freeze не дає збирачу сміття їх "торкатися"), а масиви
+моделей, збережених joblib без стиснення, додатково відображаються з диска
+(MODEL_MMAP). Тож пам'ять росте значно повільніше за кількість воркерів.
+
+Персональні виправлення й донавчання узгоджуються між воркерами через
+SQLite-базу виправлень та файли моделей (див. CROSS_WORKER_SYNC у config.py).
+
+На системах без fork (Windows) використовується звичайний
+uvicorn.run(workers=N) — кожен воркер тоді завантажує модель сам.
+
+Запуск:
+    python serve.py [--workers N] [--host HOST] [--port PORT]
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+import config
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket):
+    import uvicorn
+    from api import app
+
+    # воркер сам обробляє SIGINT/SIGTERM через uvicorn
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    server = uvicorn.Server(uvicorn.Config(app, log_level="info"))
+    server.run(sockets=[sock])
+
+
+def _spawn_worker(sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(sock)
+        except BaseException as e:
+            print(f"❌ Воркер {os.getpid()} завершився з помилкою: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def serve_prefork(host: str, port: int, workers: int):
+    import api
+
+    print(f"🔄 Завантаження моделей у головному процесі {os.getpid()} (до fork)...")
+    api.run_startup()
+    # об'єкти моделі не повинні переміщуватись збирачем сміття — інакше сторінки копіюються у кожен воркер
+    gc.collect()
+    gc.freeze()
+
+    sock = _bind_socket(host, port)
+    children = {_spawn_worker(sock) for _ in range(workers)}
+    print(f"🚀 ML API: {workers} воркерів на http://{host}:{port} (pids: {sorted(children)})")
+
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"⚠️ Воркер {pid} завершився (status={status}), запускаємо новий")
+            time.sleep(1)
+            children.add(_spawn_worker(sock))
+    sock.close()
+    print("👋 Усі воркери зупинено.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Багатопроцесний запуск ML API")
+    parser.add_argument('--host', default=config.SERVING_HOST)
+    parser.add_argument('--port', type=int, default=config.SERVING_PORT)
+    parser.add_argument('--workers', type=int, default=config.SERVING_WORKERS)
+    args = parser.parse_args(argv)
+    workers = max(1, args.workers)
+
+    if hasattr(os, 'fork'):
+        serve_prefork(args.host, args.port, workers)
+    else:
+        import uvicorn
+        print(f"🚀 ML API: {workers} воркерів на http://{args.host}:{args.port} (без fork — модель у кожному воркері)")
+        uvicorn.run("api:app", host=args.host, port=args.port, workers=workers)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,172 @@
+"""
+Copy-on-write стан сервісу: читання без блокувань, атомарна підміна версій.
+
+SnapshotDict заміняє звичайні модульні dict-и в api.py (виправлення користувачів,
+статуси моделей, індекси оверлеїв...). Кожна версія — незмінний Snapshot:
+кортеж шардів-dict, які після публікації ніколи не змінюються. Читач бере
+поточну версію одним читанням атрибута (атомарним у CPython) і працює з нею
+без блокувань, тож прогноз ніколи не чекає на донавчання чи запис виправлення.
+Записувач під блокуванням копіює лише один шард (≈ n / SHARDS ключів), будує
+новий Snapshot і підміняє посилання.
+"""
+import threading
+from collections.abc import Mapping
+
+SHARDS = 64
+_MISSING = object()
+
+
+class Snapshot(Mapping):
+    """Незмінна версія SnapshotDict (узгоджена між усіма ключами)."""
+    __slots__ = ('_shards', '_len', 'version')
+
+    def __init__(self, shards, length, version):
+        self._shards = shards
+        self._len = length
+        self.version = version
+
+    def _shard(self, key):
+        return self._shards[hash(key) % len(self._shards)]
+
+    def __getitem__(self, key):
+        return self._shard(key)[key]
+
+    def get(self, key, default=None):
+        return self._shard(key).get(key, default)
+
+    def __contains__(self, key):
+        return key in self._shard(key)
+
+    def __iter__(self):
+        for shard in self._shards:
+            yield from shard
+
+    def __len__(self):
+        return self._len
+
+    def items(self):
+        return [(key, value) for shard in self._shards for key, value in shard.items()]
+
+
+class SnapshotDict(Mapping):
+    """
+    Dict-подібний copy-on-write словник. Читання (get, in, [], ітерація) — з
+    поточного Snapshot без блокувань; запис (=, pop, setdefault, compute, clear...)
+    атомарно публікує нову версію. Значення вважаються незмінними: щоб змінити
+    вкладений dict, запишіть його нову копію (compute).
+    """
+
+    def __init__(self, initial=None, shards=SHARDS):
+        self._lock = threading.Lock()
+        self._current = Snapshot(tuple({} for _ in range(shards)), 0, 0)
+        if initial:
+            self.update(initial)
+
+    # --- читання (без блокувань) ---
+    def snapshot(self) -> Snapshot:
+        return self._current
+
+    @property
+    def version(self) -> int:
+        return self._current.version
+
+    def __getitem__(self, key):
+        return self._current[key]
+
+    def get(self, key, default=None):
+        return self._current.get(key, default)
+
+    def __contains__(self, key):
+        return key in self._current
+
+    def __iter__(self):
+        return iter(self._current)
+
+    def __len__(self):
+        return len(self._current)
+
+    def items(self):
+        """Пари ключ-значення однієї версії."""
+        return self._current.items()
+
+    def __repr__(self):
+        return f"SnapshotDict({dict(self.items())!r})"
+
+    # --- запис (під блокуванням, нова версія) ---
+    def _publish(self, changes):
+        """changes: {ключ: значення або _MISSING (видалити)}; викликати під self._lock."""
+        current = self._current
+        shards = list(current._shards)
+        length = current._len
+        copied = set()
+        for key, value in changes.items():
+            index = hash(key) % len(shards)
+            if index not in copied:
+                shards[index] = dict(shards[index])
+                copied.add(index)
+            shard = shards[index]
+            if value is _MISSING:
+                if key in shard:
+                    del shard[key]
+                    length -= 1
+            else:
+                if key not in shard:
+                    length += 1
+                shard[key] = value
+        self._current = Snapshot(tuple(shards), length, current.version + 1)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._publish({key: value})
+
+    def __delitem__(self, key):
+        if self.pop(key, _MISSING) is _MISSING:
+            raise KeyError(key)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            value = self._current.get(key, _MISSING)
+            if value is _MISSING:
+                return default
+            self._publish({key: _MISSING})
+            return value
+
+    def setdefault(self, key, default=None):
+        value = self._current.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            value = self._current.get(key, _MISSING)
+            if value is _MISSING:
+                self._publish({key: default})
+                value = default
+            return value
+
+    def compute(self, key, fn):
+        """Атомарно записує fn(поточне значення або None) і повертає його."""
+        with self._lock:
+            value = fn(self._current.get(key))
+            self._publish({key: value})
+            return value
+
+    def compute_if_present(self, key, fn):
+        """Як compute, але лише для наявного ключа; повертає нове значення або None."""
+        with self._lock:
+            value = self._current.get(key, _MISSING)
+            if value is _MISSING:
+                return None
+            value = fn(value)
+            self._publish({key: value})
+            return value
+
+    def update(self, other=(), **kwargs):
+        changes = dict(other)
+        changes.update(kwargs)
+        if changes:
+            with self._lock:
+                self._publish(changes)
+
+    def clear(self):
+        with self._lock:
+            current = self._current
+            self._current = Snapshot(tuple({} for _ in current._shards), 0, current.version + 1)
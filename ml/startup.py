@@ -0,0 +1,81 @@
+"""
+Стан запуску сервісу: фази завантаження, їх тривалість і готовність.
+
+Важкі залежності (scikit-learn, scipy, сама модель) завантажуються у фоновому
+потоці після старту сервера, тому процес одразу відповідає на /health/live, а
+/health/ready повертає 200 лише після завантаження моделі та прогріву.
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+NOT_STARTED = 'not_started'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class StartupTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._phases = OrderedDict()
+        self.state = NOT_STARTED
+        self.started_at = None
+        self.finished_at = None
+
+    def begin(self):
+        with self._lock:
+            self.state = LOADING
+            self.started_at = time.perf_counter()
+            self.finished_at = None
+            self._done.clear()
+
+    def finish(self, ok: bool = True):
+        with self._lock:
+            self.state = READY if ok else FAILED
+            self.finished_at = time.perf_counter()
+        self._done.set()
+
+    @property
+    def loading(self) -> bool:
+        return self.state == LOADING
+
+    def wait(self, timeout: float = None) -> bool:
+        """Чекає завершення фонового завантаження; True — якщо воно завершилось."""
+        return self._done.wait(timeout)
+
+    def record(self, name: str, duration_ms: float, status: str = 'ok', error: str = None):
+        with self._lock:
+            self._phases[name] = {'status': status, 'duration_ms': round(duration_ms, 2), 'error': error}
+
+    @contextmanager
+    def phase(self, name: str):
+        """Вимірює фазу завантаження; виняток позначає фазу як 'failed' і прокидається далі."""
+        with self._lock:
+            self._phases[name] = {'status': 'running', 'duration_ms': None, 'error': None}
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record(name, (time.perf_counter() - start) * 1000, 'failed', str(e))
+            raise
+        self.record(name, (time.perf_counter() - start) * 1000)
+
+    def phase_status(self, name: str):
+        with self._lock:
+            phase = self._phases.get(name)
+            return phase['status'] if phase else None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total_ms = None
+            if self.started_at is not None:
+                end = self.finished_at if self.finished_at is not None else time.perf_counter()
+                total_ms = round((end - self.started_at) * 1000, 2)
+            return {
+                'state': self.state,
+                'startup_ms': total_ms,
+                'phases': {name: dict(p) for name, p in self._phases.items()},
+            }
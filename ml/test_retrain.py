@@ -1,41 +1,46 @@
+"""
+Ручна перевірка донавчання: зберігає виправлення для тестового користувача і
+запускає retrain_personalized_model(). Пише в робочі файли сервісу
+(user_corrections.sqlite3, model_user_<id>.joblib, user_model_status.json),
+тому виконується лише явно: python test_retrain.py (pytest його не запускає).
+Автоматичний тест того ж сценарію — tests/test_overlay.py.
+"""
 import os
-import csv
 import joblib
-from api import retrain_personalized_model
+from api import CorrectionInput, save_correction, retrain_personalized_model, get_model_for_user, load_global_model
 
 TEST_USER = '68d83159665926c147c07c27'
 TEST_DESC = 'Кава в Starbucks'
-CORRECTIONS_FILE = f'model_user_{TEST_USER}.csv'
-
-# Append a correction row for our test user (ensure fields order matches ml/api.py expected header)
-row = {
-    'user_id': TEST_USER,
-    'description': TEST_DESC,
-    'original_category_id': '0',
-    'corrected_category_id': '',
-    'original_category_name': 'Інше',
-    'corrected_category_name': 'Кафе'
-}
-
-# Make sure file exists and header includes our columns
-file_exists = os.path.exists(CORRECTIONS_FILE)
-with open(CORRECTIONS_FILE, 'a', newline='', encoding='utf-8') as f:
-    fieldnames = ['user_id', 'description', 'original_category_id', 'corrected_category_id', 'original_category_name', 'corrected_category_name']
-    writer = csv.DictWriter(f, fieldnames=fieldnames)
-    if not file_exists:
-        writer.writeheader()
-    writer.writerow(row)
-
-print('Wrote test correction for', TEST_USER)
-
-# Call retrain
-print('Triggering retrain...')
-retrain_personalized_model(TEST_USER)
-
-model_path = f'model_user_{TEST_USER}.joblib'
-if os.path.exists(model_path):
-    model = joblib.load(model_path)
-    pred = model.predict([TEST_DESC])[0]
-    print('Prediction for test description after retrain:', pred)
-else:
-    print('Model not found at', model_path)
+
+
+def main():
+    # Store a correction for our test user (upsert into the corrections store)
+    save_correction(CorrectionInput(
+        user_id=TEST_USER,
+        description=TEST_DESC,
+        original_category_id=0,
+        original_category_name='Інше',
+        corrected_category_name='Кафе'
+    ))
+
+    print('Wrote test correction for', TEST_USER)
+
+    # Overlay personalization needs the global model
+    load_global_model()
+
+    # Call retrain
+    print('Triggering retrain...')
+    retrain_personalized_model(TEST_USER)
+
+    model_path = f'model_user_{TEST_USER}.joblib'
+    if os.path.exists(model_path):
+        print('Saved artifact:', type(joblib.load(model_path)).__name__, os.path.getsize(model_path), 'bytes')
+        model, source = get_model_for_user(TEST_USER)
+        pred = model.predict([TEST_DESC])[0]
+        print(f'Prediction for test description after retrain ({source}):', pred)
+    else:
+        print('Model not found at', model_path)
+
+
+if __name__ == "__main__":
+    main()
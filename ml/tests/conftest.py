@@ -0,0 +1,22 @@
+import pytest
+
+import api
+from corrections_store import CorrectionsStore
+from prediction_cache import PredictionCache
+
+
+@pytest.fixture(autouse=True)
+def corrections_store(tmp_path, monkeypatch):
+    """Keep every test away from the real user_corrections.sqlite3."""
+    store = CorrectionsStore(str(tmp_path / 'corrections.sqlite3'), normalize=api.normalize_description)
+    monkeypatch.setattr(api, 'corrections_store', store)
+    yield store
+    store.close()
+
+
+@pytest.fixture(autouse=True)
+def prediction_cache(monkeypatch):
+    """Fresh result cache per test so models patched in by tests are not shadowed."""
+    cache = PredictionCache(max_entries=1000)
+    monkeypatch.setattr(api, 'prediction_cache', cache)
+    return cache
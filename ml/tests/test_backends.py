@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from backends import BACKENDS, LinearTextModel, get_backend, wrap_loaded_model
+from compiled_forest import CompiledForestModel
+
+TEXTS = ['АТБ', 'Сільпо', 'Рукавичка АТБ', 'Київстар', 'lifecell', 'Vodafone поповнення',
+         'Uber', 'Bolt таксі', 'Оплата паркування', 'Аптека Доброго Дня', 'APTEKA 16', 'EVA']
+LABELS = [1, 1, 1, 11, 11, 11, 10, 10, 10, 13, 13, 13]
+
+
+def test_registry_exposes_builtin_backends():
+    assert {'RF', 'LINEAR'} <= set(BACKENDS)
+    with pytest.raises(ValueError):
+        get_backend('NOPE')
+
+
+@pytest.mark.parametrize('name', ['RF', 'LINEAR'])
+def test_fit_save_load_predict_roundtrip(name, tmp_path):
+    backend = get_backend(name)
+    model = backend.fit(TEXTS, LABELS, n_jobs=1)
+    path = str(tmp_path / f'{name}.joblib')
+    backend.save(model, path)
+    loaded = backend.load(path)
+
+    assert list(backend.predict(loaded, TEXTS)) == list(backend.predict(model, TEXTS))
+    assert backend.predict_one(loaded, 'Київстар') == 11
+
+
+def test_linear_fast_path_matches_sklearn_pipeline():
+    model = get_backend('LINEAR').fit(TEXTS, LABELS)
+    queries = TEXTS + ['невідомий мерчант', 'АТБ АТБ Київстар', '']
+    fast = np.array([model.predict([q])[0] for q in queries])
+    assert (fast == model.pipeline.predict(queries)).all()
+
+
+def test_linear_fast_path_probabilities_match_sklearn_pipeline():
+    model = get_backend('LINEAR').fit(TEXTS, LABELS)
+    queries = TEXTS + ['невідомий мерчант', '']
+    fast = np.vstack([model.predict_proba([q]) for q in queries])
+    np.testing.assert_allclose(fast, model.pipeline.predict_proba(queries), atol=1e-12)
+
+
+def test_wrap_loaded_model_wraps_sklearn_pipelines():
+    linear = get_backend('LINEAR').fit(TEXTS, LABELS)
+    rf = get_backend('RF').fit(TEXTS, LABELS, n_jobs=1)
+    assert isinstance(wrap_loaded_model(linear.pipeline), LinearTextModel)
+    assert isinstance(wrap_loaded_model(rf.pipeline), CompiledForestModel)
+    assert wrap_loaded_model(rf) is rf
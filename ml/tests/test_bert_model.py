@@ -0,0 +1,93 @@
+import os
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip('torch')
+transformers = pytest.importorskip('transformers')
+
+import api
+import config
+from backends import get_backend
+from bert_model import BertTextModel, load_bert_model
+
+CATEGORY_IDS = [3, 5, 8, 11]
+VOCAB = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]', 'атб', 'сільпо', 'київстар', 'uber',
+         'аптека', 'доброго', 'дня', 'оплата', 'таксі', 'поповнення', 'мобільного', '##с']
+
+
+@pytest.fixture(scope='module')
+def bert_dir(tmp_path_factory):
+    """Tiny randomly initialised BERT saved like train.py does (save_pretrained + tokenizer)."""
+    path = tmp_path_factory.mktemp('bert')
+    vocab_file = path / 'vocab.txt'
+    vocab_file.write_text('\n'.join(VOCAB) + '\n', encoding='utf-8')
+    tokenizer = transformers.BertTokenizer(str(vocab_file), do_lower_case=True)
+    torch.manual_seed(0)
+    bert_config = transformers.BertConfig(
+        vocab_size=len(VOCAB), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, max_position_embeddings=64, num_labels=len(CATEGORY_IDS),
+        id2label={i: f'LABEL_{c}' for i, c in enumerate(CATEGORY_IDS)},
+    )
+    transformers.BertForSequenceClassification(bert_config).save_pretrained(str(path))
+    tokenizer.save_pretrained(str(path))
+    return str(path)
+
+
+TEXTS = ['АТБ', 'Оплата таксі Uber', 'Поповнення мобільного Київстар', 'Аптека Доброго Дня АТБ Сільпо Uber']
+
+
+def test_predicts_category_ids_from_label_names(bert_dir):
+    model = load_bert_model(bert_dir, quantized=False)
+
+    predicted = model.predict(TEXTS)
+    proba = model.predict_proba(TEXTS)
+
+    assert list(model.classes_) == CATEGORY_IDS
+    assert set(predicted) <= set(CATEGORY_IDS)
+    assert proba.shape == (len(TEXTS), len(CATEGORY_IDS))
+    np.testing.assert_allclose(proba.sum(axis=1), 1.0, rtol=1e-6)
+    assert list(predicted) == [CATEGORY_IDS[i] for i in proba.argmax(axis=1)]
+    assert os.environ['HF_HUB_OFFLINE'] == '1'
+
+
+def test_dynamic_padding_matches_max_length_padding(bert_dir):
+    model = load_bert_model(bert_dir, quantized=False, batch_size=3)
+
+    enc = model.tokenizer(TEXTS, padding='max_length', truncation=True, max_length=64, return_tensors='pt')
+    with torch.inference_mode():
+        expected = model.model(**enc).logits.numpy()
+
+    np.testing.assert_allclose(model.logits(TEXTS), expected, atol=1e-5)
+    assert len(model.logits([])) == 0
+
+
+def test_quantized_model_uses_int8_linear_layers(bert_dir):
+    fp32 = load_bert_model(bert_dir, quantized=False)
+    int8 = load_bert_model(bert_dir, quantized=True)
+
+    linear = [m for m in int8.model.modules() if type(m).__name__ == 'Linear']
+    assert linear and not any(isinstance(m, torch.nn.Linear) for m in linear)
+    assert all(m.weight().dtype == torch.qint8 for m in linear)
+    assert int8.quantized and not fp32.quantized
+    np.testing.assert_allclose(int8.predict_proba(TEXTS), fp32.predict_proba(TEXTS), atol=0.05)
+
+
+def test_global_model_loads_through_bert_backend(bert_dir, monkeypatch):
+    monkeypatch.setattr(config, 'MODEL_TYPE', 'BERT')
+    monkeypatch.setattr(config, 'BERT_MODEL_PATH', bert_dir)
+    monkeypatch.setattr(api, 'global_model', None)
+    monkeypatch.setattr(api, 'global_model_signature', None)
+
+    api.load_global_model()
+
+    assert isinstance(api.global_model, BertTextModel)
+    assert api.global_predict_function('Київстар') in CATEGORY_IDS
+    assert not get_backend('BERT').supports_overlay
+
+
+def test_missing_weights_is_a_clear_error(tmp_path):
+    (tmp_path / 'config.json').write_text('{}', encoding='utf-8')
+
+    with pytest.raises(FileNotFoundError, match='weights not found'):
+        load_bert_model(str(tmp_path))
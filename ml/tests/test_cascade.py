@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+import api
+import config
+from backends import get_backend
+from cascade import CascadeModel, CascadePrediction
+from model_cache import ModelCache
+from overlay import CorrectionOverlay, OverlayModel
+from snapshot_state import SnapshotDict
+
+TEXTS = ['АТБ', 'Сільпо', 'Рукавичка АТБ', 'Київстар', 'lifecell', 'Vodafone поповнення',
+         'Uber', 'Bolt таксі', 'Оплата паркування', 'Аптека Доброго Дня', 'APTEKA 16', 'EVA']
+LABELS = [1, 1, 1, 11, 11, 11, 10, 10, 10, 13, 13, 13]
+
+
+class TableModel:
+    """predict_proba from a {text: (category_id, confidence)} table; records every call."""
+
+    def __init__(self, table, classes=(1, 11)):
+        self.table = table
+        self.classes_ = np.asarray(classes)
+        self.calls = []
+
+    def predict_proba(self, texts):
+        self.calls.append(list(texts))
+        out = np.zeros((len(texts), len(self.classes_)))
+        for i, text in enumerate(texts):
+            category_id, confidence = self.table[text]
+            col = list(self.classes_).index(category_id)
+            out[i] = (1 - confidence) / (len(self.classes_) - 1)
+            out[i, col] = confidence
+        return out
+
+
+class PlainModel:
+    def __init__(self, label):
+        self.label = label
+        self.calls = []
+
+    def predict(self, texts):
+        self.calls.append(list(texts))
+        return [self.label] * len(texts)
+
+
+def test_only_uncertain_texts_reach_the_next_stage():
+    cheap = TableModel({'АТБ': (1, 0.95), 'Київстар': (11, 0.55), 'Uber': (1, 0.5)})
+    heavy = TableModel({'Київстар': (11, 0.9), 'Uber': (11, 0.7)})
+    cascade = CascadeModel([('LINEAR', cheap), ('RF', heavy)], threshold=0.8)
+
+    details = cascade.predict_details(['АТБ', 'Київстар', 'Uber'])
+
+    assert details[0] == CascadePrediction(1, 0.95, 'LINEAR')
+    assert details[1] == CascadePrediction(11, 0.9, 'RF')
+    assert details[2] == CascadePrediction(11, 0.7, 'RF')
+    assert heavy.calls == [['Київстар', 'Uber']]
+    assert list(cascade.predict(['АТБ'])) == [1]
+
+
+def test_last_stage_without_probabilities_has_no_confidence():
+    cascade = CascadeModel([('LINEAR', TableModel({'EVA': (1, 0.4)})), ('BERT', PlainModel(13))], threshold=0.7)
+
+    assert cascade.predict_details(['EVA']) == [CascadePrediction(13, None, 'BERT')]
+    with pytest.raises(ValueError):
+        CascadeModel([('BERT', PlainModel(13)), ('RF', PlainModel(1))], threshold=0.6)
+
+
+def test_categorize_reports_confidence_and_stage(monkeypatch):
+    heavy = TableModel({'Київстар': (11, 0.9)})
+    cascade = CascadeModel([('LINEAR', TableModel({'АТБ': (1, 0.95), 'Київстар': (11, 0.5)})), ('RF', heavy)],
+                           threshold=0.8)
+    monkeypatch.setattr(api, 'global_model', cascade)
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict())
+
+    first = api.categorize_transaction(api.TransactionInput(description='Київстар', user_id='u1'))
+    again = api.categorize_transaction(api.TransactionInput(description='Київстар', user_id='u2'))
+    batch = api.categorize_batch(api.BatchCategorizationInput(items=[
+        api.BatchItemInput(user_id='u1', description='АТБ'),
+        api.BatchItemInput(user_id='u1', description='Київстар'),
+    ]))
+
+    assert (first['category_id'], first['confidence'], first['cascade_stage']) == (11, 0.9, 'RF')
+    # результат з кешу зберігає впевненість і сходинку
+    assert (again['confidence'], again['cascade_stage']) == (0.9, 'RF')
+    assert len(heavy.calls) == 1
+    assert [(r['cascade_stage'], r['confidence']) for r in batch['results']] == [('LINEAR', 0.95), ('RF', 0.9)]
+
+
+def test_single_model_responses_have_no_cascade_details(monkeypatch):
+    monkeypatch.setattr(api, 'global_model', PlainModel(8))
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict())
+
+    result = api.categorize_transaction(api.TransactionInput(description='Київстар', user_id='u1'))
+
+    assert result['category_id'] == 8
+    assert result['confidence'] is None and result['cascade_stage'] is None
+
+
+def test_overlay_on_top_of_cascade_uses_first_stage_tfidf():
+    linear = get_backend('LINEAR').fit(TEXTS, LABELS)
+    rf = get_backend('RF').fit(TEXTS, LABELS, n_jobs=1)
+    cascade = CascadeModel([('LINEAR', linear), ('RF', rf)], threshold=0.6)
+
+    model = OverlayModel(cascade, CorrectionOverlay(['Uber'], [9], min_similarity=0.6))
+
+    assert list(model.predict(['Uber', 'Київстар'])) == [9, list(cascade.predict(['Київстар']))[0]]
+
+
+def test_load_global_model_builds_the_cascade(tmp_path, monkeypatch):
+    for name, setting in (('LINEAR', 'LINEAR_MODEL_PATH'), ('RF', 'SKLEARN_MODEL_PATH')):
+        path = str(tmp_path / f'{name}.joblib')
+        monkeypatch.setattr(config, setting, path)
+        backend = get_backend(name)
+        backend.save(backend.fit(TEXTS, LABELS, n_jobs=1), path)
+    monkeypatch.setattr(config, 'CASCADE_ENABLED', True)
+    monkeypatch.setattr(config, 'CASCADE_MODEL_TYPES', ['LINEAR', 'RF'])
+    monkeypatch.setattr(api, 'global_model', None)
+    monkeypatch.setattr(api, 'global_model_signature', None)
+
+    api.load_global_model()
+
+    assert isinstance(api.global_model, CascadeModel)
+    assert api.global_model.stage_names == ['LINEAR', 'RF']
+    assert api.global_predict_function('Київстар') == 11
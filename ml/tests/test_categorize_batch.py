@@ -0,0 +1,75 @@
+from fastapi.testclient import TestClient
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+
+import api
+from model_cache import ModelCache
+from snapshot_state import SnapshotDict
+
+
+class CountingModel:
+    """Wraps a pipeline and records how many times predict was called."""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.calls = 0
+
+    def predict(self, texts):
+        self.calls += 1
+        return self.pipeline.predict(texts)
+
+
+def _tiny_model():
+    pipeline = Pipeline([
+        ('tfidf', TfidfVectorizer()),
+        ('model', LogisticRegression(max_iter=200)),
+    ])
+    pipeline.fit(['АТБ', 'Сільпо', 'Київстар', 'lifecell', 'Uber', 'Bolt'], [1, 1, 11, 11, 10, 10])
+    return CountingModel(pipeline)
+
+
+def test_batch_keeps_order_and_uses_one_predict(monkeypatch):
+    model = _tiny_model()
+    monkeypatch.setattr(api, 'global_model', model)
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict({'u1': {'київстар': 9}}))
+
+    client = TestClient(api.app)
+    payload = {'items': [
+        {'user_id': 'u1', 'description': 'Київстар'},
+        {'user_id': 'u2', 'description': 'Київстар'},
+        {'user_id': 'u1', 'description': 'АТБ'},
+        {'user_id': 'u2', 'description': '   '},
+        {'user_id': 'u3', 'description': 'Uber'},
+    ]}
+    response = client.post('/api/v1/categorize-batch', json=payload)
+    assert response.status_code == 200
+    body = response.json()
+    results = body['results']
+
+    assert [r['description'] for r in results] == [i['description'] for i in payload['items']]
+    assert results[0]['category_id'] == 9 and results[0]['source'] == 'override'
+    assert results[1]['category_id'] == 11 and results[1]['source'] == 'global'
+    assert results[2]['category_id'] == 1
+    assert results[3]['error'] and results[3]['category_id'] is None
+    assert results[4]['category_id'] == 10
+    # all non-override items share the global model -> one vectorized call
+    assert model.calls == 1
+    assert body['timings']['overrides'] == 1
+    assert body['timings']['model_groups'] == 1
+
+
+def test_batch_without_model_reports_per_item_errors(monkeypatch):
+    monkeypatch.setattr(api, 'global_model', None)
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict({'u1': {'атб': 1}}))
+
+    client = TestClient(api.app)
+    response = client.post('/api/v1/categorize-batch', json={'items': [
+        {'user_id': 'u1', 'description': 'АТБ'},
+        {'user_id': 'u1', 'description': 'Сільпо'},
+    ]})
+    results = response.json()['results']
+    assert results[0]['category_id'] == 1
+    assert results[1]['error']
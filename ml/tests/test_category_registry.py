@@ -0,0 +1,121 @@
+import json
+import os
+import random
+import threading
+
+import pytest
+
+import api
+from category_registry import CategoryIndex, CategoryRegistry
+from corrections_store import CorrectionsStore
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    reg = CategoryRegistry(api.BASE_CATEGORIES, str(tmp_path / 'mappings.json'),
+                           fallbacks=api.CATEGORY_NAME_FALLBACKS, default_name='Інше')
+    monkeypatch.setattr(api, 'category_registry', reg)
+    return reg
+
+
+def _linear_scan(id_to_name, name):
+    """The original map_category_name_to_id: first category containing or contained in the name."""
+    name = str(name).strip()
+    if name in {v: k for k, v in id_to_name.items()}:
+        return {v: k for k, v in id_to_name.items()}[name]
+    low = name.lower()
+    for k, nm in id_to_name.items():
+        if low in nm.lower() or nm.lower() in low:
+            return k
+    if 'лік' in low or 'апте' in low:
+        return 13
+    return None
+
+
+def test_index_matches_linear_scan():
+    id_to_name = {**api.BASE_CATEGORIES, 17: 'Магазин', 18: 'Ремонт авто', 19: 'Кафе та ресторани'}
+    index = CategoryIndex(id_to_name.items(), api.CATEGORY_NAME_FALLBACKS)
+    rng = random.Random(0)
+    names = list(id_to_name.values())
+    alphabet = 'абвгдекліптормсуаф /'
+    samples = ['Ліки', 'Аптека', 'Подарунки', 'продукти АТБ', 'кафе', 'Суперкаліфрагілістик']
+    for _ in range(3000):
+        name = rng.choice(names)
+        start = rng.randrange(len(name))
+        samples.append(name[start:start + rng.randint(1, len(name))])
+        samples.append(''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 12))).strip() or 'х')
+
+    samples = [s for s in samples if s.strip()]
+
+    assert [index.resolve(s) for s in samples] == [_linear_scan(id_to_name, s) for s in samples]
+    # the linear scan matched every name on a blank string; blank names are now unknown
+    assert index.resolve('  ') is None and index.resolve(None) is None
+
+
+def test_existing_name_returns_its_id(registry):
+    assert api.get_or_create_category_id('Продукти') == 1
+    assert api.get_or_create_category_id('  ') == 0
+    assert not os.path.exists(registry.path)
+
+
+def test_new_category_is_persisted_atomically_and_resolvable(registry, tmp_path):
+    new_id = api.get_or_create_category_id('Подарунки')
+
+    assert new_id == 17
+    assert api.ID_TO_NAME[17] == 'Подарунки' and api.NAME_TO_ID['Подарунки'] == 17
+    with open(registry.path, encoding='utf-8') as f:
+        assert json.load(f) == {'17': 'Подарунки'}
+    assert sorted(os.listdir(tmp_path)) == ['mappings.json', 'mappings.json.lock']
+    assert api.map_category_name_to_id('подарунки на НР') == 17
+    assert api.get_or_create_category_id('Подарунки') == 17
+
+    restarted = CategoryRegistry(api.BASE_CATEGORIES, registry.path)
+    assert restarted.load() == 1 and restarted.resolve('Подарунки') == 17
+
+
+def test_concurrent_creation_allocates_unique_ids(registry):
+    # a second registry on the same file plays another worker process
+    other = CategoryRegistry(api.BASE_CATEGORIES, registry.path)
+    names = [f'Категорія {i}' for i in range(40)]
+    results = {}
+
+    def create(reg, name):
+        results.setdefault(name, set()).add(reg.get_or_create(name)[0])
+
+    threads = [threading.Thread(target=create, args=(reg, name))
+               for name in names for reg in (registry, other, registry)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(len(ids) == 1 for ids in results.values())
+    ids = [next(iter(results[name])) for name in names]
+    assert sorted(ids) == list(range(17, 17 + len(names)))
+    with open(registry.path, encoding='utf-8') as f:
+        assert {int(k): v for k, v in json.load(f).items()} == dict(zip(ids, names))
+    # an id created by the other "worker" is picked up when first seen
+    fresh = CategoryRegistry(api.BASE_CATEGORIES, registry.path)
+    assert fresh.name_for(ids[-1]) == names[-1]
+
+
+def test_migration_resolves_each_name_once(tmp_path, registry):
+    csv_path = tmp_path / 'user_corrections.csv'
+    csv_path.write_text(
+        'user_id,description,original_category_id,corrected_category_id,original_category_name,corrected_category_name\n'
+        'u1,АТБ,6,,Супермаркет,Продукти\n'
+        'u1,Аптека Доброго Дня,0,,Інше,Ліки\n'
+        'u2,Сільпо,6,,Супермаркет,Продукти\n',
+        encoding='utf-8'
+    )
+    store = CorrectionsStore(str(tmp_path / 'store.sqlite3'), normalize=api.normalize_description)
+    calls = []
+
+    def resolve_many(names):
+        calls.append(list(names))
+        return api.map_category_names_to_ids(names)
+
+    assert store.migrate_csv(str(csv_path), resolve_category_names=resolve_many) == 3
+    assert len(calls) == 1 and sorted(calls[0]) == ['Ліки', 'Продукти']
+    assert store.get_user_overrides('u1') == {'атб': 1, 'аптека доброго дня': 13}
+    store.close()
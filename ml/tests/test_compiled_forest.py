@@ -0,0 +1,100 @@
+import csv
+import os
+
+import numpy as np
+import pytest
+
+import config
+from backends import get_backend, load_model_artifact
+from compiled_forest import CompiledForestModel, compile_forest, compiled_artifact_path, export_compiled
+from overlay import CorrectionOverlay, OverlayModel
+
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_FILE = os.path.join(ML_DIR, 'monobank_transactions_augmented2.csv')
+
+
+def _rows(limit=1500):
+    rows = []
+    with open(DATA_FILE, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            text = (row.get('text_features') or '').strip()
+            try:
+                rows.append((text, int(float(row['category_id']))))
+            except (KeyError, ValueError):
+                continue
+    return rows[::max(1, len(rows) // limit)][:limit]
+
+
+@pytest.fixture(scope='module')
+def rf_pipeline():
+    rows = _rows()
+    backend = get_backend('RF')
+    pipeline = backend._pipeline(backend.make_featurizer(), backend.make_classifier(n_jobs=1))
+    return pipeline.fit([t for t, _ in rows], [c for _, c in rows])
+
+
+def _queries():
+    return [t for t, _ in _rows(400)] + ['', 'невідомий мерчант', 'АТБ АТБ Київстар', 'APTEKA 16 Uber']
+
+
+def test_predictions_and_probabilities_match_sklearn(rf_pipeline):
+    compiled = compile_forest(rf_pipeline)
+    compiled.pipeline = None  # без Pipeline великі батчі теж рахуються numpy-обходом
+    queries = _queries()
+    expected = rf_pipeline.predict_proba(queries)
+
+    # великі батчі (sklearn TF-IDF) і швидкий шлях для кількох описів
+    assert np.array_equal(compiled.predict_proba(queries), expected)
+    single = np.vstack([compiled.predict_proba([q]) for q in queries])
+    assert np.array_equal(single, expected)
+    assert (compiled.predict(queries) == rf_pipeline.predict(queries)).all()
+    # матриця ознак напряму (так ліс використовує OverlayModel)
+    X = rf_pipeline[0].transform(queries)
+    assert np.array_equal(compiled[-1].predict_proba(X), expected)
+    assert np.array_equal(compiled[-1].predict_proba(X.toarray()), expected)
+
+
+def test_save_writes_compiled_artifact_and_load_uses_it(rf_pipeline, tmp_path):
+    backend = get_backend('RF')
+    path = str(tmp_path / 'rf.joblib')
+    backend.save(compile_forest(rf_pipeline), path)
+    assert os.path.exists(compiled_artifact_path(path))
+
+    loaded = backend.load(path)
+    assert isinstance(loaded, CompiledForestModel) and loaded.pipeline is None
+    assert list(loaded.predict(['АТБ', 'Київстар'])) == list(rf_pipeline.predict(['АТБ', 'Київстар']))
+    assert isinstance(load_model_artifact(path), CompiledForestModel)
+    with pytest.raises(ValueError):
+        backend.save(loaded, str(tmp_path / 'copy.joblib'))
+
+    # великий батч довантажує вихідний Pipeline
+    queries = _queries()
+    assert len(queries) >= loaded.SKLEARN_MIN_ROWS
+    assert (loaded.predict(queries) == rf_pipeline.predict(queries)).all()
+    assert loaded.pipeline is not None
+
+
+def test_stale_or_missing_artifact_falls_back_to_pipeline(rf_pipeline, tmp_path, monkeypatch):
+    import joblib
+    path = str(tmp_path / 'rf.joblib')
+    joblib.dump(rf_pipeline, path)
+    export_compiled(rf_pipeline, path)
+    # Pipeline перезаписано після експорту — артефакт застарів
+    other = get_backend('RF').fit(['АТБ', 'Київстар', 'Uber', 'Сільпо'], [1, 11, 10, 1], n_jobs=1).pipeline
+    joblib.dump(other, path)
+    os.utime(path, ns=(1, 1))
+
+    loaded = load_model_artifact(path)
+    assert isinstance(loaded, CompiledForestModel)
+    assert loaded.classifier.n_nodes == compile_forest(other).classifier.n_nodes
+
+    os.remove(compiled_artifact_path(path))
+    monkeypatch.setattr(config, 'RF_COMPILED_INFERENCE', False)
+    assert type(get_backend('RF').load(path)).__name__ == 'Pipeline'
+
+
+def test_compiled_model_as_overlay_base(rf_pipeline):
+    compiled = compile_forest(rf_pipeline)
+    overlay = CorrectionOverlay(['Київстар'], [17], min_similarity=0.9)
+    model = OverlayModel(compiled, overlay)
+    assert list(model.predict(['Київстар', 'АТБ'])) == [17, rf_pipeline.predict(['АТБ'])[0]]
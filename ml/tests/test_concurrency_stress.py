@@ -0,0 +1,202 @@
+import threading
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.pipeline import Pipeline
+
+import api
+import config
+from model_cache import ModelCache
+from snapshot_state import SnapshotDict
+
+USERS = ('u1', 'u2', 'u3')
+VERSIONS = 60
+BASELINE_REQUESTS = 100
+# p99 читачів під записами проти p99 без записів; підлога покриває чергу за GIL і планувальник ОС,
+# а перенавчання справжньої персональної моделі триває секунди
+P99_RATIO = 20
+P99_FLOOR_SECONDS = 0.25
+READER_PAUSE_SECONDS = 0.001  # рівномірні в часі запити: блокування читачів потрапляє в p99
+
+
+def _global_pipeline():
+    pipeline = Pipeline([
+        ('tfidf', TfidfVectorizer()),
+        ('model', RandomForestClassifier(n_estimators=10, random_state=42)),
+    ])
+    pipeline.fit(['АТБ', 'Сільпо', 'Київстар', 'lifecell', 'Uber таксі', 'Bolt таксі'],
+                 [1, 1, 11, 11, 10, 10])
+    return pipeline
+
+
+def test_categorize_stays_correct_during_corrections_and_retrains(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, 'PERSONALIZATION_MODE', 'overlay')
+    monkeypatch.setattr(config, 'CROSS_WORKER_SYNC', False)
+    monkeypatch.setattr(api, 'global_model', _global_pipeline())
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict())
+    monkeypatch.setattr(api, 'user_override_indexes', SnapshotDict())
+    monkeypatch.setattr(api, 'user_model_status', SnapshotDict())
+    monkeypatch.setattr(api, 'personalized_model_mtimes', SnapshotDict())
+    stop = threading.Event()
+    errors = []
+    observed = {}
+    latencies = {'baseline': [], 'writers': []}
+    started = threading.Barrier(8)  # усі читачі працюють, поки пишуть записувачі
+
+    def corrector():
+        started.wait()
+        try:
+            for version in range(VERSIONS):
+                for uid in USERS:
+                    api.save_correction(api.CorrectionInput(
+                        user_id=uid, description='Uber таксі', corrected_category_id=1000 + version))
+                    # new keys change the size of the map that override lookups read
+                    api.save_correction(api.CorrectionInput(
+                        user_id=uid, description=f'Магазин {version}', corrected_category_id=1))
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(repr(e))
+        finally:
+            stop.set()
+
+    def retrainer():
+        started.wait()
+        try:
+            while not stop.is_set():
+                for uid in USERS:
+                    api.retrain_personalized_model(uid)
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(repr(e))
+
+    def categorize(uid, description, timings):
+        started = time.perf_counter()
+        result = api.categorize_transaction(api.TransactionInput(description=description, user_id=uid))
+        timings.append(time.perf_counter() - started)
+        time.sleep(READER_PAUSE_SECONDS)
+        return result
+
+    def baseline_reader(index):
+        uid = USERS[index % len(USERS)]
+        timings = []
+        for _ in range(BASELINE_REQUESTS):
+            for description in ('Uber таксі', 'Київстар'):
+                categorize(uid, description, timings)
+        latencies['baseline'].extend(timings)
+
+    def reader(index):
+        uid = USERS[index % len(USERS)]
+        seen = observed.setdefault(index, [])
+        timings = []
+        started.wait()
+        try:
+            while not stop.is_set():
+                for description in ('Uber таксі', 'Київстар'):
+                    result = categorize(uid, description, timings)
+                    if not isinstance(result, dict):
+                        errors.append(repr(result))
+                    elif description == 'Uber таксі':
+                        seen.append(result['category_id'])
+                    elif result['category_id'] != 11:
+                        errors.append(f"{description!r} -> {result}")
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(repr(e))
+        latencies['writers'].extend(timings)
+
+    # спершу лише читачі: базова затримка на цій машині
+    baseline = [threading.Thread(target=baseline_reader, args=(i,)) for i in range(6)]
+    for t in baseline:
+        t.start()
+    for t in baseline:
+        t.join(timeout=120)
+
+    threads = [threading.Thread(target=corrector), threading.Thread(target=retrainer)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=120)
+
+    assert not any(t.is_alive() for t in threads)
+    assert errors == []
+    for index, seen in observed.items():
+        assert seen, f"reader {index} made no requests"
+        # once a correction is visible it is never replaced by an older one
+        corrected = [c for c in seen if c >= 1000]
+        assert corrected == sorted(corrected), f"reader {index} saw a stale correction"
+        assert all(c == 10 for c in seen[:len(seen) - len(corrected)])
+    for uid in USERS:
+        result = api.categorize_transaction(api.TransactionInput(description='Uber таксі', user_id=uid))
+        assert result['category_id'] == 1000 + VERSIONS - 1
+    # читачі не чекають на записи: p99 росте лише на чергу за GIL, а не на тривалість перенавчання
+    p99_baseline = np.percentile(latencies['baseline'], 99)
+    p99_writers = np.percentile(latencies['writers'], 99)
+    assert p99_writers <= max(P99_RATIO * p99_baseline, P99_FLOOR_SECONDS), (
+        f"p99 {p99_writers * 1000:.1f} ms with writers vs {p99_baseline * 1000:.2f} ms without")
+
+
+def test_retrain_does_not_overwrite_a_newer_correction(monkeypatch, corrections_store):
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict())
+    monkeypatch.setattr(api, 'user_override_indexes', SnapshotDict())
+    api.save_correction(api.CorrectionInput(user_id='u1', description='Uber таксі', corrected_category_id=9))
+    assert api.get_user_corrections_map('u1') == {'uber таксі': 9}
+    read_rows = corrections_store.get_user_corrections
+
+    def rows_then_correction(user_id):
+        # the retrain has read its rows when a newer correction lands
+        rows = read_rows(user_id)
+        api.save_correction(api.CorrectionInput(user_id='u1', description='Uber таксі', corrected_category_id=12))
+        return rows
+
+    monkeypatch.setattr(corrections_store, 'get_user_corrections', rows_then_correction)
+    api.read_user_corrections('u1')
+
+    assert api.get_user_corrections_map('u1') == {'uber таксі': 12}
+    assert api.find_user_override('u1', 'Uber таксі').category_id == 12
+
+
+def test_correction_updates_a_loaded_map_without_reading_the_store(monkeypatch, corrections_store):
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict())
+    monkeypatch.setattr(api, 'user_override_indexes', SnapshotDict())
+    api.save_correction(api.CorrectionInput(user_id='u1', description='АТБ', corrected_category_id=1))
+    assert api.get_user_corrections_map('u1') == {'атб': 1}
+    before = api.get_user_corrections_map('u1')
+
+    def no_store_reads(user_id):
+        raise AssertionError('save_correction must not re-read all corrections')
+
+    monkeypatch.setattr(corrections_store, 'get_user_overrides', no_store_reads)
+    api.save_correction(api.CorrectionInput(user_id='u1', description='Uber таксі', corrected_category_id=9))
+    api.save_correction(api.CorrectionInput(user_id='u2', description='Uber таксі', corrected_category_id=9))
+
+    assert api.get_user_corrections_map('u1') == {'атб': 1, 'uber таксі': 9}
+    assert before == {'атб': 1}  # readers holding the old version are unaffected
+    assert 'u2' not in api.user_corrections_map  # loaded lazily on first use
+
+
+def test_correction_during_a_cold_load_is_not_lost(monkeypatch, corrections_store):
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict())
+    monkeypatch.setattr(api, 'user_override_indexes', SnapshotDict())
+    corrections_store.upsert('u1', 'Uber таксі', 10, 9)
+    read_overrides = corrections_store.get_user_overrides
+    loaded = threading.Event()
+    written = threading.Event()
+
+    def slow_read(user_id):
+        # the reader has its rows (without the new correction) before the writer's upsert
+        overrides = read_overrides(user_id)
+        loaded.set()
+        written.wait(0.5)  # the writer must not finish while the stale map is pending
+        return overrides
+
+    monkeypatch.setattr(corrections_store, 'get_user_overrides', slow_read)
+    reader = threading.Thread(target=api.get_user_corrections_map, args=('u1',))
+    reader.start()
+    assert loaded.wait(2)
+    api.save_correction(api.CorrectionInput(user_id='u1', description='Uber таксі', corrected_category_id=12))
+    written.set()
+    reader.join(2)
+
+    assert api.get_user_corrections_map('u1') == {'uber таксі': 12}
@@ -0,0 +1,70 @@
+import sqlite3
+
+from corrections_store import CorrectionsStore, read_corrections_csv
+
+
+MIXED_CSV = (
+    'user_id,description,original_category_id,corrected_category_id\n'
+    'u1,EasyPay,1,8\n'
+    'u1,TwoTwo,7,,Одяг,Ліки\n'
+    'u1,TwoTwo,7,11,Одяг,Мобільний\n'
+    'u2, АТБ ,1,6\n'
+    'broken\n'
+)
+
+
+def test_upsert_collapses_duplicates(tmp_path):
+    store = CorrectionsStore(str(tmp_path / 'c.sqlite3'))
+    store.upsert('u1', 'АТБ', 0, 1)
+    store.upsert('u1', '  атб ', 0, 6)
+    store.upsert('u2', 'АТБ', 0, 1)
+
+    assert store.count() == 2
+    assert store.get_user_overrides('u1') == {'атб': 6}
+    rows = store.get_user_corrections('u1')
+    assert len(rows) == 1 and rows[0]['description'] == 'атб'
+
+
+def test_mixed_column_csv_is_read_positionally(tmp_path):
+    path = tmp_path / 'corr.csv'
+    path.write_text(MIXED_CSV, encoding='utf-8')
+    rows = read_corrections_csv(str(path))
+    assert len(rows) == 4
+    assert rows[1]['corrected_category_name'] == 'Ліки'
+
+
+def test_migration_runs_once_and_resolves_names(tmp_path):
+    path = tmp_path / 'user_corrections.csv'
+    path.write_text(MIXED_CSV, encoding='utf-8')
+    store = CorrectionsStore(str(tmp_path / 'c.sqlite3'))
+
+    resolved = []
+
+    def resolve(name):
+        resolved.append(name)
+        return 13 if name == 'Ліки' else None
+
+    assert store.migrate_csv(str(path), resolve_category_name=resolve) == 4
+    assert store.migrate_csv(str(path), resolve_category_name=resolve) == 0
+    # the later TwoTwo row wins
+    assert store.get_user_overrides('u1') == {'easypay': 8, 'twotwo': 11}
+    assert store.get_user_overrides('u2') == {'атб': 6}
+    assert resolved == ['Ліки']
+
+
+def test_store_created_before_revisions_is_upgraded(tmp_path):
+    path = str(tmp_path / 'c.sqlite3')
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE corrections (user_id TEXT NOT NULL, norm_description TEXT NOT NULL, '
+                     'description TEXT NOT NULL, original_category_id INTEGER, corrected_category_id INTEGER, '
+                     'original_category_name TEXT, corrected_category_name TEXT, updated_at TEXT NOT NULL, '
+                     'PRIMARY KEY (user_id, norm_description))')
+        conn.execute("INSERT INTO corrections VALUES ('u1', 'атб', 'АТБ', 0, 1, NULL, NULL, '2026-01-01')")
+    conn.close()
+    store = CorrectionsStore(path)
+
+    assert store.get_user_overrides('u1') == {'атб': 1}
+    assert store.last_revision() == 0
+    store.upsert('u2', 'АТБ', 0, 6)
+    assert store.last_revision() == 1
+    assert CorrectionsStore(path).changed_users_since(0) == ({'u2'}, 1)
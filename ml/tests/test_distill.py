@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+import config
+from backends import get_backend
+from train import distill, load_unlabeled_descriptions, soft_targets
+
+TEXTS = ['АТБ', 'Сільпо', 'Рукавичка АТБ', 'Київстар', 'lifecell', 'Vodafone поповнення',
+         'Uber', 'Bolt таксі', 'Оплата паркування', 'Аптека Доброго Дня', 'APTEKA 16', 'EVA']
+LABELS = [1, 1, 1, 11, 11, 11, 10, 10, 10, 13, 13, 13]
+
+
+class LogitTeacher:
+    """Teacher exposing logits like BertTextModel: confident on its own label, unsure otherwise."""
+    classes_ = np.array([1, 10, 11, 13])
+
+    def __init__(self, table):
+        self.table = table
+
+    def logits(self, texts):
+        out = np.zeros((len(texts), len(self.classes_)))
+        for i, text in enumerate(texts):
+            label = self.table.get(text)
+            if label is not None:
+                out[i, list(self.classes_).index(label)] = 4.0
+        return out
+
+    def predict(self, texts):
+        return self.classes_[self.logits(texts).argmax(axis=1)]
+
+
+def test_soft_targets_use_logits_and_temperature():
+    teacher = LogitTeacher({'АТБ': 1})
+
+    sharp = soft_targets(teacher, ['АТБ', 'невідомо'], temperature=1.0)
+    flat = soft_targets(teacher, ['АТБ'], temperature=4.0)
+
+    np.testing.assert_allclose(sharp.sum(axis=1), 1.0)
+    assert sharp[0, 0] > flat[0, 0] > 0.25
+    np.testing.assert_allclose(sharp[1], 0.25)
+
+
+def test_one_hot_soft_labels_match_hard_label_training():
+    backend = get_backend('LINEAR')
+    classes = np.array(sorted(set(LABELS)))
+    one_hot = (np.asarray(LABELS)[:, None] == classes[None, :]).astype(float)
+
+    soft = backend.fit_soft(TEXTS, one_hot, classes)
+    hard = backend.fit(TEXTS, LABELS)
+
+    assert list(soft.predict(TEXTS)) == list(hard.predict(TEXTS))
+    np.testing.assert_allclose(soft.predict_proba(TEXTS), hard.predict_proba(TEXTS), atol=1e-6)
+
+
+def test_rf_student_follows_the_teacher_and_stays_compiled():
+    teacher = LogitTeacher(dict(zip(TEXTS, LABELS)) | {'EVA': 1})
+    backend = get_backend('RF')
+    targets = soft_targets(teacher, TEXTS, temperature=2.0)
+
+    student = backend.fit_soft(TEXTS, targets, teacher.classes_, n_jobs=1)
+
+    assert student.predict(['EVA'])[0] == 1
+    np.testing.assert_allclose(student.predict_proba(TEXTS), student.pipeline.predict_proba(TEXTS), atol=1e-12)
+
+
+def test_distill_reports_and_saves_the_served_student(tmp_path, monkeypatch):
+    rows = pd.DataFrame({'text_features': TEXTS * 5, 'labels': LABELS * 5})
+    rows['text_features'] = [f'{t} {i // len(TEXTS)}' for i, t in enumerate(rows['text_features'])]
+    path = str(tmp_path / 'student.joblib')
+    monkeypatch.setattr(config, 'LINEAR_MODEL_PATH', path)
+
+    report = distill(rows, teacher_name='RF', student_name='LINEAR', unlabeled=['Uber таксі'], single_calls=5)
+
+    assert set(report) == {'вчитель RF', 'студент LINEAR', 'LINEAR без вчителя'}
+    assert all(0 <= r['teacher_agreement'] <= 1 and r['single_p50_ms'] > 0 for r in report.values())
+    served = get_backend('LINEAR').load(path)
+    assert served.predict(['Київстар 0'])[0] == 11
+
+
+def test_unlabeled_descriptions_from_csv_or_text(tmp_path):
+    csv_path = tmp_path / 'unlabeled.csv'
+    csv_path.write_text('user_id,description\nu1,АТБ\nu2, АТБ \nu3,\nu4,Uber\n', encoding='utf-8')
+    txt_path = tmp_path / 'unlabeled.txt'
+    txt_path.write_text('Сільпо\n\nСільпо\nEVA\n', encoding='utf-8')
+
+    assert load_unlabeled_descriptions(str(csv_path)) == ['АТБ', 'Uber']
+    assert load_unlabeled_descriptions(str(txt_path)) == ['Сільпо', 'EVA']
@@ -0,0 +1,141 @@
+import copy
+import os
+
+import joblib
+import numpy as np
+from fastapi.testclient import TestClient
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+
+import api
+import config
+from backends import load_model_artifact
+from featurizer import ClassifierArtifact, FeatureMemo, FeaturizerRegistry, featurizer_version
+from global_corpus import GlobalCorpusProvider
+from model_cache import ModelCache
+from overlay import CorrectionOverlay, OverlayModel
+from snapshot_state import SnapshotDict
+
+TEXTS = ['АТБ', 'Сільпо', 'Київстар', 'lifecell', 'Uber таксі', 'Bolt таксі']
+LABELS = [1, 1, 11, 11, 10, 10]
+CSV = 'text_features,amount,mcc,hour,category_id\n' + ''.join(
+    f'{t},-10,0,12,{c}\n' for t, c in zip(TEXTS, LABELS))
+
+
+def _pipeline():
+    pipeline = Pipeline([('tfidf', TfidfVectorizer()), ('model', LogisticRegression(max_iter=200))])
+    return pipeline.fit(TEXTS, LABELS)
+
+
+class CountingVectorizer(TfidfVectorizer):
+    """TF-IDF that counts transform calls."""
+    calls = 0
+
+    def transform(self, raw_documents):
+        self.calls += 1
+        return super().transform(raw_documents)
+
+
+def test_version_depends_on_content_and_registry_shares_one_instance(tmp_path):
+    a = TfidfVectorizer().fit(TEXTS)
+    b = TfidfVectorizer().fit(list(TEXTS))
+    assert featurizer_version(a) == featurizer_version(b)
+    assert featurizer_version(TfidfVectorizer().fit(TEXTS[:3])) != featurizer_version(a)
+    assert featurizer_version(TfidfVectorizer(ngram_range=(1, 2)).fit(TEXTS)) != featurizer_version(a)
+
+    registry = FeaturizerRegistry(str(tmp_path / 'featurizers'))
+    assert registry.intern(a) is a
+    assert registry.intern(b, persist=True) is a
+    assert os.path.exists(registry.path_for(featurizer_version(a)))
+
+    fresh = FeaturizerRegistry(str(tmp_path / 'featurizers'))
+    loaded = fresh.get(featurizer_version(a))
+    assert loaded is not None and loaded.vocabulary_ == a.vocabulary_
+    assert fresh.get(featurizer_version(a)) is loaded
+    assert fresh.get('0' * 16) is None
+
+
+def test_full_retrain_saves_classifier_only_and_shares_global_featurizer(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data.csv').write_text(CSV, encoding='utf-8')
+    monkeypatch.setattr(config, 'PERSONALIZATION_MODE', 'full')
+    monkeypatch.setattr(config, 'PERSONALIZED_MODEL_TYPE', 'LINEAR')
+    monkeypatch.setattr(config, 'DATA_FILE', 'data.csv')
+    monkeypatch.setattr(api, 'global_corpus', GlobalCorpusProvider('data.csv'))
+    monkeypatch.setattr(api, 'featurizers', FeaturizerRegistry(str(tmp_path / 'featurizers')))
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict())
+    monkeypatch.setattr(api, 'user_model_status', {})
+    corpus = api.global_corpus.get()
+    # same vocabulary as the corpus TF-IDF, but a separate instance (as loaded from the model file)
+    global_pipeline = Pipeline([('tfidf', copy.deepcopy(corpus.vectorizer)),
+                                ('model', LogisticRegression(max_iter=200).fit(corpus.X, corpus.labels))])
+    api._intern_global_featurizers(global_pipeline)
+    api.corrections_store.upsert('u1', 'Uber таксі', 10, 9)
+
+    api.retrain_personalized_model('u1')
+
+    artifact = joblib.load('model_user_u1.joblib')
+    assert isinstance(artifact, ClassifierArtifact)
+    assert not hasattr(artifact.classifier, 'vocabulary_')
+    assert artifact.featurizer_version == featurizer_version(global_pipeline[0])
+    trained, _ = api.get_model_for_user('u1')
+    api.personalized_models_cache.clear()
+    model, source = api.get_model_for_user('u1')
+    assert source == 'personalized' and model is not trained
+    assert model[0] is global_pipeline[0]
+    assert list(model.predict(TEXTS)) == list(trained.predict(TEXTS))
+
+
+def test_legacy_full_pipeline_artifact_still_loads(tmp_path):
+    path = str(tmp_path / 'model_user_old.joblib')
+    pipeline = _pipeline()
+    joblib.dump(pipeline, path)
+
+    model = load_model_artifact(path, featurizers=FeaturizerRegistry(str(tmp_path / 'featurizers')))
+
+    assert list(model.predict(TEXTS)) == list(pipeline.predict(TEXTS))
+
+
+def test_classifier_artifact_with_missing_featurizer_falls_back_to_global(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(api, 'featurizers', FeaturizerRegistry(str(tmp_path / 'featurizers')))
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+    monkeypatch.setattr(api, 'global_model', _pipeline())
+    joblib.dump(ClassifierArtifact.from_model(_pipeline()), 'model_user_u1.joblib')
+
+    model, source = api.get_model_for_user('u1')
+
+    assert source == 'global' and model is api.global_model
+
+
+def test_batch_vectorizes_once_for_models_sharing_a_featurizer(monkeypatch):
+    shared = Pipeline([('tfidf', CountingVectorizer()), ('model', LogisticRegression(max_iter=200))])
+    shared.fit(TEXTS, LABELS)
+    counting = shared[0]
+    overlay = OverlayModel(shared, CorrectionOverlay(['Uber таксі'], [9], min_similarity=0.6))
+    monkeypatch.setattr(api, 'global_model', shared)
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict())
+    api.personalized_models_cache.put('u1', overlay, nbytes=1)
+    counting.calls = 0
+
+    client = TestClient(api.app)
+    payload = {'items': [{'user_id': u, 'description': d}
+                         for u in ('u1', 'u2') for d in ('Uber таксі', 'Київстар', 'АТБ')]}
+    results = client.post('/api/v1/categorize-batch', json=payload).json()['results']
+
+    assert [r['category_id'] for r in results] == [9, 11, 1, 10, 11, 1]
+    assert results[0]['source'] == 'personalized' and results[3]['source'] == 'global'
+    assert counting.calls == 1
+
+
+def test_feature_memo_matches_direct_predictions():
+    model = _pipeline()
+    memo = FeatureMemo()
+    memo.register(model, TEXTS)
+    memo.register(model, ['Uber', 'АТБ'])
+
+    assert memo.shares(model)
+    np.testing.assert_array_equal(memo.predict(model, ['Uber', 'Сільпо']), model.predict(['Uber', 'Сільпо']))
@@ -0,0 +1,49 @@
+from global_corpus import GlobalCorpusProvider
+
+CSV = (
+    'text_features,amount,mcc,hour,category_id\n'
+    'АТБ,-67.4,5499,17,1\n'
+    'Київстар,-100,4814,10,11\n'
+    'Uber,-150,4121,22,10\n'
+    'bad row without label,-1,0,0,\n'
+)
+
+
+def test_corpus_is_built_once_and_reused_from_disk(tmp_path):
+    data = tmp_path / 'data.csv'
+    data.write_text(CSV, encoding='utf-8')
+    cache_dir = str(tmp_path / 'cache')
+
+    provider = GlobalCorpusProvider(str(data), cache_dir=cache_dir)
+    corpus = provider.get()
+    assert corpus.n_rows == 3
+    assert list(corpus.labels) == [1, 11, 10]
+    assert provider.get() is corpus and provider.builds == 1
+
+    other = GlobalCorpusProvider(str(data), cache_dir=cache_dir)
+    cached = other.get()
+    assert other.builds == 0 and other.disk_loads == 1
+    assert (cached.X != corpus.X).nnz == 0
+
+
+def test_extra_rows_are_stacked_onto_cached_matrix(tmp_path):
+    data = tmp_path / 'data.csv'
+    data.write_text(CSV, encoding='utf-8')
+    corpus = GlobalCorpusProvider(str(data)).get()
+
+    X, y = corpus.with_extra_rows(['АТБ 1234'], [6])
+    assert X.shape == (4, corpus.X.shape[1])
+    assert list(y) == [1, 11, 10, 6]
+    assert corpus.n_rows == 3
+
+
+def test_changed_csv_is_rebuilt(tmp_path):
+    data = tmp_path / 'data.csv'
+    data.write_text(CSV, encoding='utf-8')
+    provider = GlobalCorpusProvider(str(data), cache_dir=str(tmp_path / 'cache'))
+    first = provider.get()
+
+    data.write_text(CSV + 'Сільпо,-20,5411,12,1\n', encoding='utf-8')
+    second = provider.get()
+    assert second is not first
+    assert second.n_rows == 4 and second.content_hash != first.content_hash
@@ -0,0 +1,78 @@
+from fastapi.testclient import TestClient
+
+import api
+import load_test
+from backends import get_backend
+from model_cache import ModelCache
+from snapshot_state import SnapshotDict
+
+TRANSACTIONS = [
+    {'description': 'АТБ', 'mcc': 5411, 'category_id': 1},
+    {'description': 'Київстар', 'mcc': None, 'category_id': 11},
+    {'description': 'Uber', 'mcc': None, 'category_id': 10},
+]
+
+
+def test_corrections_use_known_categories():
+    workload = load_test.Workload(TRANSACTIONS)
+    corrected = [workload.correction_payload('u1', txn)['corrected_category_id'] for txn in TRANSACTIONS]
+    assert corrected == [10, 1, 11]
+
+
+class _Client:
+    """TestClient with the harness client interface (no temp workdir, state patched by the test)."""
+    target = 'test'
+
+    def __init__(self):
+        self.client = TestClient(api.app)
+
+    def post(self, path, payload):
+        resp = self.client.post(path, json=payload)
+        return resp.status_code, resp.json()
+
+    def get(self, path):
+        resp = self.client.get(path)
+        return resp.status_code, resp.json()
+
+    def reset_caches(self):
+        return False
+
+
+def test_percentile_interpolates():
+    values = list(range(1, 101))
+    assert load_test.percentile(values, 50) == 50.5
+    assert load_test.percentile(values, 100) == 100
+    assert load_test.percentile([], 99) is None
+
+
+def test_compare_flags_latency_and_throughput_regressions():
+    base = {'kinds': {'categorize': {'throughput_rps': 100.0,
+                                     'latency_ms': {'p50': 1.0, 'p95': 2.0, 'p99': 4.0}}}}
+    same = {'kinds': {'categorize': {'throughput_rps': 95.0,
+                                     'latency_ms': {'p50': 1.05, 'p95': 2.1, 'p99': 4.2}}}}
+    worse = {'kinds': {'categorize': {'throughput_rps': 50.0,
+                                      'latency_ms': {'p50': 1.0, 'p95': 3.0, 'p99': 4.0}}}}
+    assert load_test.compare(same, base, tolerance=0.1) == []
+    regressions = load_test.compare(worse, base, tolerance=0.1)
+    assert len(regressions) == 2
+    assert regressions[0].startswith('categorize p95')
+
+
+def test_scenarios_run_in_process(monkeypatch):
+    backend = get_backend('LINEAR')
+    model = backend.fit([t['description'] for t in TRANSACTIONS], [t['category_id'] for t in TRANSACTIONS])
+    monkeypatch.setattr(api, 'global_model', model)
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict())
+    monkeypatch.setattr(api, 'mcc_rules', {5411: 1})
+
+    client = _Client()
+    closed = load_test.run_scenario(client, 'global_mix', TRANSACTIONS, users=5, requests=30, concurrency=3)
+    assert closed['requests'] == 30 and closed['errors'] == 0
+    assert closed['kinds']['categorize']['latency_ms']['p99'] is not None
+    assert set(closed['sources']) <= {'global', 'mcc_rule'}
+
+    opened = load_test.run_scenario(client, 'batch', TRANSACTIONS, users=5, requests=4, rate=200.0, batch_size=10)
+    assert opened['arrival']['mode'] == 'open'
+    assert opened['kinds']['batch']['requests'] == 4
+    assert sum(opened['sources'].values()) == 40
@@ -0,0 +1,28 @@
+import os
+
+import pytest
+
+import logging_setup
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='fork is POSIX-only')
+def test_forked_child_still_writes_log_records(tmp_path):
+    logger = logging_setup.configure_logging('INFO').getChild('test')
+    path = tmp_path / 'child.log'
+
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover - runs in the child
+        code = 1
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                logging_setup._listener.handlers[0].setStream(f)
+                logger.warning('written by the child')
+                logging_setup._listener.stop()  # drains the queue
+            code = 0
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert 'written by the child' in path.read_text(encoding='utf-8')
+    assert logging_setup._listener._thread is not None  # the parent's listener keeps running
@@ -0,0 +1,41 @@
+import pandas as pd
+
+import api
+from model_cache import ModelCache
+from snapshot_state import SnapshotDict
+from train import derive_mcc_rules
+
+
+class FailingModel:
+    def predict(self, texts):
+        raise AssertionError('model must not be called for MCC rule hits')
+
+
+def test_derive_rules_keeps_only_pure_supported_codes():
+    df = pd.DataFrame({
+        'text_features': ['a'] * 8,
+        'mcc': [5411, 5411, 5411, 5999, 5999, 5999, 0, 4111],
+        'labels': [1, 1, 1, 0, 6, 0, 0, 10],
+    })
+    rules = derive_mcc_rules(df, min_support=3, min_purity=0.9)
+    assert rules == {5411: {'category_id': 1, 'purity': 1.0, 'support': 3}}
+
+
+def test_mcc_rule_answers_before_the_model(monkeypatch):
+    monkeypatch.setattr(api, 'mcc_rules', {5411: 1})
+    monkeypatch.setattr(api, 'global_model', FailingModel())
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict({'u1': {'магазин уні': 16}}))
+
+    result = api.categorize_transaction(api.TransactionInput(description='Сільпо', user_id='u1', mcc=5411, amount=-120.5))
+    assert (result['category_id'], result['source']) == (1, 'mcc_rule')
+
+    # user corrections still win over MCC rules
+    result = api.categorize_transaction(api.TransactionInput(description='Магазин УНІ', user_id='u1', mcc=5411))
+    assert (result['category_id'], result['source']) == (16, 'override')
+
+    batch = api.categorize_batch(api.BatchCategorizationInput(items=[
+        {'user_id': 'u2', 'description': 'Сільпо', 'mcc': 5411},
+    ]))
+    assert batch['results'][0]['source'] == 'mcc_rule'
+    assert batch['timings']['mcc_rules'] == 1
@@ -0,0 +1,32 @@
+import api
+from merchant_index import OverrideIndex, canonicalize_merchant
+from snapshot_state import SnapshotDict
+
+
+def test_canonicalize_strips_noise():
+    assert canonicalize_merchant('Скасування. АТБ') == canonicalize_merchant('АТБ')
+    assert canonicalize_merchant('АТБ 1234') == canonicalize_merchant('атб')
+    assert canonicalize_merchant('URBAN COFFEE-4') == 'urban coffee'
+    assert canonicalize_merchant('545708****0522') == ''
+    # Latin look-alikes typed instead of Cyrillic letters
+    assert canonicalize_merchant('AТБ') == canonicalize_merchant('АТБ')
+
+
+def test_index_reports_matching_rule():
+    index = OverrideIndex({'атб': 1, 'magazyn monako': 5}, threshold=0.75)
+    assert index.lookup('АТБ').rule == 'exact'
+    match = index.lookup('Скасування. АТБ 17')
+    assert (match.category_id, match.rule) == (1, 'canonical')
+    match = index.lookup('Magazyn Monaco')
+    assert (match.category_id, match.rule) == (5, 'fuzzy') and match.score >= 0.75
+    assert index.lookup('Сільпо') is None
+
+
+def test_categorize_uses_fuzzy_override(monkeypatch):
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict({'u1': {'magazyn monako': 5}}))
+    monkeypatch.setattr(api, 'user_override_indexes', {})
+    monkeypatch.setattr(api, 'global_model', None)
+
+    result = api.categorize_transaction(api.TransactionInput(description='MAGAZYN MONAKO #12', user_id='u1'))
+    assert result['category_id'] == 5
+    assert result['override_rule'] == 'canonical'
@@ -0,0 +1,62 @@
+from fastapi.testclient import TestClient
+
+import api
+from backends import get_backend
+from metrics import CallbackGauge, Counter, Histogram, Registry
+from model_cache import ModelCache
+from snapshot_state import SnapshotDict
+
+TEXTS = ['АТБ', 'Сільпо', 'Київстар', 'lifecell', 'Uber', 'Bolt таксі']
+LABELS = [1, 1, 11, 11, 10, 10]
+
+
+def test_text_exposition_format():
+    registry = Registry()
+    hist = Histogram('t_latency_seconds', 'latency', ['path'], buckets=(0.01, 0.1), registry=registry)
+    errors = Counter('t_errors_total', 'errors', ['stage'], registry=registry)
+    CallbackGauge('t_queue', 'queue', lambda: 3, registry=registry)
+    hist.labels('global').observe(0.005)
+    hist.labels('global').observe(0.05)
+    hist.labels('global').observe(5)
+    errors.labels(stage='predict').inc()
+
+    text = registry.render()
+    assert '# TYPE t_latency_seconds histogram' in text
+    assert 't_latency_seconds_bucket{path="global",le="0.01"} 1' in text
+    assert 't_latency_seconds_bucket{path="global",le="0.1"} 2' in text
+    assert 't_latency_seconds_bucket{path="global",le="+Inf"} 3' in text
+    assert 't_latency_seconds_count{path="global"} 3' in text
+    assert 't_errors_total{stage="predict"} 1.0' in text
+    assert 't_queue 3' in text
+
+
+def _path_count(text, path):
+    prefix = f'ml_categorize_duration_seconds_count{{path="{path}"}} '
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return int(line[len(prefix):])
+    return 0
+
+
+def test_categorize_records_resolution_path(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    backend = get_backend('LINEAR')
+    model = backend.fit(TEXTS, LABELS)
+    backend.save(model, 'model_user_u2.joblib')
+    monkeypatch.setattr(api, 'global_model', model)
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+    monkeypatch.setattr(api, 'personalized_model_mtimes', {})
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict({'u1': {'київстар': 9}, 'u2': {}, 'u3': {}}))
+
+    client = TestClient(api.app)
+    before = client.get('/metrics').text
+    for uid in ('u1', 'u2', 'u2', 'u3'):
+        assert client.post('/api/v1/categorize', json={'description': 'Київстар', 'user_id': uid}).status_code == 200
+
+    resp = client.get('/metrics')
+    assert resp.headers['content-type'].startswith('text/plain')
+    after = resp.text
+    for path in ('override_exact', 'personalized_disk', 'personalized_cache', 'global'):
+        assert _path_count(after, path) == _path_count(before, path) + 1, path
+    assert 'ml_personalized_cache_entries 1' in after
+    assert 'ml_retrain_queue_depth 0' in after
@@ -0,0 +1,147 @@
+import threading
+import time
+
+import api
+import config
+from micro_batcher import MicroBatcher, _KeyState
+from model_cache import ModelCache
+from prediction_cache import PredictionCache
+
+
+class EchoModel:
+    """Returns len(text) for every text and records each predict call."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def predict(self, texts):
+        self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError('boom')
+        return [len(t) for t in texts]
+
+
+def _busy(batcher, key):
+    """Marks key as high-rate, so the leader waits for the batch to fill."""
+    state = batcher._keys[key] = _KeyState()
+    state.interarrival = 0.0
+    state.last_arrival = time.perf_counter()
+
+
+def _run_concurrently(fn, args_list):
+    results = [None] * len(args_list)
+    errors = [None] * len(args_list)
+
+    def worker(i, args):
+        try:
+            results[i] = fn(*args)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i, a)) for i, a in enumerate(args_list)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    return results, errors
+
+
+def test_concurrent_callers_share_one_predict():
+    batcher = MicroBatcher(max_batch_size=8, max_wait_seconds=1.0)
+    _busy(batcher, 'm')
+    model = EchoModel()
+    texts = ['a' * (i + 1) for i in range(8)]
+
+    results, errors = _run_concurrently(lambda t: batcher.predict('m', model, t), [(t,) for t in texts])
+
+    assert errors == [None] * 8
+    assert results == [len(t) for t in texts]
+    assert len(model.calls) == 1 and sorted(model.calls[0]) == sorted(texts)
+    assert batcher.stats()['avg_batch_size'] == 8
+
+
+def test_low_rate_does_not_wait():
+    flushes = []
+    batcher = MicroBatcher(max_batch_size=32, max_wait_seconds=0.5,
+                           on_flush=lambda size, waited: flushes.append((size, waited)))
+    model = EchoModel()
+    for text in ['АТБ', 'Сільпо']:
+        assert batcher.predict('m', model, text) == len(text)
+        time.sleep(0.6)
+
+    assert [size for size, _ in flushes] == [1, 1]
+    assert all(waited < 0.1 for _, waited in flushes)
+
+
+def test_requests_during_running_predict_form_next_batch():
+    started, release = threading.Event(), threading.Event()
+
+    class SlowModel(EchoModel):
+        def predict(self, texts):
+            started.set()
+            release.wait(5)
+            return super().predict(texts)
+
+    model = SlowModel()
+    batcher = MicroBatcher(max_batch_size=32, max_wait_seconds=0.0)
+    first = threading.Thread(target=batcher.predict, args=('m', model, 'a'))
+    first.start()
+    started.wait(5)
+    # поки перший predict виконується, решта запитів чекає в наступному батчі
+    threading.Timer(0.2, release.set).start()
+    results, errors = _run_concurrently(lambda t: batcher.predict('m', model, t), [('bb',), ('ccc',), ('dddd',)])
+    first.join(5)
+
+    assert errors == [None] * 3 and results == [2, 3, 4]
+    assert model.calls[0] == ['a'] and sorted(model.calls[1]) == ['bb', 'ccc', 'dddd']
+
+
+def test_error_propagates_to_every_caller():
+    model = EchoModel(fail=True)
+    batcher = MicroBatcher(max_batch_size=3, max_wait_seconds=1.0)
+    _busy(batcher, 'm')
+
+    _, errors = _run_concurrently(lambda t: batcher.predict('m', model, t), [('a',), ('b',), ('c',)])
+
+    assert len(model.calls) == 1
+    assert all(isinstance(e, RuntimeError) for e in errors)
+
+
+def test_reloaded_model_under_same_key_starts_new_batch():
+    batcher = MicroBatcher(max_batch_size=4, max_wait_seconds=1.0)
+    old, new = EchoModel(), EchoModel()
+    _busy(batcher, 'm')
+
+    results, errors = _run_concurrently(lambda m, t: batcher.predict('m', m, t), [(old, 'aa'), (new, 'bbb')])
+
+    assert errors == [None, None]
+    assert results == [2, 3]
+    assert old.calls == [['aa']] and new.calls == [['bbb']]
+
+
+def test_single_categorize_goes_through_batcher(monkeypatch):
+    model = EchoModel()
+    batcher = MicroBatcher(max_batch_size=4, max_wait_seconds=0.0)
+    monkeypatch.setattr(config, 'MICRO_BATCHING_ENABLED', True)
+    monkeypatch.setattr(api, 'micro_batcher', batcher)
+    monkeypatch.setattr(api, 'prediction_cache', PredictionCache(max_entries=100))
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+
+    assert api.predict_categories(model, 'global', ['Київстар']) == [8]
+    assert api.predict_categories(model, 'global', ['Київстар']) == [8]
+    # батчі (/categorize-batch) прогнозуються напряму
+    assert api.predict_categories(model, 'global', ['Київстар', 'Uber']) == [8, 4]
+    assert batcher.stats()['flushes'] == 1
+    assert model.calls == [['Київстар'], ['Uber']]
+
+
+def test_disabled_uses_direct_predict(monkeypatch):
+    model = EchoModel()
+    batcher = MicroBatcher()
+    monkeypatch.setattr(config, 'MICRO_BATCHING_ENABLED', False)
+    monkeypatch.setattr(api, 'micro_batcher', batcher)
+    monkeypatch.setattr(api, 'prediction_cache', PredictionCache(max_entries=100))
+
+    assert api.predict_categories(model, 'global', ['АТБ']) == [3]
+    assert batcher.stats()['flushes'] == 0
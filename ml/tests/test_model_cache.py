@@ -0,0 +1,76 @@
+import threading
+import time
+
+from model_cache import ModelCache
+
+
+def test_lru_eviction_by_entry_count():
+    cache = ModelCache(max_entries=2, size_fn=None)
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    assert cache.get('a') == 'A'  # 'a' becomes most recently used
+    cache.put('c', 'C')
+    assert 'b' not in cache
+    assert cache.get('a') == 'A' and cache.get('c') == 'C'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_eviction_by_bytes():
+    cache = ModelCache(max_bytes=100)
+    cache.put('a', 'A', nbytes=60)
+    cache.put('b', 'B', nbytes=60)
+    assert 'a' not in cache and 'b' in cache
+    assert cache.stats()['estimated_bytes'] == 60
+
+
+def test_ttl_expiry():
+    cache = ModelCache(ttl_seconds=0.01, size_fn=None)
+    cache.put('a', 'A')
+    time.sleep(0.02)
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_get_or_load_is_single_flight():
+    cache = ModelCache(size_fn=None)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'model', 10
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('u', loader))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == ['model'] * 8
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert stats['loads'] == 1 and stats['estimated_bytes'] == 10
+
+
+def test_loader_returning_none_is_not_cached():
+    cache = ModelCache(size_fn=None)
+    assert cache.get_or_load('u', lambda: None) is None
+    assert len(cache) == 0
+
+
+def test_loaded_model_is_published_before_the_load_lock_is_released():
+    cache = ModelCache(size_fn=None)
+    locks_during_put = []
+    put = cache.put
+
+    def recording_put(key, value, nbytes=None):
+        # a caller arriving now must still wait on the load lock, not start a second load
+        locks_during_put.append(key in cache._load_locks)
+        put(key, value, nbytes=nbytes)
+
+    cache.put = recording_put
+    assert cache.get_or_load('u', lambda: 'model') == 'model'
+
+    assert locks_during_put == [True]
+    assert cache._load_locks == {} and cache.get('u') == 'model'
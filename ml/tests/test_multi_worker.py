@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+import api
+import config
+from backends import atomic_joblib_dump, get_backend
+from corrections_store import CorrectionsStore
+from model_cache import ModelCache
+from snapshot_state import SnapshotDict
+
+TEXTS = ['АТБ', 'Сільпо', 'Київстар', 'lifecell', 'Uber', 'Bolt таксі']
+LABELS = [1, 1, 11, 11, 10, 10]
+
+
+def test_data_version_sees_writes_from_another_connection(tmp_path):
+    path = str(tmp_path / 'c.sqlite3')
+    worker_a = CorrectionsStore(path)
+    worker_b = CorrectionsStore(path)
+    before = worker_a.data_version()
+    worker_b.upsert('u1', 'АТБ', 0, 6)
+    assert worker_a.data_version() != before
+    assert worker_a.get_user_overrides('u1') == {'атб': 6}
+
+
+def test_changed_users_since_skips_own_writes(tmp_path):
+    path = str(tmp_path / 'c.sqlite3')
+    worker_a = CorrectionsStore(path)
+    worker_b = CorrectionsStore(path)
+    mark = worker_a.last_revision()
+    worker_a.upsert('u1', 'АТБ', 0, 1)
+    worker_b.upsert('u2', 'АТБ', 0, 6)
+    worker_b.upsert('u3', 'АТБ', 0, 6)
+    worker_a.upsert('u3', 'Сільпо', 0, 1)
+
+    users, mark = worker_a.changed_users_since(mark)
+    assert users == {'u2', 'u3'}
+    assert mark == worker_a.last_revision() == 4
+    assert worker_a.changed_users_since(mark) == (set(), 4)
+    # власний перезапис чужого рядка більше не вважається чужою зміною
+    worker_b.upsert('u1', 'АТБ', 0, 2)
+    worker_a.upsert('u1', 'АТБ', 0, 3)
+    assert worker_a.changed_users_since(mark) == (set(), 6)
+
+
+def test_corrections_map_resyncs_after_foreign_write(corrections_store, monkeypatch):
+    monkeypatch.setattr(config, 'CROSS_WORKER_SYNC_INTERVAL_SECONDS', 0.0)
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict())
+    monkeypatch.setattr(api, '_cross_worker_sync', {'checked_at': 0.0, 'data_version': None, 'revision': None})
+    assert api.get_user_corrections_map('u1') == {}
+    untouched = api.get_user_corrections_map('u2')
+
+    # інший воркер пише у ту саму базу через власне з'єднання
+    CorrectionsStore(corrections_store.path, normalize=api.normalize_description).upsert('u1', 'АТБ', 0, 6)
+    assert api.get_user_corrections_map('u1') == {'атб': 6}
+    # скидається лише змінений користувач
+    assert api.get_user_corrections_map('u2') is untouched
+
+
+def test_own_corrections_do_not_reset_the_cached_map(corrections_store, monkeypatch):
+    monkeypatch.setattr(config, 'CROSS_WORKER_SYNC_INTERVAL_SECONDS', 0.0)
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict())
+    monkeypatch.setattr(api, 'user_override_indexes', SnapshotDict())
+    monkeypatch.setattr(api, '_cross_worker_sync', {'checked_at': 0.0, 'data_version': None, 'revision': None})
+    api.get_user_corrections_map('u1')
+    api.save_correction(api.CorrectionInput(user_id='u1', description='АТБ', corrected_category_id=6))
+    loaded = api.get_user_corrections_map('u1')
+
+    def no_store_reads(user_id):
+        raise AssertionError('own writes must not invalidate the cached map')
+
+    monkeypatch.setattr(corrections_store, 'get_user_overrides', no_store_reads)
+    # запис з іншого потоку того самого процесу теж змінює data_version
+    worker_thread = threading.Thread(target=api.save_correction,
+                                     args=(api.CorrectionInput(user_id='u1', description='Сільпо', corrected_category_id=1),))
+    worker_thread.start()
+    worker_thread.join()
+
+    assert loaded == {'атб': 6}
+    assert api.get_user_corrections_map('u1') == {'атб': 6, 'сільпо': 1}
+
+
+def test_personalized_model_reloaded_when_file_replaced(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+    monkeypatch.setattr(api, 'personalized_model_mtimes', {})
+    backend = get_backend('LINEAR')
+    backend.save(backend.fit(TEXTS, LABELS), 'model_user_u1.joblib')
+    first, source = api.get_model_for_user('u1')
+    assert source == 'personalized'
+
+    # донавчання в іншому воркері атомарно підміняє файл
+    backend.save(backend.fit(TEXTS, [13, 13, 13, 13, 2, 2]), 'model_user_u1.joblib')
+    st = os.stat('model_user_u1.joblib')
+    os.utime('model_user_u1.joblib', ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    second, _ = api.get_model_for_user('u1')
+    assert second is not first
+    assert list(second.predict(['АТБ'])) == [13]
+
+
+def test_prediction_cache_dropped_when_evicted_model_is_replaced(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+    monkeypatch.setattr(api, 'personalized_model_mtimes', {})
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict())
+    backend = get_backend('LINEAR')
+    backend.save(backend.fit(TEXTS, LABELS), 'model_user_u1.joblib')
+    categorize = lambda: api.categorize_transaction(api.TransactionInput(description='АТБ', user_id='u1'))
+    assert categorize()['category_id'] == 1
+
+    # модель витіснено з LRU, після чого інший воркер її перенавчив
+    api.personalized_models_cache.pop('u1')
+    backend.save(backend.fit(TEXTS, [13, 13, 13, 13, 2, 2]), 'model_user_u1.joblib')
+    st = os.stat('model_user_u1.joblib')
+    os.utime('model_user_u1.joblib', ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+    assert categorize()['category_id'] == 13
+
+
+def test_model_status_merges_with_other_workers(tmp_path, monkeypatch):
+    path = tmp_path / 'user_model_status.json'
+    monkeypatch.setattr(api, 'MODEL_STATUS_FILE', str(path))
+    # інший воркер уже записав u2 і новіший час для u1
+    path.write_text(json.dumps({'u1': '2026-01-02T00:00:00', 'u2': '2026-01-01T00:00:00'}), encoding='utf-8')
+    monkeypatch.setattr(api, 'user_model_status', SnapshotDict({'u1': '2026-01-01T00:00:00',
+                                                                 'u3': '2026-01-03T00:00:00'}))
+
+    api.save_model_status()
+
+    expected = {'u1': '2026-01-02T00:00:00', 'u2': '2026-01-01T00:00:00', 'u3': '2026-01-03T00:00:00'}
+    assert json.loads(path.read_text(encoding='utf-8')) == expected
+    assert dict(api.user_model_status.items()) == expected
+    assert sorted(os.listdir(tmp_path)) == ['user_model_status.json', 'user_model_status.json.lock']
+
+
+def test_atomic_dump_and_mmap_load(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'MODEL_MMAP', True)
+    backend = get_backend('LINEAR')
+    path = str(tmp_path / 'linear.joblib')
+    backend.save(backend.fit(TEXTS, LABELS), path)
+    assert os.listdir(tmp_path) == ['linear.joblib']
+
+    loaded = backend.load(path)
+    assert isinstance(loaded.classifier.coef_, np.memmap)
+    assert list(loaded.predict(TEXTS)) == LABELS
+
+    atomic_joblib_dump({'a': 1}, path)
+    assert os.listdir(tmp_path) == ['linear.joblib']
@@ -0,0 +1,90 @@
+import os
+
+import joblib
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.pipeline import Pipeline
+
+import api
+import config
+from model_cache import ModelCache
+from overlay import CorrectionOverlay, OverlayModel
+from snapshot_state import SnapshotDict
+
+
+def _global_pipeline():
+    pipeline = Pipeline([
+        ('tfidf', TfidfVectorizer()),
+        ('model', RandomForestClassifier(n_estimators=10, random_state=42)),
+    ])
+    pipeline.fit(['АТБ', 'Сільпо', 'Київстар', 'lifecell', 'Uber таксі', 'Bolt таксі', 'Аптека Доброго Дня'],
+                 [1, 1, 11, 11, 10, 10, 13])
+    return pipeline
+
+
+def test_overlay_wins_only_when_confident():
+    base = _global_pipeline()
+    overlay = CorrectionOverlay(['Uber таксі'], [9], min_similarity=0.6)
+    model = OverlayModel(base, overlay)
+
+    preds = model.predict(['Uber таксі', 'uber  ТАКСІ', 'Київстар', 'Bolt таксі'])
+    assert list(preds[:2]) == [9, 9]
+    assert preds[2] == 11
+    # 'Bolt таксі' shares only one token with the correction -> below threshold
+    assert preds[3] == 10
+
+
+def test_overlay_artifact_does_not_carry_features(tmp_path):
+    overlay = CorrectionOverlay(['Uber таксі'], [9], min_similarity=0.6)
+    OverlayModel(_global_pipeline(), overlay)
+    path = tmp_path / 'overlay.joblib'
+    joblib.dump(overlay, path)
+    restored = joblib.load(path)
+    assert restored._matrix is None and restored.texts == ['Uber таксі']
+    assert os.path.getsize(path) < 4096
+
+
+def test_retrain_in_overlay_mode(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, 'PERSONALIZATION_MODE', 'overlay')
+    monkeypatch.setattr(api, 'global_model', _global_pipeline())
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict())
+    monkeypatch.setattr(api, 'user_model_status', {})
+    (tmp_path / api.CORRECTIONS_FILE).write_text(
+        'user_id,description,original_category_id,corrected_category_id\n'
+        'u1,Uber таксі,10,9\n'
+        'u2,АТБ,1,6\n',
+        encoding='utf-8'
+    )
+    api.load_user_corrections()  # one-time CSV -> store migration
+
+    api.retrain_personalized_model('u1')
+
+    assert isinstance(joblib.load('model_user_u1.joblib'), CorrectionOverlay)
+    model, source = api.get_model_for_user('u1')
+    assert source == 'personalized'
+    assert list(model.predict(['Uber таксі', 'АТБ'])) == [9, 1]
+    assert 'u1' in api.user_model_status
+
+
+def test_correction_by_name_is_learned_by_retrain(tmp_path, monkeypatch):
+    # the scenario of the manual test_retrain.py script, isolated in tmp_path
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, 'PERSONALIZATION_MODE', 'overlay')
+    monkeypatch.setattr(api, 'global_model', _global_pipeline())
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict())
+    monkeypatch.setattr(api, 'user_override_indexes', {})
+    monkeypatch.setattr(api, 'user_model_status', {})
+    monkeypatch.setattr(api, 'MODEL_STATUS_FILE', str(tmp_path / 'user_model_status.json'))
+
+    api.save_correction(api.CorrectionInput(
+        user_id='u1', description='Bolt таксі', original_category_id=10,
+        original_category_name='Транспорт', corrected_category_name='Кафе'))
+    api.retrain_personalized_model('u1')
+
+    assert os.path.exists('model_user_u1.joblib') and os.path.exists(api.MODEL_STATUS_FILE)
+    model, source = api.get_model_for_user('u1')
+    assert source == 'personalized'
+    assert list(model.predict(['Bolt таксі', 'Uber таксі'])) == [2, 10]
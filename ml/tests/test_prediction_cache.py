@@ -0,0 +1,90 @@
+import api
+from model_cache import ModelCache
+from prediction_cache import GLOBAL_MODEL_KEY, PredictionCache
+from snapshot_state import SnapshotDict
+
+
+class FixedModel:
+    def __init__(self, label):
+        self.label = label
+        self.calls = 0
+
+    def predict(self, texts):
+        self.calls += 1
+        return [self.label] * len(texts)
+
+
+def test_versioned_invalidation():
+    cache = PredictionCache(max_entries=10)
+    g = cache.key_for(GLOBAL_MODEL_KEY, 'атб')
+    u = cache.key_for('user:u1', 'атб')
+    cache.put(g, 1)
+    cache.put(u, 6)
+
+    cache.invalidate_model('user:u1')
+    assert cache.get(cache.key_for('user:u1', 'атб')) is None
+    assert cache.get(cache.key_for(GLOBAL_MODEL_KEY, 'атб')) == 1
+
+    cache.invalidate_all()
+    assert cache.get(cache.key_for(GLOBAL_MODEL_KEY, 'атб')) is None
+    assert len(cache) == 0
+
+
+def test_invalidation_leaves_stale_entries_to_the_lru():
+    cache = PredictionCache(max_entries=3)
+    cache.put(cache.key_for('user:u1', 'атб'), 6)
+    cache.put(cache.key_for('user:u2', 'атб'), 7)
+
+    cache.invalidate_model('user:u1')
+    assert len(cache) == 2  # no scan: the stale entry stays until the LRU evicts it
+    assert cache.get(cache.key_for('user:u1', 'атб')) is None
+    for desc in ['a', 'b', 'c']:
+        cache.put(cache.key_for(GLOBAL_MODEL_KEY, desc), 1)
+    assert len(cache) == 3 and cache.get(cache.key_for('user:u2', 'атб')) is None
+
+
+def test_model_versions_are_bounded_and_never_reused():
+    cache = PredictionCache(max_entries=3)
+    cache.put(cache.key_for('user:u1', 'атб'), 1)
+    cache.invalidate_model('user:u1')
+    cache.put(cache.key_for('user:u1', 'атб'), 2)
+    cache.invalidate_model('user:u1')
+    untouched = cache.key_for('user:u9', 'атб')
+    cache.put(untouched, 9)
+    for user in ['u2', 'u3', 'u4']:
+        cache.invalidate_model(f'user:{user}')
+
+    assert cache.stats()['tracked_models'] == 3
+    # u1's version record is gone, but neither of its stale results can be hit
+    assert cache.get(cache.key_for('user:u1', 'атб')) is None
+    assert cache.key_for('user:u9', 'атб') != untouched  # a miss, never a stale hit
+
+    cache.invalidate_all()
+    assert cache.stats()['tracked_models'] == 0
+
+
+def test_lru_bound_and_hit_ratio():
+    cache = PredictionCache(max_entries=2)
+    for desc in ['a', 'b', 'c']:
+        cache.put(cache.key_for(GLOBAL_MODEL_KEY, desc), 1)
+    assert cache.get(cache.key_for(GLOBAL_MODEL_KEY, 'a')) is None
+    assert cache.get(cache.key_for(GLOBAL_MODEL_KEY, 'c')) == 1
+    assert cache.stats()['hit_ratio'] == 0.5
+
+
+def test_repeated_merchants_skip_the_model(monkeypatch):
+    model = FixedModel(11)
+    monkeypatch.setattr(api, 'global_model', model)
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict())
+
+    for user in ['u1', 'u2', 'u3']:
+        result = api.categorize_transaction(api.TransactionInput(description=' Київстар ', user_id=user))
+        assert result['category_id'] == 11
+    assert model.calls == 1
+    assert api.prediction_cache.stats()['hits'] == 2
+
+    # a retrained personalized model is never shadowed by cached global results
+    api.personalized_models_cache.put('u1', FixedModel(9), nbytes=1)
+    api.prediction_cache.invalidate_model('user:u1')
+    assert api.categorize_transaction(api.TransactionInput(description='Київстар', user_id='u1'))['category_id'] == 9
@@ -0,0 +1,138 @@
+import csv
+import json
+
+import pytest
+
+import api
+from model_cache import ModelCache
+from recategorize import progress_path, recategorize
+from snapshot_state import SnapshotDict
+
+
+class KeywordModel:
+    """Category 11 for descriptions mentioning Київстар, 10 otherwise; records predicted texts."""
+
+    def __init__(self):
+        self.seen = []
+
+    def predict(self, texts):
+        self.seen.extend(texts)
+        return [11 if 'Київстар' in t else 10 for t in texts]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    model = KeywordModel()
+    monkeypatch.setattr(api, 'global_model', model)
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+    monkeypatch.setattr(api, 'user_corrections_map', SnapshotDict({'u1': {'сільпо': 16}}))
+    monkeypatch.setattr(api, 'mcc_rules', {5411: 1})
+    return model
+
+
+ROWS = [
+    {'id': '1', 'user_id': 'u1', 'description': 'Сільпо', 'mcc': '', 'amount': '-10'},
+    {'id': '2', 'user_id': 'u2', 'description': 'АТБ', 'mcc': '5411', 'amount': '-20.5'},
+    {'id': '3', 'user_id': 'u2', 'description': 'Київстар', 'mcc': '', 'amount': ''},
+    {'id': '4', 'user_id': 'u3', 'description': 'Uber', 'mcc': 'bad', 'amount': '-99'},
+    {'id': '5', 'user_id': 'u3', 'description': '', 'mcc': '', 'amount': ''},
+]
+
+
+def _write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _read_csv(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def test_csv_rows_keep_their_columns_and_order(service, tmp_path):
+    _write_csv(tmp_path / 'in.csv', ROWS)
+
+    summary = recategorize(str(tmp_path / 'in.csv'), str(tmp_path / 'out.csv'), chunk_size=2, preload=False)
+
+    out = _read_csv(tmp_path / 'out.csv')
+    assert [r['id'] for r in out] == ['1', '2', '3', '4', '5']
+    assert [(r['category_id'], r['source']) for r in out[:4]] == [
+        ('16', 'override'), ('1', 'mcc_rule'), ('11', 'global'), ('10', 'global')]
+    assert out[0]['override_rule'] == 'exact' and out[4]['error'] == 'Empty description'
+    assert summary['rows'] == 5 and summary['rows_per_second'] > 0
+    assert json.load(open(progress_path(str(tmp_path / 'out.csv'))))['completed'] is True
+
+
+def test_resume_skips_committed_rows_and_drops_partial_writes(service, tmp_path):
+    _write_csv(tmp_path / 'in.csv', ROWS)
+    output = str(tmp_path / 'out.csv')
+    recategorize(str(tmp_path / 'in.csv'), output, chunk_size=2, preload=False)
+    expected = _read_csv(output)
+
+    # перервано після першої частини: прогрес — 2 рядки, у файлі — недописаний рядок
+    with open(output, 'r', encoding='utf-8', newline='') as f:
+        lines = f.readlines()
+    committed = ''.join(lines[:3])
+    with open(output, 'w', encoding='utf-8', newline='') as f:
+        f.write(committed + '3,u2,Київ')
+    state = json.load(open(progress_path(output)))
+    state.update(rows_done=2, output_bytes=len(committed.encode('utf-8')), completed=False)
+    json.dump(state, open(progress_path(output), 'w'))
+    service.seen.clear()
+    api.prediction_cache.invalidate_all()
+
+    summary = recategorize(str(tmp_path / 'in.csv'), output, chunk_size=2, preload=False)
+
+    assert summary['resumed_from'] == 2 and summary['rows'] == 3
+    assert service.seen == ['Київстар', 'Uber']
+    assert _read_csv(output) == expected
+
+
+def test_existing_output_without_progress_is_not_overwritten(service, tmp_path):
+    _write_csv(tmp_path / 'in.csv', ROWS)
+    (tmp_path / 'out.csv').write_text('keep me', encoding='utf-8')
+
+    with pytest.raises(SystemExit):
+        recategorize(str(tmp_path / 'in.csv'), str(tmp_path / 'out.csv'), preload=False)
+    assert (tmp_path / 'out.csv').read_text(encoding='utf-8') == 'keep me'
+
+
+def test_ndjson_through_the_process_pool(service, tmp_path):
+    rows = [{'user_id': f'u{i % 3}', 'description': 'Київстар' if i % 2 else 'АТБ', 'amount': -i, 'note': i}
+            for i in range(25)]
+    with open(tmp_path / 'in.ndjson', 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(r, ensure_ascii=False) + '\n' for r in rows)
+
+    summary = recategorize(str(tmp_path / 'in.ndjson'), str(tmp_path / 'out.ndjson'),
+                           workers=2, chunk_size=4, preload=False)
+
+    with open(tmp_path / 'out.ndjson', encoding='utf-8') as f:
+        out = [json.loads(line) for line in f]
+    assert [r['note'] for r in out] == list(range(25))
+    assert [r['category_id'] for r in out] == [11 if i % 2 else 10 for i in range(25)]
+    assert summary['sources'] == {'global': 25}
+
+
+def test_ndjson_input_keeps_its_columns_in_csv_output(service, tmp_path):
+    with open(tmp_path / 'in.ndjson', 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(r, ensure_ascii=False) + '\n' for r in ROWS)
+
+    recategorize(str(tmp_path / 'in.ndjson'), str(tmp_path / 'out.csv'), chunk_size=2, preload=False)
+
+    out = _read_csv(tmp_path / 'out.csv')
+    assert [r['id'] for r in out] == ['1', '2', '3', '4', '5']
+    assert out[2]['user_id'] == 'u2' and out[2]['description'] == 'Київстар' and out[2]['category_id'] == '11'
+
+
+def test_missing_global_model_aborts_without_marking_the_run_complete(service, tmp_path, monkeypatch):
+    monkeypatch.setattr(api, 'global_model', None)
+    monkeypatch.setattr(api, 'run_startup', lambda: None)  # the model file is missing or broken
+    _write_csv(tmp_path / 'in.csv', ROWS)
+
+    with pytest.raises(SystemExit):
+        recategorize(str(tmp_path / 'in.csv'), str(tmp_path / 'out.csv'))
+
+    assert not (tmp_path / 'out.csv').exists()
+    assert not (tmp_path / progress_path('out.csv')).exists()
@@ -0,0 +1,96 @@
+import threading
+import time
+
+from retrain_scheduler import RetrainScheduler
+
+
+def test_burst_is_coalesced_into_one_run():
+    runs = []
+    scheduler = RetrainScheduler(runs.append, quiet_window_seconds=0.05)
+    for _ in range(20):
+        scheduler.submit('u1')
+    assert scheduler.status('u1')['state'] == 'scheduled'
+    assert scheduler.queue_depth() == 1
+
+    assert scheduler.wait_idle(timeout=2)
+    assert runs == ['u1']
+    status = scheduler.status('u1')
+    assert status['runs'] == 1 and status['coalesced'] == 19
+    scheduler.shutdown()
+
+
+def test_submissions_during_run_queue_exactly_one_followup():
+    started = threading.Event()
+    release = threading.Event()
+    active = []
+    max_active = []
+
+    def run(user_id):
+        active.append(user_id)
+        max_active.append(len(active))
+        started.set()
+        release.wait(2)
+        active.remove(user_id)
+
+    scheduler = RetrainScheduler(run, quiet_window_seconds=0.01, max_workers=4)
+    scheduler.submit('u1')
+    assert started.wait(2)
+    for _ in range(5):
+        scheduler.submit('u1')
+    status = scheduler.status('u1')
+    assert status['state'] == 'running' and status['followup_queued']
+
+    release.set()
+    assert scheduler.wait_idle(timeout=2)
+    assert scheduler.status('u1')['runs'] == 2
+    assert max(max_active) == 1  # never two runs for the same user at once
+    scheduler.shutdown()
+
+
+def test_failed_run_is_reported():
+    def run(user_id):
+        raise RuntimeError('boom')
+
+    scheduler = RetrainScheduler(run, quiet_window_seconds=0.0)
+    scheduler.submit('u1')
+    assert scheduler.wait_idle(timeout=2)
+    assert scheduler.status('u1')['last_error'] == 'boom'
+    scheduler.shutdown()
+
+
+def test_failed_api_retrain_reaches_the_scheduler(monkeypatch):
+    import api
+
+    def broken_overlay(user_id, corrections):
+        raise RuntimeError('disk full')
+
+    monkeypatch.setattr(api, 'read_user_corrections', lambda user_id: [{'text_features': 'АТБ', 'category_id': 1}])
+    monkeypatch.setattr(api, '_train_overlay_model', broken_overlay)
+    monkeypatch.setattr(api, 'global_model', object())
+    monkeypatch.setattr(api, 'get_backend', lambda name: type('Backend', (), {'supports_overlay': True})())
+    monkeypatch.setattr(api.config, 'PERSONALIZATION_MODE', 'overlay')
+
+    scheduler = RetrainScheduler(api.retrain_personalized_model, quiet_window_seconds=0.0)
+    scheduler.submit('u1')
+    assert scheduler.wait_idle(timeout=2)
+    assert scheduler.status('u1')['last_error'] == 'disk full'
+    scheduler.shutdown()
+
+
+def test_finished_users_leave_the_active_state():
+    scheduler = RetrainScheduler(lambda user_id: None, quiet_window_seconds=0.0, max_finished=3)
+    for i in range(10):
+        scheduler.submit(f'u{i}')
+    assert scheduler.wait_idle(timeout=2)
+
+    assert scheduler._states == {}
+    assert list(scheduler._finished) == ['u7', 'u8', 'u9']
+    assert scheduler.status('u9')['runs'] == 1
+    assert scheduler.status('u0') == {'state': 'idle', 'submissions': 0, 'runs': 0}
+
+    # a new submission continues the user's counters
+    scheduler.submit('u9')
+    assert scheduler.wait_idle(timeout=2)
+    status = scheduler.status('u9')
+    assert status['runs'] == 2 and status['submissions'] == 2
+    scheduler.shutdown()
@@ -0,0 +1,76 @@
+import os
+
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+import config
+import train
+from backends import LinearTextModel, get_backend
+from compiled_forest import CompiledForestModel
+
+TEXTS = ['АТБ', 'Сільпо', 'Рукавичка АТБ', 'Київстар', 'lifecell', 'Vodafone поповнення',
+         'Uber', 'Bolt таксі', 'Оплата паркування', 'Аптека Доброго Дня', 'APTEKA 16', 'EVA']
+LABELS = [1, 1, 1, 11, 11, 11, 10, 10, 10, 13, 13, 13]
+
+
+def _frame():
+    rows = [(f'{t} {i}', c) for i in range(4) for t, c in zip(TEXTS, LABELS)]
+    return pd.DataFrame(rows, columns=['text_features', 'labels'])
+
+
+def test_pareto_front_drops_dominated_candidates():
+    rows = [
+        {'name': 'fast', 'accuracy': 0.95, 'p50_ms': 0.02, 'size_kb': 30},
+        {'name': 'accurate', 'accuracy': 0.97, 'p50_ms': 0.2, 'size_kb': 4000},
+        {'name': 'dominated', 'accuracy': 0.94, 'p50_ms': 0.3, 'size_kb': 5000},
+    ]
+    assert train._pareto_front(rows) == {'fast', 'accurate'}
+
+
+def _grid(classifiers):
+    return lambda: ({'word': TfidfVectorizer()}, classifiers)
+
+
+def test_select_reports_every_candidate_and_saves_the_winner(tmp_path, monkeypatch):
+    paths = {'RF': str(tmp_path / 'rf.joblib'), 'LINEAR': str(tmp_path / 'linear.joblib')}
+    monkeypatch.setattr(config, 'SKLEARN_MODEL_PATH', paths['RF'])
+    monkeypatch.setattr(config, 'LINEAR_MODEL_PATH', paths['LINEAR'])
+    monkeypatch.setattr(train, 'selection_grid', _grid(
+        {'rf10': RandomForestClassifier(n_estimators=10, random_state=42, n_jobs=1),
+         'logreg': LogisticRegression(C=10.0, max_iter=2000)}))
+
+    rows = train.select_model(_frame(), folds=2, n_jobs=1, latency_calls=20)
+
+    assert {r['name'] for r in rows} == {'word + rf10', 'word + logreg'}
+    assert all(r['size_kb'] > 0 and r['p99_ms'] >= r['p50_ms'] > 0 and r['fit_seconds'] > 0 for r in rows)
+    winner = [r for r in rows if r['winner']]
+    assert len(winner) == 1 and winner[0]['pareto']
+    backend = winner[0]['backend']
+    assert backend == ('LINEAR' if winner[0]['name'].endswith('logreg') else 'RF')
+    served = get_backend(backend).load(paths[backend])
+    assert isinstance(served, LinearTextModel if backend == 'LINEAR' else CompiledForestModel)
+    assert served.predict(['Київстар 0'])[0] == 11
+    assert [os.path.exists(p) for p in paths.values()].count(True) == 1
+
+
+def test_linear_winner_is_saved_through_the_linear_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'SKLEARN_MODEL_PATH', str(tmp_path / 'rf.joblib'))
+    monkeypatch.setattr(config, 'LINEAR_MODEL_PATH', str(tmp_path / 'linear.joblib'))
+    monkeypatch.setattr(train, 'selection_grid', _grid({'logreg': LogisticRegression(C=10.0, max_iter=2000)}))
+
+    rows = train.select_model(_frame(), folds=2, n_jobs=1, latency_calls=20)
+
+    assert rows[0]['backend'] == 'LINEAR'
+    assert os.listdir(tmp_path) == ['linear.joblib']
+    assert isinstance(get_backend('LINEAR').load(config.LINEAR_MODEL_PATH), LinearTextModel)
+
+
+def test_rf_backend_serves_a_non_forest_pipeline(tmp_path):
+    linear = get_backend('LINEAR').fit(TEXTS, LABELS)
+    path = str(tmp_path / 'rf_path.joblib')
+
+    get_backend('RF').save(linear.pipeline, path)
+
+    assert isinstance(get_backend('RF').load(path), LinearTextModel)
@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+from snapshot_state import SnapshotDict
+
+
+def test_behaves_like_a_dict():
+    state = SnapshotDict({'a': 1, 'b': 2})
+    state['c'] = 3
+    del state['a']
+
+    assert dict(state.items()) == {'b': 2, 'c': 3}
+    assert len(state) == 2 and 'b' in state and 'a' not in state
+    assert state.get('a') is None and state['c'] == 3
+    assert state.setdefault('b', 99) == 2 and state.setdefault('d', 4) == 4
+    assert state.pop('d') == 4 and state.pop('d', 'none') == 'none'
+    assert state.compute_if_present('b', lambda value: value + 1) == 3
+    assert state.compute_if_present('missing', lambda value: 1) is None and 'missing' not in state
+    with pytest.raises(KeyError):
+        del state['missing']
+    state.clear()
+    assert len(state) == 0 and list(state) == []
+
+
+def test_snapshot_is_isolated_from_later_writes():
+    state = SnapshotDict({i: i for i in range(200)})
+    before = state.snapshot()
+
+    state[0] = 'changed'
+    state.pop(1)
+    state[500] = 500
+
+    assert before[0] == 0 and 1 in before and 500 not in before and len(before) == 200
+    after = state.snapshot()
+    assert after.version > before.version
+    assert after[0] == 'changed' and 1 not in after and len(after) == 200
+    # a write copies only the shard it touches
+    untouched = [i for i, shard in enumerate(after._shards) if shard is before._shards[i]]
+    assert len(untouched) >= len(after._shards) - 3
+
+
+def test_concurrent_compute_loses_no_updates():
+    state = SnapshotDict({'counter': 0})
+    seen_torn = []
+
+    def writer():
+        for _ in range(500):
+            state.compute('counter', lambda value: value + 1)
+
+    def reader():
+        previous = 0
+        for _ in range(2000):
+            value = state['counter']
+            if value < previous:
+                seen_torn.append((previous, value))
+            previous = value
+
+    threads = [threading.Thread(target=writer) for _ in range(4)] + [threading.Thread(target=reader) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert state['counter'] == 2000
+    assert seen_torn == []
@@ -0,0 +1,80 @@
+import subprocess
+import sys
+import threading
+
+from fastapi.testclient import TestClient
+
+import api
+import config
+from backends import get_backend
+from model_cache import ModelCache
+from startup import StartupTracker
+
+TEXTS = ['АТБ', 'Сільпо', 'Київстар', 'lifecell', 'Uber', 'Bolt таксі']
+LABELS = [1, 1, 11, 11, 10, 10]
+
+
+def _isolate(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(api, 'startup', StartupTracker())
+    monkeypatch.setattr(api, 'global_model', None)
+    monkeypatch.setattr(api, 'global_model_signature', None)
+    monkeypatch.setattr(api, 'personalized_models_cache', ModelCache())
+    monkeypatch.setattr(config, 'MODEL_TYPE', 'LINEAR')
+    monkeypatch.setattr(config, 'LINEAR_MODEL_PATH', str(tmp_path / 'linear.joblib'))
+    monkeypatch.setattr(config, 'MCC_RULES_PATH', str(tmp_path / 'mcc_rules.json'))
+
+
+def test_import_does_not_pull_heavy_dependencies():
+    code = "import sys, api; print(sorted(m for m in ('pandas', 'sklearn', 'scipy', 'joblib') if m in sys.modules))"
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                         cwd=api.os.path.dirname(api.__file__))
+    assert out.stdout.strip().splitlines()[-1] == '[]'
+
+
+def test_ready_only_after_model_loaded_and_warmed(monkeypatch, tmp_path):
+    _isolate(monkeypatch, tmp_path)
+    client = TestClient(api.app)
+    assert client.get('/health/live').status_code == 200
+    assert client.get('/health/ready').status_code == 503
+
+    backend = get_backend('LINEAR')
+    backend.save(backend.fit(TEXTS, LABELS), config.LINEAR_MODEL_PATH)
+    api.run_startup()
+
+    resp = client.get('/health/ready')
+    body = resp.json()
+    assert resp.status_code == 200 and body['ready']
+    assert {'global_model', 'corrections', 'mcc_rules', 'warmup'} <= set(body['phases'])
+    assert all(p['status'] == 'ok' for p in body['phases'].values())
+    assert body['phases']['global_model']['duration_ms'] >= 0
+
+
+def test_missing_model_reports_failed_phase(monkeypatch, tmp_path):
+    _isolate(monkeypatch, tmp_path)
+    api.run_startup()
+    body = TestClient(api.app).get('/health/ready').json()
+    assert body['ready'] is False and body['state'] == 'failed'
+    assert body['phases']['global_model']['status'] == 'failed'
+
+
+def test_requests_wait_for_background_startup(monkeypatch, tmp_path):
+    _isolate(monkeypatch, tmp_path)
+    backend = get_backend('LINEAR')
+    backend.save(backend.fit(TEXTS, LABELS), config.LINEAR_MODEL_PATH)
+    release = threading.Event()
+    original_load = api.load_global_model
+
+    def slow_load():
+        release.wait(5)
+        original_load()
+
+    monkeypatch.setattr(api, 'load_global_model', slow_load)
+    monkeypatch.setattr(config, 'STARTUP_MODE', 'background')
+    api.start_loading()
+    assert api.startup.loading
+
+    threading.Timer(0.2, release.set).start()
+    resp = TestClient(api.app).post('/api/v1/categorize', json={'description': 'Київстар', 'user_id': 'u1'})
+    assert resp.status_code == 200
+    assert resp.json()['category_id'] == 11
@@ -1,12 +1,13 @@
 # train.py
+import argparse
+import json
+import time
 import pandas as pd
 import numpy as np
 import joblib
 from sklearn.model_selection import train_test_split
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.pipeline import Pipeline
-from sklearn.ensemble import RandomForestClassifier
 import config
+from backends import BACKENDS, get_backend
 
 # Import heavy BERT libraries only if needed (to avoid unnecessary deps for RF)
 if config.MODEL_TYPE == "BERT":
@@ -35,25 +36,268 @@ def load_and_clean_data(file_path):
     print(f"Дані завантажено, {len(df)} рядків.")
     return df
 
-# --- 2. Функція навчання SKlearn ---
-def train_sklearn(df):
-    print("--- Початок навчання SKLEARN (Random Forest) ---")
+# --- 2. Функція навчання SKlearn (бекенди з backends.py: RF, LINEAR) ---
+def train_sklearn(df, backend_name=None):
+    backend = get_backend(backend_name or config.MODEL_TYPE)
+    print(f"--- Початок навчання SKLEARN ({backend.name}) ---")
     
     # Для продакшену ми тренуємо на ВСІХ даних
     X_train = df['text_features']
     y_train = df['labels']
 
-    pipeline_rf = Pipeline([
-        ('tfidf', TfidfVectorizer()),
-        ('model', RandomForestClassifier(random_state=42, n_jobs=-1)) # n_jobs=-1 (використовувати всі ядра)
-    ])
-    
     print("Навчання...")
-    pipeline_rf.fit(X_train, y_train)
+    model = backend.fit(X_train, y_train)
     
-    # Зберігаємо конвеєр у файл
-    joblib.dump(pipeline_rf, config.SKLEARN_MODEL_PATH)
-    print(f"Модель SKlearn збережено у: {config.SKLEARN_MODEL_PATH}")
+    # Зберігаємо конвеєр у файл (RF — разом зі скомпільованою моделлю)
+    backend.save(model)
+    print(f"Модель SKlearn ({backend.name}) збережено у: {backend.model_path}")
+    if getattr(model, 'pipeline', None) is not None and backend.name == "RF":
+        from compiled_forest import compiled_artifact_path
+        print(f"Скомпільовану RF-модель збережено у: {compiled_artifact_path(backend.model_path)}")
+        verify_compiled(model.pipeline, model, X_train)
+
+# --- 2b. Скомпільована RF-модель (compiled_forest.py) ---
+def verify_compiled(pipeline, compiled, texts, single_calls=200):
+    """
+    Звіряє прогнози скомпільованої моделі з sklearn Pipeline на texts і порівнює
+    латентність одиночного прогнозу. Будь-яка розбіжність — помилка.
+    """
+    texts = list(texts)
+    sample = texts[:single_calls]
+    forest = pipeline[-1]
+    n_jobs = forest.n_jobs
+    started = time.perf_counter()
+    for text in sample:
+        pipeline.predict([text])
+    sklearn_ms = (time.perf_counter() - started) * 1000 / len(sample)
+    # n_jobs=1: дерева сумуються в тому ж порядку, що й у скомпільованій моделі
+    forest.set_params(n_jobs=1)
+    try:
+        expected = np.asarray(pipeline.predict(texts))
+    finally:
+        forest.set_params(n_jobs=n_jobs)
+
+    actual = np.asarray(compiled.predict(texts))
+    started = time.perf_counter()
+    for text in sample:
+        compiled.predict([text])
+    compiled_ms = (time.perf_counter() - started) * 1000 / len(sample)
+
+    mismatches = int((expected != actual).sum())
+    print(f"Звірка скомпільованої моделі: {mismatches} розбіжностей на {len(texts)} описах; "
+          f"один опис: sklearn {sklearn_ms:.2f} мс, скомпільована {compiled_ms:.3f} мс")
+    if mismatches:
+        raise RuntimeError(f"Скомпільована модель розходиться з sklearn на {mismatches} описах")
+    return {'mismatches': mismatches, 'sklearn_ms': sklearn_ms, 'compiled_ms': compiled_ms}
+
+
+def export_compiled_rf(path=None, texts=None):
+    """
+    Компілює вже навчений RF Pipeline з path у скомпільований артефакт поруч
+    (без перенавчання; той самий крок виконує RandomForestBackend.save).
+    """
+    from compiled_forest import compile_forest, export_compiled
+    path = path or config.SKLEARN_MODEL_PATH
+    pipeline = joblib.load(path)
+    compiled = compile_forest(pipeline)
+    if texts is not None:
+        verify_compiled(pipeline, compiled, texts)
+    target = export_compiled(compiled, path)
+    print(f"Скомпільовану RF-модель збережено у: {target}")
+    return target
+
+# --- 2c. Підбір моделі (--select): паралельна стратифікована крос-валідація ---
+def selection_grid():
+    """Кандидати: {назва: TF-IDF} × {назва: класифікатор} (прототипи, клонуються для кожного навчання)."""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    featurizers = {
+        'word': TfidfVectorizer(),
+        'word1-2': TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True),
+        'char_wb2-4': TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 4), sublinear_tf=True, min_df=2),
+    }
+    classifiers = {
+        'rf100': RandomForestClassifier(random_state=42, n_jobs=1),
+        'rf50-depth30': RandomForestClassifier(n_estimators=50, max_depth=30, random_state=42, n_jobs=1),
+        'logreg-C10': LogisticRegression(C=10.0, max_iter=2000),
+        'logreg-C1': LogisticRegression(C=1.0, max_iter=2000),
+    }
+    return featurizers, classifiers
+
+
+def _fold_features(featurizer, texts, train_idx, val_idx):
+    """TF-IDF фолду: навчається один раз і спільний для всіх класифікаторів-кандидатів."""
+    started = time.perf_counter()
+    X_train = featurizer.fit_transform(texts[train_idx])
+    X_val = featurizer.transform(texts[val_idx])
+    return X_train, X_val, time.perf_counter() - started
+
+
+def _fit_score(classifier, X_train, y_train, X_val, y_val):
+    started = time.perf_counter()
+    classifier.fit(X_train, y_train)
+    seconds = time.perf_counter() - started
+    return float((classifier.predict(X_val) == y_val).mean()), seconds
+
+
+def _single_row_latency_ms(model, texts):
+    model.predict(texts[:1])  # прогрів
+    timings = []
+    for text in texts:
+        started = time.perf_counter()
+        model.predict([text])
+        timings.append((time.perf_counter() - started) * 1000)
+    return float(np.percentile(timings, 50)), float(np.percentile(timings, 99))
+
+
+def selection_backend(pipeline) -> str:
+    """Бекенд, що відповідає класифікатору переможця: ліс — "RF", лінійна модель — "LINEAR"."""
+    classifier = pipeline[-1]
+    if hasattr(classifier, 'estimators_'):
+        return "RF"
+    if hasattr(classifier, 'coef_'):
+        return "LINEAR"
+    raise ValueError(f"Немає бекенду для класифікатора {type(classifier).__name__}")
+
+
+def _pareto_front(rows):
+    """Кандидати, яких ніхто не перевершує одночасно за точністю, p50-латентністю і розміром."""
+    def dominates(a, b):
+        no_worse = (a['accuracy'] >= b['accuracy'] and a['p50_ms'] <= b['p50_ms'] and a['size_kb'] <= b['size_kb'])
+        better = (a['accuracy'] > b['accuracy'] or a['p50_ms'] < b['p50_ms'] or a['size_kb'] < b['size_kb'])
+        return no_worse and better
+    return {r['name'] for r in rows if not any(dominates(o, r) for o in rows if o is not r)}
+
+
+def select_model(df, folds=None, n_jobs=None, latency_calls=300, save=True):
+    """
+    Оцінює сітку selection_grid() стратифікованою крос-валідацією (фолди та
+    кандидати — паралельно через joblib; TF-IDF кожного фолду навчається один раз).
+    Для кожного кандидата: точність (середня по фолдах), час навчання на всіх
+    даних, розмір серіалізованого Pipeline, p50/p99 прогнозу одного опису у
+    формі, в якій модель обслуговується (скомпільований RF / LinearTextModel).
+    Переможець — найшвидший серед кандидатів, чия точність не нижча за найкращу
+    більш ніж на SELECT_ACCURACY_TOLERANCE; він зберігається бекендом свого
+    класифікатора (selection_backend): RF — у SKLEARN_MODEL_PATH, LINEAR — у LINEAR_MODEL_PATH.
+    """
+    import io
+    from joblib import Parallel, delayed
+    from sklearn.base import clone
+    from sklearn.model_selection import StratifiedKFold
+    from sklearn.pipeline import Pipeline
+    from backends import wrap_loaded_model
+
+    folds = folds or config.SELECT_CV_FOLDS
+    n_jobs = config.SELECT_N_JOBS if n_jobs is None else n_jobs
+    texts = np.asarray(df['text_features'], dtype=object)
+    y = np.asarray(df['labels'])
+    featurizers, classifiers = selection_grid()
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=42).split(texts, y))
+    print(f"--- Підбір моделі: {len(featurizers)} × {len(classifiers)} кандидатів, {folds} фолдів ---")
+
+    parallel = Parallel(n_jobs=n_jobs)
+    feature_jobs = [(f, k) for f in featurizers for k in range(folds)]
+    features = dict(zip(feature_jobs, parallel(
+        delayed(_fold_features)(clone(featurizers[f]), texts, *splits[k]) for f, k in feature_jobs)))
+    fit_jobs = [(f, c, k) for f in featurizers for c in classifiers for k in range(folds)]
+    scores = dict(zip(fit_jobs, parallel(
+        delayed(_fit_score)(clone(classifiers[c]), features[f, k][0], y[splits[k][0]],
+                            features[f, k][1], y[splits[k][1]]) for f, c, k in fit_jobs)))
+
+    sample = list(texts[np.random.default_rng(42).permutation(len(texts))[:latency_calls]])
+    rows, pipelines = [], {}
+    for f, featurizer in featurizers.items():
+        # на всіх даних TF-IDF теж навчається один раз для всіх класифікаторів
+        started = time.perf_counter()
+        fitted = clone(featurizer)
+        X = fitted.fit_transform(texts)
+        featurize_seconds = time.perf_counter() - started
+        for c, classifier in classifiers.items():
+            name = f"{f} + {c}"
+            started = time.perf_counter()
+            model = clone(classifier).fit(X, y)
+            fit_seconds = featurize_seconds + time.perf_counter() - started
+            pipeline = Pipeline([('tfidf', fitted), ('model', model)])
+            buffer = io.BytesIO()
+            joblib.dump(pipeline, buffer)
+            p50, p99 = _single_row_latency_ms(wrap_loaded_model(pipeline), sample)
+            accuracy = [scores[f, c, k][0] for k in range(folds)]
+            rows.append({
+                'name': name,
+                'accuracy': float(np.mean(accuracy)),
+                'accuracy_std': float(np.std(accuracy)),
+                'cv_fit_seconds': float(np.mean([features[f, k][2] + scores[f, c, k][1] for k in range(folds)])),
+                'fit_seconds': fit_seconds,
+                'size_kb': len(buffer.getvalue()) / 1024,
+                'p50_ms': p50,
+                'p99_ms': p99,
+            })
+            pipelines[name] = pipeline
+
+    front = _pareto_front(rows)
+    best = max(r['accuracy'] for r in rows)
+    eligible = [r for r in rows if r['accuracy'] >= best - config.SELECT_ACCURACY_TOLERANCE]
+    winner = min(eligible, key=lambda r: (r['p50_ms'], r['size_kb']))
+    for r in rows:
+        r['pareto'] = r['name'] in front
+        r['winner'] = r is winner
+
+    print(f"\n{'кандидат':<26} {'точність':>15} {'навч., с':>9} {'розмір, КБ':>11} {'p50, мс':>8} {'p99, мс':>8}")
+    for r in sorted(rows, key=lambda r: (-r['accuracy'], r['p50_ms'])):
+        mark = ('Парето' if r['pareto'] else '') + (' ← переможець' if r['winner'] else '')
+        print(f"{r['name']:<26} {r['accuracy']:>8.4f} ±{r['accuracy_std']:.4f} {r['fit_seconds']:>9.2f} "
+              f"{r['size_kb']:>11.0f} {r['p50_ms']:>8.3f} {r['p99_ms']:>8.3f}  {mark}")
+
+    if save:
+        pipeline = pipelines[winner['name']]
+        backend_name = selection_backend(pipeline)
+        if backend_name == "RF":
+            pipeline[-1].set_params(n_jobs=-1)  # як RandomForestBackend.make_classifier
+        backend = get_backend(backend_name)
+        backend.save(pipeline, backend.model_path)
+        winner['backend'] = backend_name
+        print(f"Переможця ({winner['name']}) збережено бекендом {backend_name} у: {backend.model_path}")
+        if config.MODEL_TYPE != backend_name:
+            print(f"ℹ️ Сервіс обслуговує MODEL_TYPE = \"{config.MODEL_TYPE}\"; щоб обслуговувати переможця, "
+                  f"встановіть MODEL_TYPE = \"{backend_name}\" у config.py")
+    return rows
+
+# --- 2a. Таблиця детермінованих MCC-правил ---
+def derive_mcc_rules(df, min_support=None, min_purity=None):
+    """
+    Знаходить MCC-коди, категорія яких майже детермінована в навчальних даних
+    (не менше min_support транзакцій і частка найчастішої категорії >= min_purity).
+    Повертає {mcc: {'category_id', 'purity', 'support'}}.
+    """
+    min_support = config.MCC_RULE_MIN_SUPPORT if min_support is None else min_support
+    min_purity = config.MCC_RULE_MIN_PURITY if min_purity is None else min_purity
+    if 'mcc' not in df.columns:
+        return {}
+
+    mcc = pd.to_numeric(df['mcc'], errors='coerce')
+    data = pd.DataFrame({'mcc': mcc, 'labels': df['labels']}).dropna(subset=['mcc'])
+    data = data[data['mcc'] > 0]  # 0 — MCC невідомий
+    rules = {}
+    for code, labels in data.groupby(data['mcc'].astype(int))['labels']:
+        counts = labels.value_counts()
+        support = int(counts.sum())
+        purity = float(counts.iloc[0]) / support
+        if support >= min_support and purity >= min_purity:
+            rules[int(code)] = {'category_id': int(counts.index[0]), 'purity': round(purity, 4), 'support': support}
+    return rules
+
+
+def save_mcc_rules(rules, path=None):
+    path = path or config.MCC_RULES_PATH
+    payload = {
+        'min_support': config.MCC_RULE_MIN_SUPPORT,
+        'min_purity': config.MCC_RULE_MIN_PURITY,
+        'rules': {str(k): v for k, v in sorted(rules.items())}
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    print(f"Таблицю MCC-правил ({len(rules)} кодів) збережено у: {path}")
 
 # --- 3. Функція навчання BERT ---
 def train_bert(df):
@@ -76,7 +320,11 @@ def train_bert(df):
     train_dataset_tokenized = train_dataset.map(tokenize_function, batched=True)
     test_dataset_tokenized = test_dataset.map(tokenize_function, batched=True)
 
-    model = BertForSequenceClassification.from_pretrained(config.BERT_BASE_MODEL, num_labels=NUM_LABELS)
+    # мітки — самі category_id; id2label явно, щоб сервіс (bert_model.py) віддавав саме їх
+    id2label = {i: str(i) for i in range(NUM_LABELS)}
+    model = BertForSequenceClassification.from_pretrained(
+        config.BERT_BASE_MODEL, num_labels=NUM_LABELS,
+        id2label=id2label, label2id={v: k for k, v in id2label.items()})
 
     training_args = TrainingArguments(
         output_dir='./results_temp', # Тимчасова папка
@@ -99,13 +347,290 @@ def train_bert(df):
     tokenizer.save_pretrained(config.BERT_MODEL_PATH)
     print(f"Модель BERT збережено у: {config.BERT_MODEL_PATH}")
 
+# --- 3a. Порівняння моделей: латентність і точність ---
+def _measure(model, texts, labels, single_calls):
+    """Точність на texts, медіана/p95 одиночного прогнозу та пропускна здатність батчу."""
+    model.predict(list(texts[:32]))  # прогрів
+    single = []
+    for text in texts[:single_calls]:
+        started = time.perf_counter()
+        model.predict([text])
+        single.append((time.perf_counter() - started) * 1000)
+    started = time.perf_counter()
+    predicted = np.asarray(model.predict(list(texts)))
+    batch_seconds = time.perf_counter() - started
+    return {
+        'accuracy': float((predicted == np.asarray(labels)).mean()),
+        'single_p50_ms': float(np.percentile(single, 50)),
+        'single_p95_ms': float(np.percentile(single, 95)),
+        'batch_rows_per_s': len(texts) / batch_seconds,
+    }
+
+
+def _holdout_split(df):
+    """Розбиття 90/10 з train_bert: відкладену частину донавчений BERT не бачив."""
+    return train_test_split(df, test_size=0.1, random_state=42, stratify=df['labels'])
+
+
+def compare_models(df, backend_names=("RF", "LINEAR"), single_calls=200):
+    """
+    Порівнює бекенди на відкладеній вибірці — тому самому розбитті 90/10, що й
+    train_bert, тож донавчений BERT її не бачив. sklearn-бекенди навчаються на
+    90%; BERT (якщо в config.BERT_MODEL_PATH є ваги) вимірюється у fp32 та int8.
+    Повертає {назва: метрики} і друкує таблицю.
+    """
+    df_train, df_test = _holdout_split(df)
+    texts = list(df_test['text_features'])
+    labels = list(df_test['labels'])
+    results = {}
+    for name in backend_names:
+        backend = get_backend(name)
+        model = backend.fit(df_train['text_features'], df_train['labels'])
+        results[name] = _measure(model, texts, labels, single_calls)
+
+    from bert_model import has_weights, load_bert_model
+    if has_weights(config.BERT_MODEL_PATH):
+        for quantized in (False, True):
+            model = load_bert_model(quantized=quantized)
+            results['BERT int8' if quantized else 'BERT fp32'] = _measure(model, texts, labels, single_calls)
+    else:
+        print(f"ℹ️ У {config.BERT_MODEL_PATH} немає ваг BERT — порівнюються лише {', '.join(backend_names)}")
+
+    print(f"\nВідкладена вибірка: {len(texts)} описів")
+    print(f"{'модель':<10} {'точність':>9} {'p50, мс':>9} {'p95, мс':>9} {'батч, описів/с':>15}")
+    for name, r in results.items():
+        print(f"{name:<10} {r['accuracy']:>9.4f} {r['single_p50_ms']:>9.3f} "
+              f"{r['single_p95_ms']:>9.3f} {r['batch_rows_per_s']:>15.0f}")
+    return results
+
+# --- 3b. Підбір порогу каскаду (cascade.py) ---
+def _stage_outputs(model, texts, single_calls):
+    """Прогноз, впевненість і середня латентність одиночного виклику моделі, як її викликає каскад."""
+    from cascade import top_class
+    if hasattr(model, 'predict_proba'):
+        call = model.predict_proba
+        labels, probs = top_class(model, texts)
+    else:
+        call = model.predict
+        labels, probs = np.asarray(model.predict(texts)), np.ones(len(texts))
+    call(texts[:1])  # прогрів
+    started = time.perf_counter()
+    for text in texts[:single_calls]:
+        call([text])
+    latency_ms = (time.perf_counter() - started) * 1000 / min(len(texts), single_calls)
+    return np.asarray(labels), np.asarray(probs), latency_ms
+
+
+def sweep_cascade_thresholds(df, model_types=None, thresholds=None, single_calls=200):
+    """
+    Офлайн-підбір config.CASCADE_CONFIDENCE_THRESHOLD на відкладених 10% навчального CSV.
+    Моделі каскаду (sklearn — навчені на 90%, BERT — з config.BERT_MODEL_PATH)
+    прогнозують відкладену вибірку один раз; для кожного порогу рахуються точність,
+    частка описів, на які відповіла кожна модель, і середня латентність опису
+    (сума середніх латентностей моделей, через які він пройшов).
+    """
+    from cascade import CascadeModel
+    model_types = list(model_types or config.CASCADE_MODEL_TYPES)
+    if thresholds is None:
+        thresholds = [round(t, 2) for t in np.arange(0.3, 1.0, 0.05)] + [0.99]
+    df_train, df_test = _holdout_split(df)
+    texts = list(df_test['text_features'])
+    y = np.asarray(df_test['labels'])
+
+    stages = []
+    for name in model_types:
+        if name == "BERT":
+            stages.append((name, get_backend(name).load()))
+        else:
+            stages.append((name, get_backend(name).fit(df_train['text_features'], df_train['labels'])))
+    outputs = [_stage_outputs(model, texts, single_calls) for _, model in stages]
+    labels = np.vstack([o[0] for o in outputs])
+    probs = np.vstack([o[1] for o in outputs])
+    # опис, на який відповіла сходинка s, пройшов сходинки 0..s
+    cost_ms = np.cumsum([o[2] for o in outputs])
+
+    print(f"\nКаскад {' → '.join(model_types)} на відкладеній вибірці ({len(texts)} описів)")
+    for (name, _), (stage_labels, _, latency) in zip(stages, outputs):
+        print(f"  лише {name:<8} точність {(stage_labels == y).mean():.4f}, {latency:.3f} мс/опис")
+    header = ' '.join(f"{'→ ' + name:>9}" for name in model_types)
+    print(f"{'поріг':>6} {'точність':>9} {'мс/опис':>8} {header}")
+    rows = []
+    for threshold in thresholds:
+        answered = np.full(len(texts), len(stages) - 1)
+        pending = np.ones(len(texts), dtype=bool)
+        for s in range(len(stages) - 1):
+            accept = pending & (probs[s] >= threshold)
+            answered[accept] = s
+            pending &= ~accept
+        predicted = labels[answered, np.arange(len(texts))]
+        row = {
+            'threshold': float(threshold),
+            'accuracy': float((predicted == y).mean()),
+            'avg_latency_ms': float(cost_ms[answered].mean()),
+            'answered_by': {name: float((answered == s).mean()) for s, name in enumerate(model_types)},
+        }
+        rows.append(row)
+        shares = ' '.join(f"{row['answered_by'][name]:>9.1%}" for name in model_types)
+        print(f"{threshold:>6.2f} {row['accuracy']:>9.4f} {row['avg_latency_ms']:>8.3f} {shares}")
+
+    # реальний каскад з поточним порогом — перевірка оцінки латентності
+    cascade = CascadeModel(stages, threshold=config.CASCADE_CONFIDENCE_THRESHOLD)
+    measured = _measure(cascade, texts, y, single_calls)
+    print(f"Каскад з CASCADE_CONFIDENCE_THRESHOLD={config.CASCADE_CONFIDENCE_THRESHOLD}: "
+          f"точність {measured['accuracy']:.4f}, p50 {measured['single_p50_ms']:.3f} мс")
+    return rows
+
+# --- 3c. Дистиляція: вчитель (BERT) -> швидкий студент (RF / LINEAR) ---
+def load_unlabeled_descriptions(path):
+    """Нерозмічені описи: CSV з колонкою text_features/description або текстовий файл (опис у рядку)."""
+    if path.lower().endswith('.csv'):
+        frame = pd.read_csv(path, encoding='utf-8-sig', engine='python', on_bad_lines='skip')
+        column = 'text_features' if 'text_features' in frame.columns else 'description'
+        texts = frame[column].dropna().astype(str)
+    else:
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            texts = pd.Series([line.rstrip('\n') for line in f])
+    texts = texts.str.strip()
+    return list(dict.fromkeys(t for t in texts if t))
+
+
+def soft_targets(teacher, texts, temperature=1.0):
+    """Розподіл вчителя над teacher.classes_ зі згладжуванням температурою (softmax(logits / T))."""
+    texts = list(texts)
+    if hasattr(teacher, 'logits'):
+        scores = np.asarray(teacher.logits(texts), dtype=np.float64)
+    else:
+        scores = np.log(np.clip(np.asarray(teacher.predict_proba(texts), dtype=np.float64), 1e-12, None))
+    scores = scores / temperature
+    scores -= scores.max(axis=1, keepdims=True)
+    np.exp(scores, out=scores)
+    return scores / scores.sum(axis=1, keepdims=True)
+
+
+def _distillation_targets(teacher, labeled_texts, labels, unlabeled_texts, temperature, hard_weight):
+    """Описи та цілі студента: розмічені — суміш вчителя і справжньої мітки, нерозмічені — лише вчитель."""
+    classes = np.asarray(teacher.classes_)
+    texts = list(labeled_texts) + list(unlabeled_texts)
+    targets = soft_targets(teacher, texts, temperature)
+    column = {c: k for k, c in enumerate(classes.tolist())}
+    for i, label in enumerate(labels):
+        k = column.get(int(label))
+        if k is not None:
+            targets[i] *= 1 - hard_weight
+            targets[i, k] += hard_weight
+    return texts, targets, classes
+
+
+def _teacher_model(name, df_fit):
+    """BERT вчитель вантажиться з config.BERT_MODEL_PATH; sklearn-бекенд навчається на df_fit."""
+    backend = get_backend(name)
+    if name == "BERT":
+        return backend.load()
+    return backend.fit(df_fit['text_features'], df_fit['labels'])
+
+
+def distill(df, teacher_name=None, student_name=None, unlabeled=(), single_calls=200, save=True):
+    """
+    Дистиляція вчителя у студента. Спершу оцінка на відкладених 10% (розбиття
+    train_bert): вчитель, студент на м'яких мітках і той самий студент на звичайних
+    мітках — точність, частка точності вчителя, збіг з вчителем, латентність.
+    Далі студент навчається на всіх даних + нерозмічених описах і зберігається
+    у model_path свого бекенду — саме його обслуговує load_global_model
+    (при config.MODEL_TYPE = студент).
+    """
+    teacher_name = teacher_name or config.DISTILL_TEACHER
+    student_name = student_name or config.DISTILL_STUDENT
+    student_backend = get_backend(student_name)
+    if not hasattr(student_backend, 'fit_soft'):
+        raise ValueError(f"Студентом може бути лише sklearn-бекенд (RF, LINEAR), а не {student_name}")
+    temperature = config.DISTILL_TEMPERATURE
+    hard_weight = config.DISTILL_HARD_LABEL_WEIGHT
+    print(f"--- Дистиляція {teacher_name} -> {student_name} (T={temperature}, "
+          f"вага справжніх міток {hard_weight}, нерозмічених описів: {len(unlabeled)}) ---")
+
+    df_train, df_test = _holdout_split(df)
+    texts = list(df_test['text_features'])
+    y = np.asarray(df_test['labels'])
+    held_out = set(texts)
+    teacher = _teacher_model(teacher_name, df_train)
+    fit_texts, targets, classes = _distillation_targets(
+        teacher, df_train['text_features'], df_train['labels'],
+        [t for t in unlabeled if t not in held_out], temperature, hard_weight)
+    models = {
+        f'вчитель {teacher_name}': teacher,
+        f'студент {student_name}': student_backend.fit_soft(fit_texts, targets, classes),
+        f'{student_name} без вчителя': student_backend.fit(df_train['text_features'], df_train['labels']),
+    }
+    teacher_predicted = np.asarray(teacher.predict(texts))
+    report = {}
+    for name, model in models.items():
+        report[name] = _measure(model, texts, y, single_calls)
+        report[name]['teacher_agreement'] = float((np.asarray(model.predict(texts)) == teacher_predicted).mean())
+    teacher_accuracy = report[f'вчитель {teacher_name}']['accuracy']
+
+    print(f"\nВідкладена вибірка: {len(texts)} описів")
+    print(f"{'модель':<18} {'точність':>9} {'% вчителя':>10} {'збіг':>7} {'p50, мс':>9} {'p95, мс':>9}")
+    for name, r in report.items():
+        kept = r['accuracy'] / teacher_accuracy if teacher_accuracy else 0.0
+        print(f"{name:<18} {r['accuracy']:>9.4f} {kept:>10.1%} {r['teacher_agreement']:>7.1%} "
+              f"{r['single_p50_ms']:>9.3f} {r['single_p95_ms']:>9.3f}")
+
+    if save:
+        # фінальний студент: вчитель на всіх розмічених даних + нерозмічені описи
+        if teacher_name != "BERT":
+            teacher = _teacher_model(teacher_name, df)
+        fit_texts, targets, classes = _distillation_targets(
+            teacher, df['text_features'], df['labels'], unlabeled, temperature, hard_weight)
+        student = student_backend.fit_soft(fit_texts, targets, classes)
+        student_backend.save(student)
+        print(f"Студента {student_name} збережено у: {student_backend.model_path}")
+        if config.MODEL_TYPE != student_name:
+            print(f"ℹ️ Сервіс обслуговує MODEL_TYPE = \"{config.MODEL_TYPE}\"; "
+                  f"встановіть \"{student_name}\", щоб обслуговувати студента")
+    return report
+
 # --- 4. Головний блок ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Навчання глобальної моделі")
+    parser.add_argument('--export-compiled', action='store_true',
+                        help="лише скомпілювати збережену RF-модель (без перенавчання)")
+    parser.add_argument('--select', action='store_true',
+                        help="підібрати TF-IDF і класифікатор крос-валідацією та зберегти переможця бекендом його "
+                             "класифікатора: RF — у SKLEARN_MODEL_PATH, LINEAR — у LINEAR_MODEL_PATH")
+    parser.add_argument('--compare', action='store_true',
+                        help="порівняти точність і латентність RF, LINEAR і BERT (без збереження моделей)")
+    parser.add_argument('--cascade-sweep', action='store_true',
+                        help="точність і середня латентність каскаду CASCADE_MODEL_TYPES для різних порогів")
+    parser.add_argument('--distill', action='store_true',
+                        help="дистилювати DISTILL_TEACHER (BERT) у DISTILL_STUDENT і зберегти студента")
+    parser.add_argument('--teacher', help="бекенд-вчитель для --distill (за замовчуванням config.DISTILL_TEACHER)")
+    parser.add_argument('--student', help="бекенд-студент для --distill (за замовчуванням config.DISTILL_STUDENT)")
+    parser.add_argument('--unlabeled', default=config.DISTILL_UNLABELED_FILE,
+                        help="файл нерозмічених описів для --distill")
+    args = parser.parse_args()
+
     df = load_and_clean_data(config.DATA_FILE)
+    if args.export_compiled:
+        export_compiled_rf(texts=df['text_features'])
+        raise SystemExit(0)
+    if args.select:
+        select_model(df)
+        raise SystemExit(0)
+    if args.compare:
+        compare_models(df)
+        raise SystemExit(0)
+    if args.cascade_sweep:
+        sweep_cascade_thresholds(df)
+        raise SystemExit(0)
+    if args.distill:
+        unlabeled = load_unlabeled_descriptions(args.unlabeled) if args.unlabeled else []
+        distill(df, teacher_name=args.teacher, student_name=args.student, unlabeled=unlabeled)
+        raise SystemExit(0)
+    save_mcc_rules(derive_mcc_rules(df))
     
     if config.MODEL_TYPE == "BERT":
         train_bert(df)
-    elif config.MODEL_TYPE == "RF":
+    elif config.MODEL_TYPE in BACKENDS:
         train_sklearn(df)
     else:
         print(f"Невідомий MODEL_TYPE у config.py: {config.MODEL_TYPE}")
\ No newline at end of file
@@ -11,6 +11,10 @@ const axios = require('axios');
 // Use explicit IPv4 so 'localhost' resolution to ::1 doesn't cause ECONNREFUSED on some systems
 const ML_API_URL_CATEGORIZE = "http://127.0.0.1:8000/api/v1/categorize";
 const ML_API_URL_CORRECT = "http://127.0.0.1:8000/api/v1/submit-correction";
+const ML_API_URL_CATEGORIZE_BATCH = "http://127.0.0.1:8000/api/v1/categorize-batch";
+// Має збігатися з BATCH_MAX_ITEMS у ml/config.py (більший батч ML відхиляє з 413)
+const ML_BATCH_MAX_ITEMS = 1000;
+const ML_BATCH_CONCURRENCY = 2;
 
 const getTransactionsByUser = async (req, res) => {
     try {
@@ -330,6 +334,32 @@ async function predictCategory (req, res) {
   }
 }
 
+// Відправляє items частинами по ML_BATCH_MAX_ITEMS (не більше ML_BATCH_CONCURRENCY запитів одночасно).
+// Помилка однієї частини стає помилкою лише її елементів, а не всього запиту.
+async function categorizeInChunks(items) {
+  const chunks = [];
+  for (let start = 0; start < items.length; start += ML_BATCH_MAX_ITEMS) {
+    chunks.push({ start, items: items.slice(start, start + ML_BATCH_MAX_ITEMS) });
+  }
+  const results = new Array(items.length);
+  let next = 0;
+  const worker = async () => {
+    while (next < chunks.length) {
+      const chunk = chunks[next++];
+      try {
+        const mlResponse = await axios.post(ML_API_URL_CATEGORIZE_BATCH, { items: chunk.items });
+        const chunkResults = (mlResponse.data && mlResponse.data.results) || [];
+        chunk.items.forEach((_, i) => { results[chunk.start + i] = chunkResults[i] || {}; });
+      } catch (err) {
+        console.error('Batch ML prediction chunk error:', err.message || err);
+        chunk.items.forEach((_, i) => { results[chunk.start + i] = { error: 'ML service error' }; });
+      }
+    }
+  };
+  await Promise.all(Array.from({ length: Math.min(ML_BATCH_CONCURRENCY, chunks.length) }, worker));
+  return results;
+}
+
 // POST /transactions/predict-batch
 async function predictBatch(req, res) {
   try {
@@ -340,23 +370,24 @@ async function predictBatch(req, res) {
       return res.status(400).json({ error: 'descriptions array required' });
     }
 
-    const results = [];
-    for (const desc of descriptions) {
-      try {
-        const mlResponse = await axios.post(ML_API_URL_CATEGORIZE, { description: desc, user_id: userId });
-        const raw = mlResponse.data.category || mlResponse.data.category_name || mlResponse.data.category_id || null;
-        let predictedName = null;
-        if (raw !== null && raw !== undefined) {
-          if (typeof raw === 'number' || /^[0-9]+$/.test(String(raw))) {
-            predictedName = getNameById(Number(raw)) || String(raw);
-          } else predictedName = String(raw);
-        }
-        results.push({ description: desc, category: predictedName, raw });
-      } catch (err) {
-        // push null for this item and continue
-        results.push({ description: desc, category: null, raw: null, error: err.message });
+    // ML приймає до ML_BATCH_MAX_ITEMS описів за запит: ділимо на частини, результати — у порядку входу
+    const items = descriptions.map(desc => ({ user_id: userId, description: String(desc ?? '') }));
+    const mlResults = await categorizeInChunks(items);
+
+    const results = descriptions.map((desc, idx) => {
+      const item = mlResults[idx] || {};
+      if (item.error) {
+        return { description: desc, category: null, raw: null, error: item.error };
       }
-    }
+      const raw = item.category_name || item.category_id || null;
+      let predictedName = null;
+      if (raw !== null && raw !== undefined) {
+        if (typeof raw === 'number' || /^[0-9]+$/.test(String(raw))) {
+          predictedName = getNameById(Number(raw)) || String(raw);
+        } else predictedName = String(raw);
+      }
+      return { description: desc, category: predictedName, raw };
+    });
 
     return res.status(200).json({ results });
   } catch (err) {